@@ -0,0 +1,13 @@
+"""
+Audio backend selection for all scripts
+Set VOICE_CHANGER_BACKEND=virtual to run without audio hardware (see virtual_audio.py)
+"""
+import os
+
+BACKEND = os.environ.get('VOICE_CHANGER_BACKEND', 'sounddevice')
+
+if BACKEND == 'virtual':
+    import virtual_audio as sd
+    sd.configure_from_env()
+else:
+    import sounddevice as sd
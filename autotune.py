@@ -0,0 +1,107 @@
+"""
+Pick the smallest block size a device can sustain
+Starts from the device's reported low latency, measures callback load and
+xruns for a few seconds per candidate and caches the winner per device.
+"""
+import time
+import numpy as np
+from cache import load_json, save_json
+from instrumentation import CallbackMonitor
+
+CACHE_NAME = 'block_sizes'
+MIN_BLOCK_SIZE = 64
+MAX_BLOCK_SIZE = 4096
+CALIBRATION_SECONDS = 2.0
+WARMUP_CALLS = 5  # Untimed calls so first-use costs are not counted as xruns
+SAFETY_MARGIN = 0.3  # p99 callback time must stay under 70% of the block deadline
+
+
+def candidate_block_sizes(device_infos, samplerate):
+    """Powers of two from the devices' low latency up to MAX_BLOCK_SIZE"""
+    latency = max(max(info.get('default_low_input_latency', 0),
+                      info.get('default_low_output_latency', 0))
+                  for info in device_infos)
+    block_size = MIN_BLOCK_SIZE
+    while block_size < latency * samplerate and block_size < MAX_BLOCK_SIZE:
+        block_size *= 2
+    sizes = []
+    while block_size <= MAX_BLOCK_SIZE:
+        sizes.append(block_size)
+        block_size *= 2
+    return sizes
+
+
+def warm_up(callback, block_size, channels, calls=WARMUP_CALLS):
+    """Call the callback on silence so lazy setup happens before timing"""
+    in_channels, out_channels = channels if isinstance(channels, (tuple, list)) else (channels,) * 2
+    indata = np.zeros((block_size, in_channels), dtype=np.float32)
+    outdata = np.zeros((block_size, out_channels), dtype=np.float32)
+    for _ in range(calls):
+        callback(indata, outdata, block_size, None, None)
+
+
+def measure(sd, stream_kwargs, make_callback, block_size, seconds=CALIBRATION_SECONDS):
+    """Run one stream for `seconds` and return its CallbackMonitor summary"""
+    samplerate = stream_kwargs['samplerate']
+    monitor = CallbackMonitor(samplerate, block_size)
+    callback = make_callback(block_size)
+    warm_up(callback, block_size, stream_kwargs.get('channels', 1))
+    with sd.Stream(blocksize=block_size, callback=monitor.wrap(callback),
+                   **stream_kwargs) as stream:
+        sd.sleep(int(seconds * 1000))
+        stream.stop()
+    summary = monitor.summary()
+    summary['p99_load'] = summary['p99_ms'] / summary['budget_ms']
+    return summary
+
+
+def acceptable(summary, margin=SAFETY_MARGIN):
+    """No xruns and enough headroom at the 99th percentile"""
+    xruns = (summary['input_overflow'] + summary['output_underflow']
+             + summary['deadline_misses'])
+    return summary['callbacks'] > 0 and xruns == 0 and summary['p99_load'] <= 1.0 - margin
+
+
+def device_key(device_infos, samplerate):
+    names = ' -> '.join(info['name'] for info in device_infos)
+    return f"{names} @ {int(samplerate)} Hz"
+
+
+def tune_block_size(sd, device_infos, stream_kwargs, make_callback,
+                    seconds=CALIBRATION_SECONDS, margin=SAFETY_MARGIN,
+                    use_cache=True, log=print):
+    """Cached or freshly calibrated block size for these devices
+
+    `make_callback(block_size)` must return a ready callback for that size.
+    Falls back to MAX_BLOCK_SIZE when no candidate holds the margin.
+    """
+    samplerate = stream_kwargs['samplerate']
+    key = device_key(device_infos, samplerate)
+    cached = load_json(CACHE_NAME)
+    if use_cache and key in cached:
+        log(f"✓ Using cached block size {cached[key]['block_size']} for {key}")
+        return cached[key]['block_size']
+
+    log(f"Calibrating block size for {key}...")
+    chosen, chosen_summary = MAX_BLOCK_SIZE, None
+    for block_size in candidate_block_sizes(device_infos, samplerate):
+        try:
+            summary = measure(sd, stream_kwargs, make_callback, block_size, seconds)
+        except Exception as e:
+            log(f"  {block_size:>5}: failed to open ({e})")
+            continue
+        ok = acceptable(summary, margin)
+        log(f"  {block_size:>5}: p99 {summary['p99_load'] * 100:.0f}% of budget, "
+            f"{summary['output_underflow']} underflows, {summary['deadline_misses']} late "
+            f"{'✓' if ok else '✗'}")
+        if ok:
+            chosen, chosen_summary = block_size, summary
+            break
+
+    cached[key] = {
+        'block_size': chosen,
+        'p99_load': chosen_summary['p99_load'] if chosen_summary else None,
+        'tuned_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    save_json(CACHE_NAME, cached)
+    return chosen
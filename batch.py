@@ -0,0 +1,174 @@
+"""
+Apply a voice preset to recorded WAV files, offline
+Each file is memory-mapped and streamed block by block through the same
+BlockProcessor and effect chain the live callback uses, so the output matches
+a live run at the same block size bit for bit. Files are spread over a
+process pool.
+
+    python batch.py clips/*.wav --preset Demon --out-dir processed
+    python batch.py long_take.wav --preset Robot --block-size 512 --jobs 1
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from block_processor import BlockProcessor
+from effect_chain import PRESETS, build_chain
+from wav_io import WavReader, WavWriter
+
+BLOCK_SIZE = 1024    # Same meaning as in voice_changer.py; match it for identical output
+CHUNK_BLOCKS = 64    # Blocks decoded per read from the memory-mapped file
+STEREO = True        # Keep left/right separate; False downmixes to mono (cheaper)
+
+
+def output_path(path, preset, out_dir):
+    """processed/<name>_<preset>.wav for clips/<name>.wav"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    slug = preset.split(' (')[0].lower().replace(' ', '_')
+    return os.path.join(out_dir, f"{stem}_{slug}.wav")
+
+
+def output_paths(paths, preset, out_dir):
+    """output_path for each input, numbered _2, _3, ... where names would clash
+
+    a/take.wav and b/take.wav must not be written to the same file at once.
+    """
+    taken = set()
+    outputs = []
+    for path in paths:
+        out = output_path(path, preset, out_dir)
+        base, ext = os.path.splitext(out)
+        n = 1
+        while os.path.normcase(os.path.abspath(out)) in taken:
+            n += 1
+            out = f"{base}_{n}{ext}"
+        taken.add(os.path.normcase(os.path.abspath(out)))
+        outputs.append(out)
+    return outputs
+
+
+def make_processor(preset, block_size, samplerate, channels, stereo=STEREO):
+    """The live set-up for a stream with `channels` in and out"""
+    process_channels = channels if stereo else 1
+    chain = build_chain(PRESETS[preset], block_size, samplerate, channels=process_channels)
+    return BlockProcessor(chain, block_size, channels, channels, process_channels)
+
+
+def process_blocks(reader, processor, block_size, chunk_blocks=CHUNK_BLOCKS):
+    """Yield processed float32 chunks for a WavReader, block by block
+
+    The last block is zero-padded to a full block like a live stream's final
+    callback, and the padding is cut off again before it is yielded.
+    """
+    chunk = block_size * chunk_blocks
+    outdata = np.empty((block_size, reader.channels), dtype=np.float32)
+    padded = np.zeros((block_size, reader.channels), dtype=np.float32)
+    for start, audio in reader.chunks(chunk):
+        out = np.empty_like(audio)
+        for i in range(0, len(audio), block_size):
+            block = audio[i:i + block_size]
+            if len(block) < block_size:
+                padded.fill(0)
+                padded[:len(block)] = block
+                block = padded
+            processor.process(block, outdata, block_size)
+            out[i:i + block_size] = outdata[:len(out) - i]
+        yield out
+
+
+def process_file(path, preset, out_path, block_size=BLOCK_SIZE, stereo=STEREO):
+    """Process one file into out_path and return its stats (runs in a worker)"""
+    started = time.perf_counter()
+    try:
+        with WavReader(path) as reader:
+            processor = make_processor(preset, block_size, reader.samplerate,
+                                       reader.channels, stereo)
+            with WavWriter(out_path, reader.samplerate, reader.channels) as writer:
+                for out in process_blocks(reader, processor, block_size):
+                    writer.write(out)
+            seconds = reader.duration
+    except Exception as e:
+        return {'path': path, 'error': f"{type(e).__name__}: {e}"}
+    wall = time.perf_counter() - started
+    return {
+        'path': path,
+        'output': out_path,
+        'audio_seconds': seconds,
+        'wall_seconds': wall,
+        'speed': seconds / wall if wall > 0 else 0.0,
+    }
+
+
+def run(paths, preset, out_dir, block_size=BLOCK_SIZE, jobs=None, stereo=STEREO, report=print):
+    """Process every file, in a pool unless jobs == 1; returns results in input order"""
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = [(path, preset, out, block_size, stereo)
+             for path, out in zip(paths, output_paths(paths, preset, out_dir))]
+    jobs = min(jobs or os.cpu_count() or 1, len(tasks)) or 1
+    results = {}
+    started = time.perf_counter()
+    if jobs == 1:
+        for i, task in enumerate(tasks):
+            results[i] = result = process_file(*task)
+            report_file(result, report)
+    else:
+        # Keyed by position, the same path may be given twice
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(process_file, *task): i for i, task in enumerate(tasks)}
+            for future in as_completed(futures):
+                results[futures[future]] = result = future.result()
+                report_file(result, report)
+    wall = time.perf_counter() - started
+    ordered = [results[i] for i in range(len(tasks))]
+    audio = sum(r.get('audio_seconds', 0.0) for r in ordered)
+    summary = {
+        'files': len(ordered),
+        'failed': sum('error' in r for r in ordered),
+        'jobs': jobs,
+        'audio_seconds': audio,
+        'wall_seconds': wall,
+        'speed': audio / wall if wall > 0 else 0.0,
+    }
+    return ordered, summary
+
+
+def report_file(result, report=print):
+    if 'error' in result:
+        report(f"❌ {result['path']}: {result['error']}")
+    else:
+        report(f"✓ {result['path']} -> {result['output']} "
+               f"({result['audio_seconds']:.1f}s audio, {result['speed']:.1f}x realtime)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('inputs', nargs='+', help="PCM WAV files to process")
+    parser.add_argument('--preset', '-p', default='Chipmunk', choices=list(PRESETS),
+                        help="effect preset (default Chipmunk)")
+    parser.add_argument('--out-dir', '-o', default='processed',
+                        help="directory for the processed files (default processed)")
+    parser.add_argument('--block-size', '-b', type=int, default=BLOCK_SIZE,
+                        help=f"frames per block, as in the live stream (default {BLOCK_SIZE})")
+    parser.add_argument('--jobs', '-j', type=int,
+                        help="worker processes (default one per CPU, 1 = no pool)")
+    parser.add_argument('--mono', action='store_true',
+                        help="downmix to mono before the effect, like STEREO = False")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print("=== Batch Voice Changer ===\n")
+    print(f"Preset: {args.preset}, block size {args.block_size}, "
+          f"{len(args.inputs)} file{'s' if len(args.inputs) != 1 else ''}\n")
+    results, summary = run(args.inputs, args.preset, args.out_dir, args.block_size,
+                           args.jobs, stereo=not args.mono)
+    print(f"\nProcessed {summary['audio_seconds']:.1f}s of audio in "
+          f"{summary['wall_seconds']:.2f}s with {summary['jobs']} "
+          f"worker{'s' if summary['jobs'] != 1 else ''}: "
+          f"{summary['speed']:.1f} audio-seconds per wall-second")
+    if summary['failed']:
+        print(f"❌ {summary['failed']} of {summary['files']} files failed")
+        sys.exit(1)
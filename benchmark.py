@@ -0,0 +1,304 @@
+"""
+Headless benchmark of every pitch-shift implementation
+Runs on synthetic speech, no audio device needed. Results are saved as JSON
+so runs from different commits can be compared with --compare. --dtypes
+compares float64, float32 and int16 buffers instead.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --compare bench.json
+    python benchmark.py --dtypes
+    python benchmark.py --impl formant_corrector.FormantCorrector --block-sizes 512
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+import numpy as np
+
+# The scripts are only imported for their DSP functions, never opened
+os.environ.setdefault('VOICE_CHANGER_BACKEND', 'virtual')
+
+import main
+import voice_changer
+import voice_changer_android
+from block_processor import BlockProcessor
+from effect_chain import PRESETS, build_chain, preset_pitch
+from formant_corrector import FormantCorrector
+from interp_tables import tables
+from pitch_shifter import StreamingPitchShifter
+from synthetic import speech_like
+
+BLOCK_SIZES = (128, 256, 512, 1024, 2048, 4096)
+SAMPLE_RATES = (44100, 48000)
+
+
+def effect_factors():
+    """Every pitch factor used by any of the scripts' presets"""
+    factors = {main.PITCH_SHIFT}
+    factors.update(preset_pitch(chain) for _, chain in voice_changer.EFFECTS.values())
+    factors.update(effect[1] for effect in voice_changer_android.EFFECTS.values())
+    return sorted(factors)
+
+
+# Each factory returns a function that processes one mono block. The factor
+# is passed the way each script's callback passes it.
+
+def make_simple(factor, block_size):
+    return lambda block: voice_changer.pitch_shift_simple(block, 1.0 / factor)
+
+
+def make_android(factor, block_size):
+    voice_changer_android.resamplers.clear()
+    return lambda block: voice_changer_android.pitch_shift_audio(block, factor)
+
+
+def make_decimate(factor, block_size):
+    return lambda block: main.pitch_shift(block, 1.0 / factor)
+
+
+def make_streaming(factor, block_size):
+    shifter = StreamingPitchShifter(factor, block_size)
+    out = np.empty(block_size, dtype=np.float32)
+    return lambda block: shifter.process(block, out=out)
+
+
+def make_formants(factor, block_size):
+    """Streaming shifter followed by formant correction, both in place"""
+    shifter = StreamingPitchShifter(factor, block_size)
+    corrector = FormantCorrector(factor, block_size)
+    out = np.empty(block_size, dtype=np.float32)
+
+    def process(block):
+        shifter.process(block, out=out)
+        corrector.process(out, out=out)
+    return process
+
+
+IMPLEMENTATIONS = {
+    'voice_changer.pitch_shift_simple': make_simple,
+    'voice_changer_android.pitch_shift_audio': make_android,
+    'main.pitch_shift': make_decimate,
+    'pitch_shifter.StreamingPitchShifter': make_streaming,
+    'formant_corrector.FormantCorrector': make_formants,
+}
+
+
+# Sample formats. Each factory returns a function that processes one block
+# and the bytes of sample buffers it reads and writes per block.
+
+def make_interp(dtype, block_size):
+    """Linear-interpolation pitch shift computed in `dtype` on float32 streams"""
+    table = tables.get(block_size, 1.0 / 1.5, dtype)
+    work = np.empty(block_size, dtype=dtype)
+    out = np.empty(len(table), dtype=dtype)
+    result = np.empty(len(table), dtype=np.float32)
+    if dtype == np.float32:
+        def process(block):
+            table.apply(block, out=result)
+        # Input, output, and the table's gather scratch
+        return process, block_size * 4 + len(table) * 4 * 2
+
+    def process(block):
+        # What the scripts did before: promote, work in float64, convert back
+        np.copyto(work, block)
+        table.apply(work, out=out)
+        np.copyto(result, out, casting='same_kind')
+    itemsize = np.dtype(dtype).itemsize
+    return process, block_size * (4 + itemsize) + len(table) * (itemsize * 2 + 4)
+
+
+def make_stream(dtype, block_size, channels=2):
+    """Demon chain on a stereo stream opened with `dtype` samples"""
+    processor = BlockProcessor(build_chain(PRESETS['Demon'], block_size, 48000,
+                                           channels=channels),
+                               block_size, channels, channels, channels)
+    indata = np.empty((block_size, channels), dtype=dtype)
+    outdata = np.empty((block_size, channels), dtype=dtype)
+
+    def process(block):
+        # `block` already arrives in the stream's format
+        np.copyto(indata, block[:, np.newaxis])
+        processor.process(indata, outdata, block_size)
+    # Only the stream buffers differ between formats
+    return process, indata.nbytes + outdata.nbytes
+
+
+# name: (factory, sample format the stream delivers)
+FORMATS = {
+    'interp float64 (promote + convert back)': (lambda n: make_interp(np.float64, n), np.float32),
+    'interp float32': (lambda n: make_interp(np.float32, n), np.float32),
+    'demon chain, float32 stereo stream': (lambda n: make_stream(np.float32, n), np.float32),
+    'demon chain, int16 stereo stream': (lambda n: make_stream(np.int16, n), np.int16),
+}
+
+
+def run_formats(block_sizes=BLOCK_SIZES, sample_rate=48000, audio_seconds=2.0):
+    """Time every sample format and return a list of result dicts"""
+    audio = speech_like(audio_seconds, sample_rate)
+    streams = {np.float32: audio, np.int16: np.round(audio * 32767).astype(np.int16)}
+    results = []
+    for block_size in block_sizes:
+        num_blocks = max(20, min(400, int(2 * sample_rate / block_size)))
+        for name, (factory, stream_format) in FORMATS.items():
+            process, nbytes = factory(block_size)
+            times = time_blocks(process, streams[stream_format], block_size, num_blocks)
+            median = float(np.median(times))
+            results.append({
+                'format': name,
+                'block_size': block_size,
+                'us_per_block': median * 1e6,
+                'buffer_bytes': nbytes,
+                'stream_bytes_per_s': nbytes * sample_rate / block_size,
+            })
+    return results
+
+
+def print_formats(results):
+    print(f"{'format':<42} {'block':>5} {'us/block':>9} {'buffers':>9} {'at 48 kHz':>10}")
+    for r in results:
+        print(f"{r['format']:<42} {r['block_size']:>5} {r['us_per_block']:>9.1f} "
+              f"{r['buffer_bytes'] / 1024:>7.1f}KB {r['stream_bytes_per_s'] / 1e6:>7.2f}MB/s")
+
+
+def time_blocks(process, audio, block_size, num_blocks, warmup=5):
+    """Per-block processing times in seconds, cycling through `audio`"""
+    starts = np.arange(0, len(audio) - block_size + 1, block_size)
+    for i in range(warmup):
+        process(audio[starts[i % len(starts)]:][:block_size])
+
+    times = np.empty(num_blocks)
+    for i in range(num_blocks):
+        block = audio[starts[i % len(starts)]:][:block_size]
+        start = time.perf_counter()
+        process(block)
+        times[i] = time.perf_counter() - start
+    return times
+
+
+def run(block_sizes=BLOCK_SIZES, sample_rates=SAMPLE_RATES, factors=None,
+        implementations=None, audio_seconds=2.0):
+    """Sweep every configuration and return a list of result dicts"""
+    factors = effect_factors() if factors is None else factors
+    implementations = implementations or list(IMPLEMENTATIONS)
+    results = []
+
+    for sample_rate in sample_rates:
+        audio = speech_like(audio_seconds, sample_rate)
+        for block_size in block_sizes:
+            deadline = block_size / sample_rate
+            # Enough blocks for a stable median without very long runs
+            num_blocks = max(20, min(400, int(2 * sample_rate / block_size)))
+            for name in implementations:
+                for factor in factors:
+                    process = IMPLEMENTATIONS[name](factor, block_size)
+                    times = time_blocks(process, audio, block_size, num_blocks)
+                    median = float(np.median(times))
+                    results.append({
+                        'implementation': name,
+                        'sample_rate': sample_rate,
+                        'block_size': block_size,
+                        'factor': factor,
+                        'us_per_block': median * 1e6,
+                        'p99_us': float(np.percentile(times, 99)) * 1e6,
+                        'realtime_factor': deadline / median,
+                        'deadline_pct': median / deadline * 100,
+                    })
+    return results
+
+
+def result_key(result):
+    return (result['implementation'], result['sample_rate'],
+            result['block_size'], result['factor'])
+
+
+def metadata():
+    """Where and on what the benchmark ran"""
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                         stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+    }
+
+
+def print_table(results):
+    print(f"{'implementation':<40} {'rate':>6} {'block':>5} {'factor':>6} "
+          f"{'us/block':>10} {'x realtime':>10} {'deadline':>9}")
+    for r in results:
+        print(f"{r['implementation']:<40} {r['sample_rate']:>6} {r['block_size']:>5} "
+              f"{r['factor']:>6} {r['us_per_block']:>10.1f} {r['realtime_factor']:>10.1f} "
+              f"{r['deadline_pct']:>8.2f}%")
+
+
+def compare(results, baseline, threshold=10.0):
+    """Print configurations that got more than `threshold` percent slower"""
+    old = {result_key(r): r for r in baseline['results']}
+    regressions = 0
+    for r in results:
+        before = old.get(result_key(r))
+        if before is None:
+            continue
+        change = (r['us_per_block'] / before['us_per_block'] - 1) * 100
+        if change > threshold:
+            regressions += 1
+            print(f"✗ {r['implementation']} {r['sample_rate']} Hz, {r['block_size']} frames, "
+                  f"x{r['factor']}: {before['us_per_block']:.1f} -> {r['us_per_block']:.1f} us "
+                  f"(+{change:.0f}%)")
+    if not regressions:
+        print(f"✓ No regressions over {threshold:.0f}% "
+              f"against {baseline['meta'].get('commit') or 'baseline'}")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', '-o', help="write results to this JSON file")
+    parser.add_argument('--compare', help="JSON file from an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help="slowdown in percent reported as a regression (default 10)")
+    parser.add_argument('--block-sizes', type=int, nargs='+', default=BLOCK_SIZES)
+    parser.add_argument('--sample-rates', type=int, nargs='+', default=SAMPLE_RATES)
+    parser.add_argument('--factors', type=float, nargs='+')
+    parser.add_argument('--impl', nargs='+', choices=list(IMPLEMENTATIONS),
+                        help="only benchmark these implementations")
+    parser.add_argument('--dtypes', action='store_true',
+                        help="compare float64, float32 and int16 sample buffers instead")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.dtypes:
+        print("=== Sample Format Benchmark ===\n")
+        results = run_formats(args.block_sizes)
+        print_formats(results)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump({'meta': metadata(), 'formats': results}, f, indent=2)
+            print(f"\n✓ Saved {len(results)} results to {args.output}")
+        raise SystemExit(0)
+    print("=== Pitch Shift Benchmark ===\n")
+    results = run(args.block_sizes, args.sample_rates, args.factors, args.impl)
+    print_table(results)
+
+    report = {'meta': metadata(), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Saved {len(results)} results to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print()
+        if compare(results, baseline, args.threshold):
+            raise SystemExit(1)
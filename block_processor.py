@@ -0,0 +1,121 @@
+"""
+Allocation-free block processing for the audio callback
+All buffers are sized once when the stream opens
+"""
+import numpy as np
+
+INT16_SCALE = 32768.0  # int16 full scale, float samples are in [-1, 1)
+
+
+def int16_to_float32(src, out):
+    """Scale int16 samples into a float32 buffer (exact, no float64 step)"""
+    np.copyto(out, src)
+    np.multiply(out, 1.0 / INT16_SCALE, out=out)
+
+
+def float32_to_int16(src, out, scratch):
+    """Round and clip float32 samples into an int16 buffer via `scratch`"""
+    np.multiply(src, INT16_SCALE, out=scratch)
+    np.rint(scratch, out=scratch)
+    np.clip(scratch, -INT16_SCALE, INT16_SCALE - 1, out=scratch)
+    np.copyto(out, scratch, casting='unsafe')
+
+
+class BlockProcessor:
+    """Map input channels to the effect's channels, run it and fan out in place
+
+    `effect` is any object with a `process(audio, out=...)` method that
+    writes exactly len(audio) frames into `out`, e.g. StreamingPitchShifter.
+    With channels=1 the input is downmixed to mono and the result copied to
+    every output channel. With channels > 1 the effect gets a whole
+    (frames, channels) block: extra input channels are dropped, missing ones
+    repeat from the first, and outputs cycle through the processed channels.
+
+    Streams opened with dtype='int16' (native on many Android devices) are
+    converted to float32 on the way in and back on the way out, so the
+    effect only ever sees float32.
+    """
+
+    def __init__(self, effect, block_size, in_channels=1, out_channels=1, channels=1):
+        self.effect = effect
+        self.in_channels = int(in_channels)
+        self.out_channels = int(out_channels)
+        self.channels = int(channels)
+        # Channel maps, np.take(mode='wrap') cycles them over the source
+        self._in_map = np.arange(self.channels)
+        self._out_map = np.arange(max(self.in_channels, self.out_channels, self.channels))
+        self._allocate(int(block_size))
+
+    def _allocate(self, block_size):
+        self.block_size = block_size
+        shape = (block_size,) if self.channels == 1 else (block_size, self.channels)
+        self._mono = np.zeros(shape, dtype=np.float32)
+        self._wet = np.zeros(shape, dtype=np.float32)
+        # Column view so the wet signal broadcasts over (frames, channels)
+        self._wet_col = self._wet[:, np.newaxis] if self.channels == 1 else self._wet
+        # float32 copies of int16 stream blocks, as wide as a duplex stream gets
+        width = max(self.in_channels, self.out_channels, self.channels)
+        self._in_f32 = np.zeros((block_size, width), dtype=np.float32)
+        self._out_f32 = np.zeros((block_size, width), dtype=np.float32)
+        self._scratch = np.zeros((block_size, width), dtype=np.float32)
+
+    def _buffers(self, frames):
+        if frames == self.block_size:
+            return self._mono, self._wet, self._wet_col
+        if frames > self.block_size:
+            # Host changed the block size, grow once and keep going
+            self._allocate(frames)
+            return self._mono, self._wet, self._wet_col
+        return self._mono[:frames], self._wet[:frames], self._wet_col[:frames]
+
+    def process(self, indata, outdata, frames):
+        """Process one (frames, channels) block from indata into outdata"""
+        if indata.dtype == np.float32 and outdata.dtype == np.float32:
+            self._process(indata, outdata, frames)
+            return
+        # int16 stream: grow the edge buffers first if the block size changed
+        self._buffers(frames)
+        if indata.dtype != np.float32:
+            converted = self._in_f32[:len(indata), :indata.shape[1]]
+            int16_to_float32(indata, converted)
+            indata = converted
+        if outdata.dtype == np.float32:
+            self._process(indata, outdata, frames)
+            return
+        width = outdata.shape[1]
+        wet_out = self._out_f32[:len(outdata), :width]
+        self._process(indata, wet_out, frames)
+        float32_to_int16(wet_out, outdata, self._scratch[:len(outdata), :width])
+
+    def _process(self, indata, outdata, frames):
+        mono, wet, wet_col = self._buffers(frames)
+        if self.channels > 1:
+            self._process_multi(indata, outdata, mono, wet)
+            return
+
+        # Downmix to mono without temporaries
+        if indata.ndim == 1 or indata.shape[1] == 1:
+            np.copyto(mono, indata.reshape(-1)[:frames])
+        else:
+            np.sum(indata, axis=1, out=mono)
+            np.multiply(mono, 1.0 / indata.shape[1], out=mono)
+
+        self.effect.process(mono, out=wet)
+
+        # One broadcast write covers every output channel
+        np.copyto(outdata, wet_col)
+
+    def _process_multi(self, indata, outdata, dry, wet):
+        """Whole (frames, channels) blocks through the effect in one call"""
+        # Duplex streams may carry more columns than the device has
+        np.take(indata[:, :self.in_channels], self._in_map, axis=1, out=dry, mode='wrap')
+        self.effect.process(dry, out=wet)
+        width = outdata.shape[1]
+        if width == self.channels:
+            np.copyto(outdata, wet)
+        else:
+            np.take(wet, self._out_map[:width], axis=1, out=outdata, mode='wrap')
+
+    def callback(self, indata, outdata, frames, time, status):
+        """sounddevice-compatible callback"""
+        self.process(indata, outdata, frames)
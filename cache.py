@@ -0,0 +1,36 @@
+"""
+Small JSON caches kept between runs (tuned block sizes, device probes)
+Stored in ~/.cache/voice-changer unless VOICE_CHANGER_CACHE points elsewhere
+"""
+import json
+import os
+
+
+def cache_dir():
+    path = os.environ.get('VOICE_CHANGER_CACHE') or os.path.join(
+        os.path.expanduser('~'), '.cache', 'voice-changer')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def cache_path(name):
+    return os.path.join(cache_dir(), f"{name}.json")
+
+
+def load_json(name):
+    """Cached dict, or {} if it is missing or unreadable"""
+    try:
+        with open(cache_path(name)) as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_json(name, data):
+    """Write atomically so a crash never leaves a half-written cache"""
+    path = cache_path(name)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
@@ -0,0 +1,133 @@
+"""
+Control channel for a running voice changer
+Commands are short text lines typed on stdin or sent as datagrams to a local
+UNIX or UDP socket, so presets can change without reopening the stream.
+
+    python control.py 3 --port 9999
+    python control.py robot --socket /tmp/voice-changer.sock
+"""
+import os
+import socket
+import threading
+
+QUIT_COMMANDS = ('', 'q', 'quit', 'exit')
+
+
+def read_commands(handle, prompt=''):
+    """Pass stdin lines to `handle` until an empty line or 'q' (EOF raises)"""
+    while True:
+        command = input(prompt).strip()
+        if command.lower() in QUIT_COMMANDS:
+            return
+        print(handle(command))
+
+
+def open_socket(port=None, path=None):
+    """Datagram socket bound to 127.0.0.1:port or to a UNIX socket path"""
+    if path:
+        if os.path.exists(path):
+            os.unlink(path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(path)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(('127.0.0.1', port))
+    return sock
+
+
+class ControlServer:
+    """Background thread answering socket commands with `handle(command)`"""
+
+    def __init__(self, handle, port=None, path=None):
+        self.handle = handle
+        self.port = port
+        self.path = path
+        self._sock = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def address(self):
+        return self.path or f"udp://127.0.0.1:{self.port}"
+
+    def start(self):
+        self._sock = open_socket(self.port, self.path)
+        if not self.path:
+            self.port = self._sock.getsockname()[1]  # Resolves port 0
+        # Short timeout so stop() does not wait on a blocking recv
+        self._sock.settimeout(0.2)
+        self._thread = threading.Thread(target=self._run, name="control", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                data, addr = self._sock.recvfrom(1024)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                reply = self.handle(data.decode('utf-8', 'replace').strip())
+            except Exception as e:
+                reply = f"❌ {e}"
+            if addr:
+                try:
+                    self._sock.sendto(str(reply).encode('utf-8'), addr)
+                except OSError:
+                    pass
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        if self.path and os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def send_command(command, port=None, path=None, timeout=2.0):
+    """Send one command and return the reply (None if nothing came back)"""
+    if path:
+        # UNIX datagram replies need a bound address of our own
+        reply_path = f"{path}.{os.getpid()}"
+        sock = open_socket(path=reply_path)
+        target = path
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        reply_path = None
+        target = ('127.0.0.1', port)
+    try:
+        sock.settimeout(timeout)
+        sock.sendto(command.encode('utf-8'), target)
+        return sock.recv(4096).decode('utf-8', 'replace')
+    except socket.timeout:
+        return None
+    finally:
+        sock.close()
+        if reply_path and os.path.exists(reply_path):
+            os.unlink(reply_path)
+
+
+if __name__ == "__main__":
+    # Only the command line needs argparse, voice_changer.py imports this at startup
+    import argparse
+    parser = argparse.ArgumentParser(description="Send a command to a running voice changer")
+    parser.add_argument('command', help="effect number or name, e.g. 3 or robot")
+    parser.add_argument('--port', type=int, help="UDP port (CONTROL_PORT in the script)")
+    parser.add_argument('--socket', help="UNIX socket path (CONTROL_SOCKET in the script)")
+    args = parser.parse_args()
+    if not args.port and not args.socket:
+        parser.error("give --port or --socket")
+    reply = send_command(args.command, args.port, args.socket)
+    print(reply if reply is not None else "❌ No reply (is the voice changer running?)")
@@ -0,0 +1,208 @@
+"""
+Find stream configurations a pair of devices really opens with
+Rates, channel counts, block sizes and duplex vs split streams are probed
+once and cached per host API and device name, so later launches start with a
+known-good configuration and only probe again when it stops working.
+"""
+import time
+from cache import load_json, save_json
+
+CACHE_NAME = 'device_probes'
+LAST_DEVICES = '_last'  # Cache entry with the most recently used pair
+PROBE_SECONDS = 0.5     # Longest wait for a probe stream's first callbacks
+PROBE_BLOCK_SIZE = 1024
+SAMPLE_RATES = (48000, 44100)
+BLOCK_SIZES = (256, 512, 1024, 2048, 4096)
+
+
+def device_name(sd, index):
+    """'Host API: device name', stable across launches unlike indices"""
+    info = sd.query_devices(index)
+    hostapi = sd.query_hostapis(info['hostapi'])['name']
+    return f"{hostapi}: {info['name']}"
+
+
+def pair_key(sd, input_device, output_device):
+    return f"{device_name(sd, input_device)} -> {device_name(sd, output_device)}"
+
+
+def find_device(sd, name, kind):
+    """Index of the `kind` ('input'/'output') device called `name`, or None"""
+    for index, info in enumerate(sd.query_devices()):
+        if info[f'max_{kind}_channels'] > 0 and device_name(sd, index) == name:
+            return index
+    return None
+
+
+def _unique(items):
+    return list(dict.fromkeys(items))
+
+
+def candidate_configs(input_info, output_info):
+    """Configurations worth trying, most preferred first
+
+    Duplex (one stream) at the input's rate comes first. Split streams, an
+    InputStream and an OutputStream each at its own rate, come last; they
+    cost a resampler but work where a device refuses duplex.
+    """
+    in_rate = int(input_info['default_samplerate'])
+    out_rate = int(output_info['default_samplerate'])
+    rates = _unique([in_rate, out_rate, *SAMPLE_RATES])
+    in_max = min(input_info['max_input_channels'], 2)
+    out_max = min(output_info['max_output_channels'], 2)
+    channels = _unique([(in_max, out_max), (1, out_max), (1, 1)])
+
+    configs = []
+    for rate in rates:
+        for in_ch, out_ch in channels:
+            configs.append({'mode': 'duplex', 'samplerate': rate, 'output_samplerate': rate,
+                            'channels': [in_ch, out_ch]})
+    for rate_pair in _unique([(in_rate, out_rate)] + [(rate, rate) for rate in rates]):
+        for in_ch, out_ch in channels:
+            configs.append({'mode': 'split', 'samplerate': rate_pair[0],
+                            'output_samplerate': rate_pair[1], 'channels': [in_ch, out_ch]})
+    return configs
+
+
+def open_streams(sd, input_device, output_device, config, blocksize,
+                 callback=None, input_callback=None, output_callback=None, dtype='float32'):
+    """Stream objects for a configuration, opened but not started
+
+    Duplex configurations use `callback`, split ones `input_callback` and
+    `output_callback`. Split output blocks are scaled to the output rate.
+    """
+    in_ch, out_ch = config['channels']
+    if config['mode'] == 'duplex':
+        if input_device == output_device:
+            device, channels = input_device, max(in_ch, out_ch)
+        else:
+            device, channels = (input_device, output_device), (in_ch, out_ch)
+        return [sd.Stream(device=device, samplerate=config['samplerate'], blocksize=blocksize,
+                          dtype=dtype, channels=channels, callback=callback)]
+    output_block = round(blocksize * config['output_samplerate'] / config['samplerate'])
+    streams = [sd.InputStream(device=input_device, samplerate=config['samplerate'],
+                              blocksize=blocksize, dtype=dtype, channels=in_ch,
+                              callback=input_callback)]
+    try:
+        streams.append(sd.OutputStream(device=output_device,
+                                        samplerate=config['output_samplerate'],
+                                        blocksize=output_block, dtype=dtype,
+                                        channels=out_ch, callback=output_callback))
+    except Exception:
+        streams[0].close()
+        raise
+    return streams
+
+
+def try_config(sd, input_device, output_device, config, blocksize=PROBE_BLOCK_SIZE,
+               seconds=PROBE_SECONDS):
+    """None if the configuration opens and runs, else the error message"""
+    calls = {'in': 0, 'out': 0}
+
+    def callback(indata, outdata, frames, time, status):
+        outdata.fill(0)
+        calls['in'] += 1
+        calls['out'] += 1
+
+    def input_callback(indata, frames, time, status):
+        calls['in'] += 1
+
+    def output_callback(outdata, frames, time, status):
+        outdata.fill(0)
+        calls['out'] += 1
+
+    streams = []
+    try:
+        streams = open_streams(sd, input_device, output_device, config, blocksize,
+                               callback, input_callback, output_callback)
+        for stream in streams:
+            stream.start()
+        deadline = time.monotonic() + seconds
+        while (not calls['in'] or not calls['out']) and time.monotonic() < deadline:
+            time.sleep(0.01)
+    except Exception as e:
+        return str(e) or type(e).__name__
+    finally:
+        for stream in streams:
+            try:
+                stream.stop()
+                stream.close()
+            except Exception:
+                pass
+    if not calls['in'] or not calls['out']:
+        return "no callbacks"
+    return None
+
+
+def probe(sd, input_device, output_device, log=print):
+    """Try every candidate and return the cache entry of what worked"""
+    input_info = sd.query_devices(input_device)
+    output_info = sd.query_devices(output_device)
+    working = []
+    for config in candidate_configs(input_info, output_info):
+        error = try_config(sd, input_device, output_device, config)
+        log(f"  {describe(config)}: {'✓' if error is None else '✗ ' + error[:60]}")
+        if error is None:
+            working.append(config)
+
+    # Block sizes only matter once something opens, try them on the favourite
+    blocksizes = []
+    if working:
+        for blocksize in BLOCK_SIZES:
+            if blocksize == PROBE_BLOCK_SIZE or try_config(
+                    sd, input_device, output_device, working[0], blocksize) is None:
+                blocksizes.append(blocksize)
+        log(f"  block sizes: {', '.join(map(str, blocksizes))}")
+
+    return {'configs': working, 'blocksizes': blocksizes,
+            'probed': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def known_configs(sd, input_device, output_device, reprobe=False, log=print):
+    """Cached probe results for this pair, probing (and caching) if needed
+
+    Returns (entry, from_cache).
+    """
+    key = pair_key(sd, input_device, output_device)
+    cached = load_json(CACHE_NAME)
+    if not reprobe and cached.get(key, {}).get('configs'):
+        return cached[key], True
+    log(f"Probing {key}...")
+    entry = probe(sd, input_device, output_device, log)
+    cached[key] = entry
+    save_json(CACHE_NAME, cached)
+    return entry, False
+
+
+def forget(sd, input_device, output_device):
+    """Drop a pair's cached results so the next lookup probes again"""
+    cached = load_json(CACHE_NAME)
+    if cached.pop(pair_key(sd, input_device, output_device), None) is not None:
+        save_json(CACHE_NAME, cached)
+
+
+def remember_devices(sd, input_device, output_device):
+    cached = load_json(CACHE_NAME)
+    cached[LAST_DEVICES] = {'input': device_name(sd, input_device),
+                            'output': device_name(sd, output_device)}
+    save_json(CACHE_NAME, cached)
+
+
+def last_devices(sd):
+    """(input, output) indices of the last pair if both are still present"""
+    last = load_json(CACHE_NAME).get(LAST_DEVICES)
+    if not last:
+        return None
+    input_device = find_device(sd, last['input'], 'input')
+    output_device = find_device(sd, last['output'], 'output')
+    if input_device is None or output_device is None:
+        return None
+    return input_device, output_device
+
+
+def describe(config):
+    """Short human-readable form of a configuration"""
+    rates = (f"{config['samplerate']} Hz" if config['samplerate'] == config['output_samplerate']
+             else f"{config['samplerate']} -> {config['output_samplerate']} Hz")
+    in_ch, out_ch = config['channels']
+    return f"{config['mode']}, {rates}, {in_ch} in / {out_ch} out"
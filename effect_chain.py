@@ -0,0 +1,486 @@
+"""
+Composable effect chains
+Presets are declared as lists of (stage, *args) and compiled into a single
+per-block function. Every stage works in place on one shared buffer, and
+gain stages are folded into their neighbours instead of costing a pass.
+"""
+import time
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from formant_corrector import FormantCorrector
+from pitch_shifter import StreamingPitchShifter
+
+# Preset chains shared by the live, batch and server front ends
+PRESETS = {
+    'Chipmunk': [('pitch', 1.5)],
+    'Deep Voice': [('pitch', 0.7)],
+    'Robot': [('pitch', 1.2), ('stretch', 0.8), ('ringmod', 60.0)],
+    'Demon': [('pitch', 0.6), ('stretch', 0.9), ('suboctave', 0.5),
+              ('distort', 3.0), ('lowpass', 3500.0), ('gain', 0.8)],
+    'Normal (passthrough)': [],
+}
+
+
+class Stage:
+    """One processing step; `process(buf)` rewrites a (frames, channels) buf in place"""
+
+    name = 'stage'
+    latency = 0    # Samples of delay the stage adds
+    linear = True  # Gain before the stage equals gain after it
+    groups = None  # Channel counts of independent streams side by side, set by the chain
+
+    def prepare(self, block_size, samplerate, channels=1):
+        """Allocate all buffers for blocks of up to block_size frames"""
+        self.block_size = block_size
+        self.samplerate = samplerate
+        self.channels = channels
+
+    def absorb_gain(self, gain):
+        """Fold a gain applied after this stage into its coefficients, if free"""
+        return False
+
+    def process(self, buf):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+
+class Gain(Stage):
+    name = 'gain'
+
+    def __init__(self, gain=1.0):
+        self.gain = float(gain)
+
+    def absorb_gain(self, gain):
+        self.gain *= gain
+        return True
+
+    def process(self, buf):
+        np.multiply(buf, self.gain, out=buf)
+
+    def __repr__(self):
+        return f"Gain({self.gain:g})"
+
+
+class PitchShift(Stage):
+    """Streaming pitch shift, see pitch_shifter.StreamingPitchShifter"""
+
+    name = 'pitch'
+
+    def __init__(self, ratio, window=1024):
+        self.ratio = float(ratio)
+        self.window = int(window)
+
+    def prepare(self, block_size, samplerate, channels=1):
+        super().prepare(block_size, samplerate, channels)
+        self.shifter = StreamingPitchShifter(self.ratio, block_size, self.window, channels,
+                                             self.groups)
+        self.latency = self.shifter.latency if self.ratio != 1.0 else 0
+
+    def process(self, buf):
+        # The shifter copies its input into its ring before writing out
+        self.shifter.process(buf, out=buf)
+
+    def __repr__(self):
+        return f"PitchShift({self.ratio:g})"
+
+
+class FormantCorrection(Stage):
+    """Moves formants shifted by a pitch `ratio` back, see formant_corrector.FormantCorrector
+
+    Goes right after the pitch stage it corrects; preserve_formants() adds it.
+    """
+
+    name = 'formant'
+
+    def __init__(self, ratio):
+        self.ratio = float(ratio)
+        self.scale = 1.0
+
+    def prepare(self, block_size, samplerate, channels=1):
+        super().prepare(block_size, samplerate, channels)
+        self.corrector = FormantCorrector(self.ratio, block_size, samplerate, channels)
+        if self.scale != 1.0:
+            self.corrector.absorb_gain(self.scale)
+        self.latency = self.corrector.latency
+
+    def absorb_gain(self, gain):
+        self.scale *= gain
+        if hasattr(self, 'corrector'):
+            self.corrector.absorb_gain(gain)
+        return True
+
+    def process(self, buf):
+        # The input is buffered before any output is written
+        self.corrector.process(buf, out=buf)
+
+    def __repr__(self):
+        return f"FormantCorrection({self.ratio:g})"
+
+
+class TimeStretch(Stage):
+    """Granular time stretch at `speed` without changing pitch
+
+    Two Hann-windowed grain readers, half a grain apart, each play input at
+    normal speed while the point they restart from advances `speed` samples
+    per output sample. A live stream cannot run ahead of its input or fall
+    behind forever, so once that point drifts more than `max_lag` samples
+    behind the input (or into the future) it jumps to the other end. Slower
+    speeds therefore drawl and then skip forward, a stutter rather than an
+    ever-growing delay.
+    """
+
+    name = 'stretch'
+
+    def __init__(self, speed, grain=1024, max_lag=4096):
+        self.speed = float(speed)
+        self.grain = int(grain)
+        self.max_lag = int(max_lag)
+        if self.grain < 2:
+            raise ValueError(f"grain must be at least 2 samples, got {self.grain}")
+
+    def prepare(self, block_size, samplerate, channels=1):
+        super().prepare(block_size, samplerate, channels)
+        g = self.grain
+        self.max_lag = max(self.max_lag, g + block_size)
+        self._size = self.max_lag + block_size
+        self._ring = np.zeros((self._size, channels), dtype=np.float32)
+        # One column per channel, broadcasting in a ufunc allocates
+        window = np.sin(np.pi * np.arange(g) / g).astype(np.float32) ** 2
+        self._window = np.repeat(window[:, np.newaxis], channels, axis=1)
+        self._idx = np.empty(block_size, dtype=np.intp)
+        self._tmp = np.empty((block_size, channels), dtype=np.float32)
+        self._acc = np.empty((block_size, channels), dtype=np.float32)
+        self._ramp = np.arange(max(g, block_size), dtype=np.intp)
+        self._written = 0  # Absolute input samples written so far
+        self._anchor = float(-g)
+        self._counters = [0, g // 2]
+        self._starts = [-g % self._size, -g % self._size]  # Ring offsets
+        self.latency = g
+
+    def _restart_point(self, newest):
+        """Where a wrapping grain restarts, kept within what a stream can read"""
+        oldest, latest = newest - self.max_lag, newest - self.grain
+        if self._anchor < oldest:
+            # Slowed down too far behind the input, catch up
+            self._anchor = latest
+        elif self._anchor > latest:
+            # Sped up into the future, go back and skip ahead again
+            self._anchor = oldest
+        return int(self._anchor)
+
+    def process(self, buf):
+        n = len(buf)
+        start = self._written % self._size
+        first = min(n, self._size - start)
+        self._ring[start:start + first] = buf[:first]
+        self._ring[:n - first] = buf[first:]
+        self._written += n
+        newest = self._written
+
+        g = self.grain
+        acc = self._acc[:n]
+        acc.fill(0)
+        t = 0
+        while t < n:
+            seg = min(n - t, g - self._counters[0], g - self._counters[1])
+            for k in (0, 1):
+                c = self._counters[k]
+                idx = self._idx[:seg]
+                tmp = self._tmp[:seg]
+                np.add(self._ramp[:seg], self._starts[k] + c, out=idx)
+                np.take(self._ring, idx, axis=0, out=tmp, mode='wrap')
+                np.multiply(tmp, self._window[c:c + seg], out=tmp)
+                np.add(acc[t:t + seg], tmp, out=acc[t:t + seg])
+                self._counters[k] = c + seg
+            self._anchor += self.speed * seg
+            t += seg
+            for k in (0, 1):
+                if self._counters[k] == g:
+                    self._counters[k] = 0
+                    # Kept small: take(mode='wrap') loops once per wrap-around
+                    self._starts[k] = self._restart_point(newest - n + t) % self._size
+        np.copyto(buf, acc)
+
+    def __repr__(self):
+        return f"TimeStretch({self.speed:g})"
+
+
+class RingMod(Stage):
+    """Multiply by a sine carrier (the classic robot voice)"""
+
+    name = 'ringmod'
+
+    def __init__(self, freq=60.0, mix=1.0):
+        self.freq = float(freq)
+        self.mix = float(mix)
+        self.scale = 1.0
+
+    def prepare(self, block_size, samplerate, channels=1):
+        super().prepare(block_size, samplerate, channels)
+        self._phase = 0.0
+        self._step = 2 * np.pi * self.freq / samplerate
+        self._ramp = np.arange(block_size, dtype=np.float32) * np.float32(self._step)
+        self._carrier = np.empty(block_size, dtype=np.float32)
+        # Carrier repeated per channel, broadcasting in a ufunc allocates
+        if channels == 1:
+            self._carriers = self._carrier[:, np.newaxis]
+        else:
+            self._carriers = np.empty((block_size, channels), dtype=np.float32)
+
+    def absorb_gain(self, gain):
+        self.scale *= gain
+        return True
+
+    def process(self, buf):
+        n = len(buf)
+        carrier = self._carrier[:n]
+        np.add(self._ramp[:n], self._phase, out=carrier)
+        np.sin(carrier, out=carrier)
+        # scale * ((1 - mix) + mix * carrier), gain folded into the carrier
+        np.multiply(carrier, self.scale * self.mix, out=carrier)
+        np.add(carrier, self.scale * (1.0 - self.mix), out=carrier)
+        carriers = self._carriers[:n]
+        if self.channels > 1:
+            np.copyto(carriers, carrier[:, np.newaxis])
+        np.multiply(buf, carriers, out=buf)
+        self._phase = (self._phase + n * self._step) % (2 * np.pi)
+
+    def __repr__(self):
+        return f"RingMod({self.freq:g} Hz)"
+
+
+class SubOctave(Stage):
+    """Blend in a copy shifted down an octave"""
+
+    name = 'suboctave'
+
+    def __init__(self, mix=0.5, window=2048):
+        self.mix = float(mix)
+        self.window = int(window)
+
+    def prepare(self, block_size, samplerate, channels=1):
+        super().prepare(block_size, samplerate, channels)
+        self.shifter = StreamingPitchShifter(0.5, block_size, self.window, channels, self.groups)
+        self._low = np.empty((block_size, channels), dtype=np.float32)
+
+    def process(self, buf):
+        low = self._low[:len(buf)]
+        self.shifter.process(buf, out=low)
+        np.multiply(low, self.mix, out=low)
+        np.multiply(buf, 1.0 - self.mix, out=buf)
+        np.add(buf, low, out=buf)
+
+    def __repr__(self):
+        return f"SubOctave({self.mix:g})"
+
+
+class Distortion(Stage):
+    """tanh soft clipping, normalised so full scale stays full scale"""
+
+    name = 'distort'
+    linear = False
+
+    def __init__(self, drive=3.0):
+        self.drive = float(drive)
+        # Python float, a NumPy float64 scalar would promote the block
+        self.makeup = float(1.0 / np.tanh(self.drive))
+
+    def absorb_gain(self, gain):
+        self.makeup *= gain
+        return True
+
+    def process(self, buf):
+        np.multiply(buf, self.drive, out=buf)
+        np.tanh(buf, out=buf)
+        np.multiply(buf, self.makeup, out=buf)
+
+    def __repr__(self):
+        return f"Distortion({self.drive:g})"
+
+
+class LowPass(Stage):
+    """Linear-phase FIR low-pass (windowed sinc) with state across blocks"""
+
+    name = 'lowpass'
+
+    def __init__(self, cutoff=4000.0, taps=31):
+        self.cutoff = float(cutoff)
+        self.taps = int(taps) | 1
+        self.scale = 1.0
+
+    def prepare(self, block_size, samplerate, channels=1):
+        super().prepare(block_size, samplerate, channels)
+        fc = self.cutoff / samplerate
+        n = np.arange(self.taps) - (self.taps - 1) / 2
+        h = 2 * fc * np.sinc(2 * fc * n) * np.hamming(self.taps)
+        self._h = (h / h.sum() * self.scale)[::-1].astype(np.float32)
+        # Channel-major history keeps every filter window contiguous
+        self._ext = np.zeros((channels, block_size + self.taps - 1), dtype=np.float32)
+        self._windows = sliding_window_view(self._ext, self.taps, axis=1)
+        self.latency = (self.taps - 1) // 2
+
+    def absorb_gain(self, gain):
+        self.scale *= gain
+        if hasattr(self, '_h'):
+            self._h *= np.float32(gain)
+        return True
+
+    def process(self, buf):
+        n = len(buf)
+        k = self.taps - 1
+        self._ext[:, k:k + n] = buf.T
+        np.matmul(self._windows[:, :n], self._h, out=buf.T)
+        # Keep the newest taps - 1 samples as history for the next block
+        self._ext[:, :k] = self._ext[:, n:n + k]
+
+    def __repr__(self):
+        return f"LowPass({self.cutoff:g} Hz)"
+
+
+STAGES = {cls.name: cls for cls in
+          (Gain, PitchShift, FormantCorrection, TimeStretch, RingMod, SubOctave, Distortion,
+           LowPass)}
+
+
+def fuse(stages):
+    """Merge gain stages into neighbours that can apply them for free"""
+    fused = []
+    pending = 1.0
+    for stage in stages:
+        if isinstance(stage, Gain):
+            pending *= stage.gain
+            continue
+        if pending != 1.0:
+            # Post-gain of the previous stage, or pre-gain of a linear one
+            if not (fused and fused[-1].absorb_gain(pending)) and \
+                    not (stage.linear and stage.absorb_gain(pending)):
+                fused.append(Gain(pending))
+            pending = 1.0
+        fused.append(stage)
+    if pending != 1.0 and not (fused and fused[-1].absorb_gain(pending)):
+        fused.append(Gain(pending))
+    return fused
+
+
+class EffectChain:
+    """Ordered stages compiled into one in-place per-block function
+
+    `process(audio, out=...)` matches StreamingPitchShifter so a chain can be
+    handed straight to BlockProcessor; audio is (frames,) for one channel or
+    (frames, channels). With profile=True the time spent in each stage is
+    accumulated for stage_report(). `groups` gives the channel counts of
+    independent streams stacked in the channels, for stages that link them.
+    """
+
+    def __init__(self, stages, block_size, samplerate, profile=False, channels=1, groups=None):
+        self.stages = fuse(list(stages))
+        self.block_size = int(block_size)
+        self.samplerate = int(samplerate)
+        self.channels = int(channels)
+        self.profile = profile
+        for stage in self.stages:
+            stage.groups = groups
+            stage.prepare(self.block_size, self.samplerate, self.channels)
+        self.stage_time = np.zeros(len(self.stages))
+        self.stage_max = np.zeros(len(self.stages))
+        self.blocks = 0
+        self.process = self._compile()
+
+    @property
+    def latency(self):
+        """Total delay added by all stages, in samples"""
+        return sum(stage.latency for stage in self.stages)
+
+    def _compile(self):
+        steps = tuple(stage.process for stage in self.stages)
+        copyto = np.copyto
+        channels = self.channels
+
+        if not self.profile:
+            def process(audio, out=None):
+                if out is None:
+                    out = np.empty(audio.shape, dtype=np.float32)
+                copyto(out, audio)
+                # Stages always see (frames, channels)
+                buf = out.reshape(len(out), channels)
+                for step in steps:
+                    step(buf)
+                return out
+            return process
+
+        perf_counter = time.perf_counter
+        totals, maxima = self.stage_time, self.stage_max
+
+        def process(audio, out=None):
+            if out is None:
+                out = np.empty(audio.shape, dtype=np.float32)
+            copyto(out, audio)
+            buf = out.reshape(len(out), channels)
+            for i, step in enumerate(steps):
+                start = perf_counter()
+                step(buf)
+                elapsed = perf_counter() - start
+                totals[i] += elapsed
+                if elapsed > maxima[i]:
+                    maxima[i] = elapsed
+            self.blocks += 1
+            return out
+        return process
+
+    def stage_report(self):
+        """Mean/max microseconds per block and share of the deadline per stage"""
+        budget = self.block_size / self.samplerate
+        blocks = max(1, self.blocks)
+        return [{
+            'stage': repr(stage),
+            'mean_us': self.stage_time[i] / blocks * 1e6,
+            'max_us': self.stage_max[i] * 1e6,
+            'deadline_pct': self.stage_time[i] / blocks / budget * 100,
+        } for i, stage in enumerate(self.stages)]
+
+
+def build_chain(spec, block_size, samplerate, profile=False, channels=1, groups=None):
+    """EffectChain from a preset spec like [('pitch', 0.6), ('lowpass', 3500.0)]"""
+    return EffectChain([STAGES[name](*args) for name, *args in spec],
+                       block_size, samplerate, profile, channels, groups)
+
+
+def preserve_formants(spec):
+    """Chain spec with a formant correction after every pitch stage"""
+    preserved = []
+    for name, *args in spec:
+        preserved.append((name, *args))
+        if name == 'pitch' and args[0] != 1.0:
+            preserved.append(('formant', args[0]))
+    return preserved
+
+
+def preset_pitch(spec):
+    """Pitch ratio of a chain spec (1.0 if it has no pitch stage)"""
+    ratio = 1.0
+    for name, *args in spec:
+        if name == 'pitch':
+            ratio *= args[0]
+    return ratio
+
+
+if __name__ == "__main__":
+    from synthetic import speech_like
+
+    BLOCK_SIZE, SAMPLE_RATE = 512, 48000
+    audio = speech_like(3.0, SAMPLE_RATE)
+    print(f"Per-stage cost at {SAMPLE_RATE} Hz, {BLOCK_SIZE} frames\n")
+    variants = [(name, spec) for name, spec in PRESETS.items()]
+    variants += [(f"{name}, formants kept", preserve_formants(spec))
+                 for name, spec in PRESETS.items() if preset_pitch(spec) != 1.0]
+    for name, spec in variants:
+        chain = build_chain(spec, BLOCK_SIZE, SAMPLE_RATE, profile=True)
+        out = np.empty(BLOCK_SIZE, dtype=np.float32)
+        for i in range(0, len(audio) - BLOCK_SIZE + 1, BLOCK_SIZE):
+            chain.process(audio[i:i + BLOCK_SIZE], out=out)
+        print(f"{name}: {' -> '.join(map(repr, chain.stages)) or 'passthrough'}")
+        for row in chain.stage_report():
+            print(f"  {row['stage']:<22} {row['mean_us']:>8.1f} us  "
+                  f"max {row['max_us']:>8.1f} us  {row['deadline_pct']:>5.2f}%")
@@ -0,0 +1,147 @@
+"""
+Swap effect chains while the stream is running
+New chains are built off the audio thread and faded in over a few milliseconds.
+"""
+import threading
+import time
+import numpy as np
+
+
+class SwitchableEffect:
+    """Effect that hands over to a new chain with a short crossfade
+
+    `make_chain(spec)` returns a ready-to-run chain for the stream's block
+    size. It is called by whichever thread asks for the switch, never by the
+    audio callback. The callback picks up the new chain at the start of its
+    next block, runs old and new side by side for `crossfade` samples and then
+    keeps only the new one. Before the fade the new chain is run over the
+    previous input block with its output discarded, so its delay lines hold
+    recent audio instead of fading in from silence. The only thing the
+    threads share is a one-slot handoff, written and read with plain
+    attribute stores.
+    """
+
+    def __init__(self, make_chain, spec, block_size, channels=1, crossfade=1440):
+        self.make_chain = make_chain
+        self.spec = spec
+        self.chain = make_chain(spec)
+        self.channels = int(channels)
+        self.crossfade = max(1, int(crossfade))
+        self.switches = 0
+        self.switch_ms = 0.0  # Request to end of fade for the last switch
+        self._pending = None  # Latest (spec, chain) from request()
+        self._taken = None    # The last one the callback started fading in
+        self._next = None
+        self._retired = None
+        self._fade_pos = 0
+        self._held = 0        # Frames of the previous input block kept for the pre-roll
+        self._requested = 0.0
+        self._lock = threading.Lock()  # Serialises requesting threads only
+        self._allocate(int(block_size))
+
+    def _allocate(self, block_size):
+        self.block_size = block_size
+        shape = (block_size,) if self.channels == 1 else (block_size, self.channels)
+        self._tmp = np.zeros(shape, dtype=np.float32)
+        self._previous = np.zeros(shape, dtype=np.float32)
+        self._held = 0
+        # Fade-in gain padded with ones so every block can slice a full ramp;
+        # sin^2 for the new chain leaves cos^2 for the old one
+        ramp = np.ones(self.crossfade + block_size, dtype=np.float32)
+        t = np.arange(self.crossfade) / self.crossfade
+        ramp[:self.crossfade] = np.sin(0.5 * np.pi * t) ** 2
+        if self.channels > 1:
+            # One column per channel, broadcasting in a ufunc allocates
+            ramp = np.repeat(ramp[:, np.newaxis], self.channels, axis=1)
+        self._ramp = ramp
+
+    @property
+    def latency(self):
+        return self.chain.latency
+
+    @property
+    def switching(self):
+        """True while a switch is queued or fading"""
+        return self._pending is not self._taken or self._next is not None
+
+    def request(self, spec, wait=0.0):
+        """Build the chain for `spec` here and queue it for the audio thread
+
+        With wait > 0, block up to that many seconds for the fade to finish
+        and return whether it did.
+        """
+        chain = self.make_chain(spec)
+        with self._lock:
+            # Drop the last retired chain here rather than in the callback
+            self._retired = None
+            self._requested = time.perf_counter()
+            # A newer request replaces one the callback has not picked up yet
+            self._pending = (spec, chain)
+        deadline = time.monotonic() + wait
+        while self.switching and time.monotonic() < deadline:
+            time.sleep(0.001)
+        return not self.switching
+
+    def process(self, audio, out=None):
+        """Run the active chain, crossfading into a newly requested one"""
+        n = len(audio)
+        if out is None:
+            out = np.empty(audio.shape, dtype=np.float32)
+        if n > self.block_size:
+            self._allocate(n)
+
+        # Only start a new fade once the previous one is complete. The slot
+        # is never cleared here, so a request racing this read is not lost.
+        pending = self._pending
+        if self._next is None and pending is not self._taken:
+            self._taken = pending
+            self.spec, self._next = pending
+            self._fade_pos = 0
+            if self._held:
+                held = self._previous[:self._held]
+                self._next.process(held, out=self._tmp[:self._held])
+        # Kept before the chain runs, out may be the input buffer
+        np.copyto(self._previous[:n], audio)
+        self._held = n
+
+        self.chain.process(audio, out=out)
+        if self._next is None:
+            return out
+
+        new = self._tmp[:n]
+        self._next.process(audio, out=new)
+        # out += (new - out) * ramp
+        gain = self._ramp[self._fade_pos:self._fade_pos + n]
+        np.subtract(new, out, out=new)
+        np.multiply(new, gain, out=new)
+        np.add(out, new, out=out)
+        self._fade_pos += n
+
+        if self._fade_pos >= self.crossfade:
+            self._finish()
+        return out
+
+    def idle(self, audio):
+        """Called by a gate instead of process() while the effect is not heard
+
+        A queued switch is made on the spot, there is nothing to crossfade.
+        The gate pre-rolls the chain when speech resumes, which primes it.
+        """
+        self._held = 0
+        if self._next is not None:
+            self._finish()
+            return
+        pending = self._pending
+        if pending is not self._taken:
+            self._taken = pending
+            self.spec, self._next = pending
+            self._finish()
+
+    def _finish(self):
+        """Make the incoming chain the active one"""
+        # Freed by the next request() instead of in this callback
+        self._retired = self.chain
+        self.chain = self._next
+        self._next = None
+        self.switches += 1
+        self.switch_ms = (time.perf_counter() - self._requested) * 1000
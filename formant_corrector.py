@@ -0,0 +1,245 @@
+"""
+Streaming formant correction for pitch-shifted audio
+Puts the spectral envelope back where it was before the shift, so a shifted
+voice sounds like a different voice rather than a sped-up tape
+"""
+import math
+import numpy as np
+
+HOP = 256           # Largest hop; the hop used divides the block size if it can
+LIFTER_MS = 1.0     # Cepstral cutoff, below the pitch period of a raised voice
+MAX_GAIN_DB = 24.0  # Correction limit either way, keeps noise floors from blowing up
+FLOOR = 1e-6        # Magnitude floor before the log
+
+
+def _fft_takes_out():
+    """np.fft gained out= in NumPy 2.0"""
+    try:
+        np.fft.rfft(np.zeros(4), out=np.empty(3, dtype=np.complex128))
+    except TypeError:
+        return False
+    return True
+
+
+FFT_OUT = _fft_takes_out()
+
+
+class FormantCorrector:
+    """STFT envelope correction that undoes the formant shift of a pitch ratio
+
+    A pitch shift by `ratio` moves the spectral envelope to E(f / ratio).
+    Every frame's envelope is estimated from the liftered real cepstrum and
+    the frame is multiplied by E(ratio * f) / E(f), which moves the formants
+    back while the harmonics (the pitch) stay where they are.
+
+    Frames are 4 hops long with Hann analysis and synthesis windows. All
+    hops that complete in one call go through together: every step (rfft,
+    log magnitude, cepstrum, envelope, warp, irfft) is one NumPy call on a
+    (hops, channels, bins) array, writing into buffers sized once. The
+    spectral work is float64 because NumPy's float32 FFT allocates a work
+    copy on every call. NumPy before 2.0 has no out= on its FFTs, so there
+    the four transforms allocate their results and are copied in.
+
+    The hop is the largest divisor of the block size up to HOP, so a full
+    block always completes whole hops and needs no extra buffering; the delay
+    is then frame - hop samples. Other block sizes get a little priming.
+    """
+
+    def __init__(self, ratio=1.0, block_size=1024, samplerate=48000, channels=1,
+                 hop=HOP, lifter_ms=LIFTER_MS, max_gain_db=MAX_GAIN_DB):
+        self.ratio = float(ratio)
+        self.samplerate = int(samplerate)
+        self.channels = int(channels)
+        self.max_hop = int(hop)
+        self.lifter_ms = lifter_ms
+        self.max_log_gain = max_gain_db / 20 * math.log(10)
+        self.gain = 1.0
+        self.fft_out = FFT_OUT
+        self._allocate(int(block_size))
+
+    def _allocate(self, block_size):
+        """Pick the hop for this block size and size every buffer once"""
+        self.block_size = block_size
+        divisors = [d for d in range(self.max_hop // 4, self.max_hop + 1) if block_size % d == 0]
+        self.hop = hop = max(divisors) if divisors else self.max_hop
+        self.frame = frame = 4 * hop
+        bins = frame // 2 + 1
+        channels = self.channels
+        # Blocks that are not whole hops start this far behind, so they never run dry
+        self._priming = hop - math.gcd(block_size, hop)
+        max_hops = (block_size + hop - 1) // hop
+
+        # Periodic Hann windows; their squares overlap-add to 1.5 at 4 hops a frame
+        window = 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(frame) / frame)
+        self._analysis = window
+        # Per-frame weights tiled to full size, broadcasting in a ufunc allocates
+        self._synthesis = np.tile(window / 1.5 * self.gain, (max_hops, channels, 1))
+
+        # Keep the quefrencies below the cutoff (and their mirror images)
+        cutoff = max(2, min(bins - 1, round(self.samplerate * self.lifter_ms / 1000)))
+        lifter = np.zeros(frame)
+        lifter[:cutoff] = 1.0
+        lifter[frame - cutoff + 1:] = 1.0
+        lifter = np.tile(lifter, (max_hops, channels, 1))
+
+        # Envelope read at ratio * f, linear between bins, held at Nyquist
+        pos = np.minimum(np.arange(bins) * self.ratio, bins - 1)
+        self._idx0 = np.floor(pos).astype(np.intp)
+        self._idx1 = np.minimum(self._idx0 + 1, bins - 1)
+        frac = np.tile(pos - self._idx0, (max_hops * channels, 1))
+
+        # Input history and overlap-add accumulator, two of each swapped per call
+        # (shifting in place would overlap, and NumPy would buffer the copy)
+        self._in = [np.zeros((channels, frame + block_size)) for _ in range(2)]
+        self._ola = [np.zeros((channels, frame + 2 * (block_size + hop))) for _ in range(2)]
+        # Hops first, so the first h hops of every buffer are contiguous
+        shape = (max_hops, channels, bins)
+        frames = np.empty((max_hops, channels, frame))
+        spec = np.empty(shape, dtype=np.complex128)
+        env_spec = np.empty(shape, dtype=np.complex128)
+        # Complex with a zero imaginary part, so irfft takes it without a copy
+        log_spec = np.zeros(shape, dtype=np.complex128)
+        env = np.empty(shape)
+        warped = np.empty(shape)
+        upper = np.empty(shape)
+        power = np.empty(shape)
+        energy = np.empty((max_hops * channels, 2))
+        # Every view a call with h hops needs, so a call creates none
+        rows = lambda buf, h: buf[:h].reshape(h * channels, bins)
+        self._hop_views = [None] + [(
+            frames[:h], spec[:h], spec[:h].real, spec[:h].imag, env_spec[:h],
+            env_spec[:h].real, log_spec[:h], log_spec[:h].real,
+            env[:h], rows(env, h), warped[:h], rows(warped, h), rows(upper, h),
+            frac[:h * channels], lifter[:h], self._synthesis[:h], power[:h], rows(power, h),
+            energy[:h * channels, 0], energy[:h * channels, 1], energy[:h * channels, :1],
+        ) for h in range(1, max_hops + 1)]
+        self.reset()
+
+    def reset(self):
+        """Forget all buffered audio"""
+        for buf in self._in + self._ola:
+            buf.fill(0)
+        self._side = 0
+        # History of frame - hop samples, then room for new input
+        self._have = self.frame - self.hop
+        self._ready = self._priming
+
+    @property
+    def latency(self):
+        """Delay added by the corrector, in samples"""
+        if self.ratio == 1.0:
+            return 0
+        return self.frame - self.hop + self._priming
+
+    def absorb_gain(self, gain):
+        """Fold a gain into the synthesis window"""
+        self.gain *= gain
+        np.multiply(self._synthesis, gain, out=self._synthesis)
+
+    def _rfft(self, frames, out):
+        if self.fft_out:
+            np.fft.rfft(frames, axis=-1, out=out)
+        else:
+            np.copyto(out, np.fft.rfft(frames, axis=-1))
+
+    def _irfft(self, spec, out):
+        if self.fft_out:
+            np.fft.irfft(spec, n=self.frame, axis=-1, out=out)
+        else:
+            np.copyto(out, np.fft.irfft(spec, n=self.frame, axis=-1))
+
+    def _correct(self, views):
+        """Envelope-correct the windowed frames, in place"""
+        (frames, spec, re, im, env_spec, env_re, log_spec, log_mag,
+         env_hops, env, gain, warped, upper, frac, lifter, synthesis, power_hops, power,
+         before, after, scale) = views
+        self._rfft(frames, spec)
+
+        # Smooth log envelope: low quefrencies of the real cepstrum
+        np.abs(spec, out=log_mag)
+        np.square(log_mag, out=power_hops)
+        np.maximum(log_mag, FLOOR, out=log_mag)
+        np.log(log_mag, out=log_mag)
+        self._irfft(log_spec, frames)
+        np.multiply(frames, lifter, out=frames)
+        self._rfft(frames, env_spec)
+        np.copyto(env_hops, env_re)
+
+        # Log gain = envelope at ratio * f minus envelope at f
+        # (mode='clip' keeps np.take from buffering `out`)
+        np.take(env, self._idx0, axis=1, out=warped, mode='clip')
+        np.take(env, self._idx1, axis=1, out=upper, mode='clip')
+        np.subtract(upper, warped, out=upper)
+        np.multiply(upper, frac, out=upper)
+        np.add(warped, upper, out=warped)
+        np.subtract(warped, env, out=warped)
+        np.clip(warped, -self.max_log_gain, self.max_log_gain, out=warped)
+        np.exp(warped, out=warped)
+
+        # Keep each frame's energy, only its spectral balance changes
+        np.add.reduce(power, axis=1, out=before)
+        np.multiply(warped, warped, out=upper)
+        np.multiply(upper, power, out=upper)
+        np.add.reduce(upper, axis=1, out=after)
+        np.maximum(after, FLOOR * FLOOR, out=after)
+        np.divide(before, after, out=before)
+        np.sqrt(before, out=before)
+        # Filled rather than broadcast, broadcasting in a ufunc allocates
+        np.copyto(upper, scale)
+        np.multiply(warped, upper, out=warped)
+        np.multiply(re, gain, out=re)
+        np.multiply(im, gain, out=im)
+
+        self._irfft(spec, frames)
+        np.multiply(frames, synthesis, out=frames)
+
+    def process(self, audio, out=None):
+        """Correct one block, returning exactly len(audio) frames"""
+        n = len(audio)
+        if n > self.block_size:
+            self._allocate(n)
+        if out is None:
+            out = np.empty(audio.shape, dtype=np.float32)
+        if self.ratio == 1.0:
+            np.copyto(out.reshape(n, self.channels), audio.reshape(n, self.channels))
+            return out
+
+        side, hop, frame = self._side, self.hop, self.frame
+        src, ola = self._in[side], self._ola[side]
+        have = self._have
+        # No views of the block are held across the FFTs, they would add to the peak
+        np.copyto(src[:, have:have + n], audio.reshape(n, self.channels).T)
+        have += n
+        hops = (have - (frame - hop)) // hop
+        ready = self._ready
+        if hops:
+            views = self._hop_views[hops]
+            frames = views[0]
+            for h in range(hops):
+                np.multiply(src[:, h * hop:h * hop + frame], self._analysis, out=frames[h])
+            self._correct(views)
+            for h in range(hops):
+                region = ola[:, ready:ready + frame]
+                np.add(region, frames[h], out=region)
+                ready += hop
+
+        # Only blocks shorter than the stream's can find too little ready
+        emit = min(n, ready)
+        target = out.reshape(n, self.channels)
+        np.copyto(target[:emit], ola[:, :emit].T)
+        if emit < n:
+            target[emit:] = 0
+
+        # Move what is left to the front of the other buffers
+        consumed = hops * hop
+        keep = have - consumed
+        other = 1 - side
+        np.copyto(self._in[other][:, :keep], src[:, consumed:have])
+        tail = ready - emit + frame - hop
+        dst = self._ola[other]
+        np.copyto(dst[:, :tail], ola[:, emit:emit + tail])
+        dst[:, tail:].fill(0)
+        self._side = other
+        self._have = keep
+        self._ready = ready - emit
+        return out
@@ -2,7 +2,7 @@
 Detailed audio device inspection for Android
 Shows all available audio APIs and devices
 """
-import sounddevice as sd
+from audio_backend import sd
 
 print("=== Detailed Audio Device Inspection ===\n")
 
@@ -0,0 +1,141 @@
+"""
+Hot-path timing for audio callbacks
+The audio thread only writes numbers into preallocated arrays; a reporter
+thread turns them into p50/p99/max lines and a JSON summary.
+"""
+import json
+import threading
+import time
+import numpy as np
+
+STATUS_FLAGS = ('input_overflow', 'input_underflow', 'output_overflow', 'output_underflow')
+HISTOGRAM_BINS = 20  # Buckets of 10% of the block deadline, the last one is >= 190%
+
+
+class CallbackMonitor:
+    """Records processing time, deadline load and status flags per callback"""
+
+    def __init__(self, samplerate, blocksize, capacity=8192):
+        self.samplerate = float(samplerate)
+        self.blocksize = int(blocksize)
+        self.capacity = int(capacity)
+        self.times = np.zeros(self.capacity, dtype=np.float64)   # Seconds, ring
+        self.histogram = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+        self.flags = np.zeros(len(STATUS_FLAGS), dtype=np.int64)
+        self.count = 0
+        self.deadline_misses = 0
+        self.max_time = 0.0
+        self.total_time = 0.0
+        self.total_budget = 0.0
+        self.first_call = None  # perf_counter() when the first callback returned
+
+    def record(self, elapsed, frames, status=None):
+        """Store one callback's timing (audio thread, no allocation, no I/O)"""
+        budget = frames / self.samplerate
+        load = elapsed / budget
+        self.times[self.count % self.capacity] = elapsed
+        self.histogram[min(int(load * 10), HISTOGRAM_BINS - 1)] += 1
+        if load > 1.0:
+            self.deadline_misses += 1
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+        self.total_time += elapsed
+        self.total_budget += budget
+        if status:
+            for i, name in enumerate(STATUS_FLAGS):
+                if getattr(status, name, False):
+                    self.flags[i] += 1
+        self.count += 1
+
+    def wrap(self, callback):
+        """Return a callback that times `callback` and records its status"""
+        perf_counter = time.perf_counter
+
+        def timed_callback(indata, outdata, frames, time_info, status):
+            start = perf_counter()
+            callback(indata, outdata, frames, time_info, status)
+            end = perf_counter()
+            if self.first_call is None:
+                self.first_call = end
+            self.record(end - start, frames, status)
+
+        return timed_callback
+
+    def samples(self, since=0):
+        """Copy of the timings recorded since callback number `since`"""
+        count = self.count
+        since = max(since, count - self.capacity)
+        idx = np.arange(since, count) % self.capacity
+        return self.times[idx]
+
+    def summary(self, since=0):
+        """Percentiles in ms plus load, xrun and histogram totals"""
+        times = self.samples(since) * 1000
+        budget_ms = self.blocksize / self.samplerate * 1000
+        summary = {
+            'callbacks': self.count,
+            'budget_ms': budget_ms,
+            'p50_ms': float(np.percentile(times, 50)) if len(times) else 0.0,
+            'p99_ms': float(np.percentile(times, 99)) if len(times) else 0.0,
+            'max_ms': float(times.max()) if len(times) else 0.0,
+            'mean_load': self.total_time / self.total_budget if self.total_budget else 0.0,
+            'deadline_misses': self.deadline_misses,
+            'histogram_pct_of_budget': {
+                f"{i * 10}-{i * 10 + 10}" if i < HISTOGRAM_BINS - 1 else f">={i * 10}": int(n)
+                for i, n in enumerate(self.histogram) if n
+            },
+        }
+        summary.update({name: int(n) for name, n in zip(STATUS_FLAGS, self.flags)})
+        return summary
+
+
+def format_summary(summary):
+    """One-line report"""
+    return (f"p50 {summary['p50_ms']:.2f} ms, p99 {summary['p99_ms']:.2f} ms, "
+            f"max {summary['max_ms']:.2f} ms of {summary['budget_ms']:.1f} ms budget | "
+            f"overflows {summary['input_overflow']}, underflows {summary['output_underflow']}, "
+            f"late {summary['deadline_misses']}")
+
+
+class StatsReporter:
+    """Background thread that prints periodic stats and dumps JSON at the end"""
+
+    def __init__(self, monitor, interval=5.0, json_path=None, emit=print):
+        self.monitor = monitor
+        self.interval = interval
+        self.json_path = json_path
+        self.emit = emit
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval:
+            self._thread = threading.Thread(target=self._run, name="stats-reporter", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        since = 0
+        while not self._stop.wait(self.interval):
+            count = self.monitor.count
+            if count > since:
+                self.emit(f"[stats] {format_summary(self.monitor.summary(since))}")
+            since = count
+
+    def stop(self):
+        """Stop reporting and return the summary for the whole run"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        summary = self.monitor.summary()
+        if self.json_path:
+            with open(self.json_path, 'w') as f:
+                json.dump(summary, f, indent=2)
+        return summary
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,101 @@
+"""
+Cache of precomputed resampling tables for the block-based pitch shifters
+A table only depends on block length, shift factor and dtype, so it is built once
+"""
+from collections import OrderedDict
+import numpy as np
+
+
+class InterpTable:
+    """Integer gather indices plus fractional weights for one resampling"""
+
+    def __init__(self, idx0, idx1, frac):
+        self.idx0 = idx0
+        self.idx1 = idx1
+        self.frac = frac
+        # Scratch for the second gather, in the table's dtype so nothing promotes
+        self._diff = np.empty(len(idx0), dtype=frac.dtype) if idx1 is not None else None
+
+    def __len__(self):
+        return len(self.idx0)
+
+    def apply(self, audio, out=None):
+        """Gather and blend: out = a[i0] + frac * (a[i1] - a[i0])"""
+        if out is None:
+            out = np.empty(len(self), dtype=self.frac.dtype)
+        if self.idx1 is None:
+            # Nearest-neighbour table, plain gather
+            return np.take(audio, self.idx0, out=out, mode='clip')
+        diff = np.take(audio, self.idx1, out=self._diff, mode='clip')
+        np.take(audio, self.idx0, out=out, mode='clip')
+        np.subtract(diff, out, out=diff)
+        np.multiply(diff, self.frac, out=diff)
+        np.add(out, diff, out=out)
+        return out
+
+
+def build_linear_table(frames, factor, dtype):
+    """Table matching np.interp over np.linspace(0, frames - 1, frames / factor)"""
+    num_samples = int(frames / factor)
+    positions = np.linspace(0, frames - 1, num_samples)
+    idx0 = np.floor(positions).astype(np.intp)
+    idx1 = np.minimum(idx0 + 1, frames - 1)
+    frac = (positions - idx0).astype(dtype)
+    return InterpTable(idx0, idx1, frac)
+
+
+def build_nearest_table(frames, factor, dtype):
+    """Table matching the rounded np.arange(0, frames, factor) decimation"""
+    indices = np.round(np.arange(0, frames, factor))
+    indices = indices[indices < frames].astype(np.intp)
+    return InterpTable(indices, None, np.zeros(0, dtype=dtype))
+
+
+BUILDERS = {
+    'linear': build_linear_table,
+    'nearest': build_nearest_table,
+}
+
+
+class InterpTableCache:
+    """Small LRU cache of InterpTables keyed by (frames, factor, dtype, kind)"""
+
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self._tables = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, frames, factor, dtype=np.float32, kind='linear'):
+        """Return the table for this block, building it on first use"""
+        key = (int(frames), float(factor), np.dtype(dtype).str, kind)
+        table = self._tables.get(key)
+        if table is not None:
+            self.hits += 1
+            self._tables.move_to_end(key)
+            return table
+
+        self.misses += 1
+        table = BUILDERS[kind](int(frames), float(factor), dtype)
+        self._tables[key] = table
+        if len(self._tables) > self.maxsize:
+            self._tables.popitem(last=False)
+        return table
+
+    def invalidate(self):
+        """Drop every table, call when the effect or block size changes"""
+        self._tables.clear()
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._tables),
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+# Shared cache used by the scripts
+tables = InterpTableCache()
@@ -1,17 +1,22 @@
-import sounddevice as sd
+from audio_backend import sd
 import numpy as np
-from scipy import signal
+from interp_tables import tables
 
 # Parameters
 PITCH_SHIFT = 1.5  # 1.5 = higher pitch, 0.7 = lower pitch
 BLOCK_SIZE = 1024
 SAMPLE_RATE = 44100
 
+# Output of the last table, reused until the table changes
+shifted = np.zeros(0, dtype=np.float32)
+
 def pitch_shift(data, factor):
     """Simple pitch shifting using resampling"""
-    indices = np.round(np.arange(0, len(data), factor))
-    indices = indices[indices < len(data)].astype(int)
-    return data[indices]
+    global shifted
+    table = tables.get(len(data), factor, data.dtype, kind='nearest')
+    if len(shifted) != len(table) or shifted.dtype != data.dtype:
+        shifted = np.empty(len(table), dtype=data.dtype)
+    return table.apply(data, out=shifted)
 
 def callback(indata, outdata, frames, time, status):
     if status:
@@ -21,22 +26,25 @@ def callback(indata, outdata, frames, time, status):
     audio = indata[:, 0]
 
     # Apply pitch shift
-    shifted = pitch_shift(audio, 1/PITCH_SHIFT)
-
-    # Resize to match output
-    if len(shifted) < frames:
-        shifted = np.pad(shifted, (0, frames - len(shifted)))
-    else:
-        shifted = shifted[:frames]
-
-    # Write to output (both channels)
-    outdata[:, 0] = shifted
-    outdata[:, 1] = shifted
-
-# Start streaming
-with sd.Stream(samplerate=SAMPLE_RATE,
-               blocksize=BLOCK_SIZE,
-               channels=2,
-               callback=callback):
-    print("Voice changer running... Press Ctrl+C to stop")
-    sd.sleep(1000000)
+    result = pitch_shift(audio, 1/PITCH_SHIFT)
+
+    # Truncate or zero-fill to match output (both channels)
+    n = min(len(result), frames)
+    outdata[:n, 0] = result[:n]
+    outdata[n:, 0] = 0
+    outdata[:, 1] = outdata[:, 0]
+
+if __name__ == "__main__":
+    # Start streaming
+    try:
+        with sd.Stream(samplerate=SAMPLE_RATE,
+                       blocksize=BLOCK_SIZE,
+                       channels=2,
+                       callback=callback):
+            print("Voice changer running... Press Ctrl+C to stop")
+            sd.sleep(1000000)
+    except KeyboardInterrupt:
+        pass
+    stats = tables.stats()
+    print(f"Interpolation tables: {stats['hits']} hits, {stats['misses']} misses "
+          f"({stats['hit_rate'] * 100:.1f}% hit rate)")
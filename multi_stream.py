@@ -0,0 +1,352 @@
+"""
+Run several voice changers, one per input/output pair, in one process
+Streams on the same preset are stacked side by side into one (frames,
+channels) block and processed by a single chain call per tick.
+
+    python multi_stream.py --stream 0 0 Robot --stream 1 1 Demon
+    python multi_stream.py --scaling --preset Demon
+"""
+import argparse
+import threading
+import time
+import numpy as np
+from effect_chain import PRESETS, build_chain
+from ring_buffer import BlockRingBuffer
+
+SAMPLE_RATE = 48000
+BLOCK_SIZE = 512
+LATENCY_BLOCKS = 2   # Blocks each stream's output runs behind its input
+STREAM_COUNTS = (1, 2, 4, 8, 16)
+
+
+class Lane:
+    """One stream's rings, channel layout and counters
+
+    The audio callbacks only move blocks in and out of the rings, like
+    PipelinedProcessor. The effect runs on `channels` channels: extra input
+    channels are dropped and outputs cycle through the processed ones.
+    """
+
+    def __init__(self, name, preset, block_size, in_channels=1, out_channels=1,
+                 channels=None, latency_blocks=LATENCY_BLOCKS, wake=None):
+        self.name = name
+        self.preset = preset
+        self.in_channels = int(in_channels)
+        self.out_channels = int(out_channels)
+        self.channels = int(channels or min(self.in_channels, self.out_channels))
+        if self.channels > self.in_channels:
+            raise ValueError(f"{name}: {self.channels} effect channels from "
+                             f"{self.in_channels} input channels")
+        self.latency_blocks = int(latency_blocks)
+        self._input = BlockRingBuffer(self.latency_blocks * 2, block_size, self.in_channels)
+        self._output = BlockRingBuffer(self.latency_blocks * 2, block_size, self.out_channels)
+        self._out_map = np.arange(self.out_channels) % self.channels
+        self._wake = wake
+        self.columns = slice(0, self.channels)  # Set by the group it joins
+        self.processed = 0
+        self.overruns = 0
+        self.underruns = 0
+        self.stalls = 0      # Ticks that ran without a block from this stream
+        self.dropped = 0     # Processed blocks its output had no room for
+        self.cpu = 0.0       # Worker CPU seconds spent on this stream
+
+    def prime(self):
+        """Queue the output's head start of silence"""
+        for _ in range(self.latency_blocks):
+            self._output.write_slot().fill(0)
+            self._output.commit_write()
+
+    # Audio threads
+
+    def input_callback(self, indata, frames, time, status):
+        if not self._input.push(indata):
+            self.overruns += 1
+        if self._wake is not None:
+            self._wake.set()
+
+    def output_callback(self, outdata, frames, time, status):
+        if not self._output.pop(outdata):
+            self.underruns += 1
+            outdata.fill(0)
+
+    def callback(self, indata, outdata, frames, time, status):
+        """Duplex sounddevice callback"""
+        self.input_callback(indata, frames, time, status)
+        self.output_callback(outdata, frames, time, status)
+
+    # Worker thread
+
+    def gather(self, stack):
+        """Copy the next input block into this lane's columns, False if none is queued"""
+        block = self._input.read_slot()
+        if block is None:
+            stack[:, self.columns] = 0
+            self.stalls += 1
+            return False
+        frames = len(block)
+        np.copyto(stack[:frames, self.columns], block[:, :self.channels])
+        if frames < len(stack):
+            stack[frames:, self.columns] = 0
+        self._input.commit_read()
+        return True
+
+    def scatter(self, wet):
+        """Fan this lane's processed columns out into its output ring"""
+        slot = self._output.write_slot()
+        if slot is None:
+            self.dropped += 1
+            return
+        np.take(wet[:, self.columns], self._out_map, axis=1, out=slot, mode='wrap')
+        self._output.commit_write()
+        self.processed += 1
+
+    def stats(self, block_seconds):
+        budget = self.processed * block_seconds
+        return {
+            'name': self.name,
+            'preset': self.preset,
+            'channels': (self.in_channels, self.channels, self.out_channels),
+            'processed': self.processed,
+            'overruns': self.overruns,
+            'underruns': self.underruns,
+            'stalls': self.stalls,
+            'dropped': self.dropped,
+            'cpu_pct': self.cpu / budget * 100 if budget else 0.0,
+        }
+
+
+class PresetGroup:
+    """Every lane on one preset, processed as one wide chain"""
+
+    def __init__(self, preset, lanes, block_size, samplerate):
+        self.preset = preset
+        self.lanes = lanes
+        offset = 0
+        for lane in lanes:
+            lane.columns = slice(offset, offset + lane.channels)
+            offset += lane.channels
+        self.channels = offset
+        self.chain = build_chain(PRESETS[preset], block_size, samplerate, channels=offset,
+                                 groups=[lane.channels for lane in lanes])
+        self._stack = np.zeros((block_size, offset), dtype=np.float32)
+        self._wet = np.zeros((block_size, offset), dtype=np.float32)
+
+    def process(self, clock=time.thread_time):
+        """Gather, run the chain once and scatter; the chain's CPU is split by channels"""
+        for lane in self.lanes:
+            start = clock()
+            lane.gather(self._stack)
+            lane.cpu += clock() - start
+        start = clock()
+        self.chain.process(self._stack, out=self._wet)
+        share = (clock() - start) / self.channels
+        for lane in self.lanes:
+            start = clock()
+            lane.scatter(self._wet)
+            lane.cpu += clock() - start + share * lane.channels
+
+
+class MultiStreamServer:
+    """Many independent streams, one DSP worker thread
+
+    add() a lane per input/output pair before start(). The worker runs a
+    tick once every lane has a block queued; a lane that stops delivering
+    holds the others up for at most `latency_blocks` blocks, after which the
+    tick runs with silence in its columns and counts a stall. With
+    stack=False every lane gets its own chain, for comparison.
+    """
+
+    def __init__(self, block_size=BLOCK_SIZE, samplerate=SAMPLE_RATE,
+                 latency_blocks=LATENCY_BLOCKS, stack=True):
+        self.block_size = int(block_size)
+        self.samplerate = int(samplerate)
+        self.latency_blocks = int(latency_blocks)
+        self.stack = stack
+        self.lanes = []
+        self.groups = []
+        self.ticks = 0
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def add(self, name, preset, in_channels=1, out_channels=1, channels=None):
+        """New lane for one stream pair, call before start()"""
+        if preset not in PRESETS:
+            raise ValueError(f"Unknown preset {preset!r}, choose from {', '.join(PRESETS)}")
+        lane = Lane(name, preset, self.block_size, in_channels, out_channels, channels,
+                    self.latency_blocks, self._wake)
+        self.lanes.append(lane)
+        self._group()
+        return lane
+
+    def _group(self):
+        presets = {}
+        for lane in self.lanes:
+            key = lane.preset if self.stack else lane.name
+            presets.setdefault(key, []).append(lane)
+        self.groups = [PresetGroup(lanes[0].preset, lanes, self.block_size, self.samplerate)
+                       for lanes in presets.values()]
+
+    def ready(self):
+        """True when a tick should run now"""
+        queued = [len(lane._input) for lane in self.lanes]
+        return bool(queued) and (min(queued) > 0 or max(queued) >= self.latency_blocks)
+
+    def pump(self):
+        """Run every tick that is ready, returns how many ran"""
+        ticks = 0
+        while self.ready():
+            for group in self.groups:
+                group.process()
+            ticks += 1
+        self.ticks += ticks
+        return ticks
+
+    def start(self):
+        for lane in self.lanes:
+            lane.prime()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="multi-stream-dsp", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        while self._running:
+            self._wake.wait(0.1)
+            self._wake.clear()
+            self.pump()
+
+    def stats(self):
+        block_seconds = self.block_size / self.samplerate
+        lanes = [lane.stats(block_seconds) for lane in self.lanes]
+        return {
+            'ticks': self.ticks,
+            'groups': [(g.preset, len(g.lanes), g.channels) for g in self.groups],
+            'lanes': lanes,
+            'cpu_pct': sum(lane['cpu_pct'] for lane in lanes),
+        }
+
+
+def format_stats(stats):
+    """Per-stream table for printing after the streams stop"""
+    lines = [f"{'stream':<12} {'preset':<22} {'in/fx/out ch':>12} {'blocks':>7} "
+             f"{'CPU %':>6} {'stalls':>6} {'over':>5} {'under':>5}"]
+    for lane in stats['lanes']:
+        channels = '/'.join(map(str, lane['channels']))
+        lines.append(f"{lane['name']:<12} {lane['preset']:<22} {channels:>12} "
+                     f"{lane['processed']:>7} {lane['cpu_pct']:>6.2f} {lane['stalls']:>6} "
+                     f"{lane['overruns']:>5} {lane['underruns']:>5}")
+    groups = ', '.join(f"{preset} x{n} ({ch} ch)" for preset, n, ch in stats['groups'])
+    lines.append(f"{stats['ticks']} ticks, {len(stats['groups'])} chain calls per tick: {groups}")
+    lines.append(f"Total DSP CPU: {stats['cpu_pct']:.2f}% of one core")
+    return '\n'.join(lines)
+
+
+# Scaling
+
+def scaling(preset, counts=STREAM_COUNTS, block_size=BLOCK_SIZE, samplerate=SAMPLE_RATE,
+            blocks=200):
+    """Per-stream CPU with 1-16 stereo streams, stacked and one chain each"""
+    from synthetic import speech_like
+    speech = speech_like(blocks * block_size / samplerate, samplerate)
+    audio = np.repeat(speech[:, np.newaxis], 2, axis=1).reshape(blocks, block_size, 2)
+    outdata = np.empty((block_size, 2), dtype=np.float32)
+    results = []
+    for count in counts:
+        row = {'streams': count}
+        for mode, stack in (('stacked', True), ('separate', False)):
+            server = MultiStreamServer(block_size, samplerate, stack=stack)
+            lanes = [server.add(f"s{i}", preset, 2, 2) for i in range(count)]
+            for lane in lanes:
+                lane.prime()
+            start = time.thread_time()
+            for block in audio:
+                for lane in lanes:
+                    lane.callback(block, outdata, block_size, None, None)
+                server.pump()
+            cpu = time.thread_time() - start
+            row[f'{mode}_pct'] = cpu / (blocks * block_size / samplerate) / count * 100
+        row['speedup'] = row['separate_pct'] / row['stacked_pct']
+        results.append(row)
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--stream', action='append', nargs=3, metavar=('IN', 'OUT', 'PRESET'),
+                        help="input device, output device and preset for one stream")
+    parser.add_argument('--block-size', '-b', type=int, default=BLOCK_SIZE)
+    parser.add_argument('--samplerate', '-r', type=int, default=SAMPLE_RATE)
+    parser.add_argument('--seconds', type=float, help="stop after this long (default: Enter)")
+    parser.add_argument('--scaling', action='store_true',
+                        help="measure per-stream CPU for 1-16 streams instead of running")
+    parser.add_argument('--preset', default='Demon', choices=list(PRESETS),
+                        help="preset for --scaling (default Demon)")
+    return parser.parse_args()
+
+
+def serve(streams, block_size, samplerate, seconds=None):
+    """Open every stream pair and run them until Enter (or `seconds`)"""
+    import contextlib
+    from audio_backend import sd
+    from device_probe import open_streams
+
+    server = MultiStreamServer(block_size, samplerate)
+    pairs = []
+    for number, (input_device, output_device, preset) in enumerate(streams, 1):
+        input_device, output_device = int(input_device), int(output_device)
+        in_ch = min(2, sd.query_devices(input_device)['max_input_channels'])
+        out_ch = min(2, sd.query_devices(output_device)['max_output_channels'])
+        lane = server.add(f"#{number} {input_device}->{output_device}", preset, in_ch, out_ch)
+        pairs.append((input_device, output_device, lane))
+        print(f"✓ Stream {number}: [{input_device}] -> [{output_device}], {preset}, "
+              f"{lane.in_channels} in / {lane.channels} fx / {lane.out_channels} out")
+
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(server)
+        for input_device, output_device, lane in pairs:
+            # One shared rate, so devices with different defaults need the same setting
+            mode = 'duplex' if input_device == output_device else 'split'
+            config = {'mode': mode, 'samplerate': samplerate, 'output_samplerate': samplerate,
+                      'channels': [lane.in_channels, lane.out_channels]}
+            for stream in open_streams(sd, input_device, output_device, config, block_size,
+                                       lane.callback, lane.input_callback, lane.output_callback):
+                stack.enter_context(stream)
+        print(f"\n🔴 {len(pairs)} streams running, "
+              f"{len(server.groups)} chain calls per block")
+        try:
+            if seconds:
+                time.sleep(seconds)
+            else:
+                input("Press Enter to stop\n")
+        except (KeyboardInterrupt, EOFError):
+            pass
+    print(f"\n{format_stats(server.stats())}")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.scaling:
+        print(f"=== Multi-Stream Scaling ({args.preset}, stereo, {args.block_size} frames) ===\n")
+        print(f"{'streams':>7} {'stacked %/stream':>17} {'separate %/stream':>18} {'speedup':>8}")
+        for row in scaling(args.preset, block_size=args.block_size, samplerate=args.samplerate):
+            print(f"{row['streams']:>7} {row['stacked_pct']:>17.2f} "
+                  f"{row['separate_pct']:>18.2f} {row['speedup']:>7.2f}x")
+    elif args.stream:
+        print("=== Multi-Stream Voice Changer ===\n")
+        serve(args.stream, args.block_size, args.samplerate, args.seconds)
+    else:
+        print("❌ Give at least one --stream IN OUT PRESET, or --scaling")
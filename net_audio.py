@@ -0,0 +1,705 @@
+"""
+Run the effect on another machine: PCM blocks over UDP or TCP
+The capturing side (voice_changer_android.py with REMOTE_DSP set) sends each
+input block with a sequence number; an asyncio server runs the effect and
+sends the block back, where a jitter buffer plays it out in order and
+conceals anything lost.
+
+    python net_audio.py serve --port 9500
+    python net_audio.py loopback --protocol udp --seconds 5
+"""
+import argparse
+import asyncio
+import json
+import math
+import socket
+import struct
+import threading
+from collections import deque
+from time import monotonic, perf_counter
+import numpy as np
+from block_processor import BlockProcessor, int16_to_float32, float32_to_int16
+from effect_chain import PRESETS, build_chain
+
+PORT = 9500
+SAMPLE_RATE = 48000
+BLOCK_SIZE = 512
+MIN_BUFFER = 1       # Jitter buffer floor (blocks)
+MAX_BUFFER = 16      # Jitter buffer ceiling (blocks)
+MAX_CONCEAL = 4      # Blocks a gap may be bridged over before jumping ahead
+CONCEAL_FADE = 0.5   # Gain per repeated block while concealing
+
+# Limits on what a client may ask the server for
+MAX_FRAMES = 4096          # Frames per packet and block_size in a HELLO
+MAX_CHANNELS = 8
+MIN_SAMPLERATE = 8000
+MAX_SAMPLERATE = 192000
+MAX_STAGES = 16            # Stages in a client's effect chain
+MAX_TAPS = 255             # Low-pass filter length, its cost grows with every tap
+MAX_SESSIONS = 64          # Clients served at once
+SESSION_TIMEOUT = 30.0     # Seconds without packets before a UDP session is dropped
+HELLO_INTERVAL = 0.25      # Seconds between HELLO resends until the server answers
+
+# Per stage: required argument count, then (low, high) for each argument in
+# order; a high of None means below the Nyquist frequency
+STAGE_LIMITS = {
+    'gain': (0, [(0.0, 16.0)]),
+    'pitch': (1, [(0.25, 4.0), (64, MAX_FRAMES)]),
+    'formant': (1, [(0.25, 4.0)]),
+    'stretch': (1, [(0.25, 4.0), (64, MAX_FRAMES), (0, 4 * MAX_FRAMES)]),
+    'ringmod': (0, [(0.0, None), (0.0, 1.0)]),
+    'suboctave': (0, [(0.0, 1.0), (64, MAX_FRAMES)]),
+    'distort': (0, [(0.01, 100.0)]),
+    'lowpass': (0, [(1.0, None), (1, MAX_TAPS)]),
+}
+
+# Packet: magic, kind, channels, frames, sequence, sender timestamp (echoed back)
+HEADER = struct.Struct('<4sBBHId')
+MAGIC = b'VCN1'
+AUDIO = 0   # int16 PCM payload, frames x channels
+HELLO = 1   # JSON settings payload, `frames` holds its length
+
+
+def pack(kind, seq, sent, payload, frames, channels):
+    return HEADER.pack(MAGIC, kind, channels, frames, seq & 0xFFFFFFFF, sent) + payload
+
+
+def payload_size(kind, frames, channels):
+    return frames * channels * 2 if kind == AUDIO else frames
+
+
+def header_ok(magic, kind, channels, frames):
+    """Whether a header is ours and within the packet limits"""
+    return (magic == MAGIC and kind in (AUDIO, HELLO) and 1 <= channels <= MAX_CHANNELS
+            and (kind == HELLO or frames <= MAX_FRAMES))
+
+
+def unpack(data):
+    """(kind, channels, frames, seq, sent, payload) or None for anything else"""
+    if len(data) < HEADER.size:
+        return None
+    magic, kind, channels, frames, seq, sent = HEADER.unpack_from(data)
+    payload = memoryview(data)[HEADER.size:]
+    if (not header_ok(magic, kind, channels, frames)
+            or len(payload) != payload_size(kind, frames, channels)):
+        return None
+    return kind, channels, frames, seq, sent, payload
+
+
+def _bounded_int(settings, key, default, low, high):
+    value = settings.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, int) or not low <= value <= high:
+        raise ValueError(f"{key} must be an integer from {low} to {high}, got {value!r}")
+    return value
+
+
+def check_stage(stage, samplerate):
+    """ValueError unless `stage` is a known stage with arguments within STAGE_LIMITS"""
+    if not isinstance(stage, (list, tuple)) or not stage or stage[0] not in STAGE_LIMITS:
+        raise ValueError(f"unknown stage {stage!r}")
+    name, *args = stage
+    required, limits = STAGE_LIMITS[name]
+    if not required <= len(args) <= len(limits):
+        raise ValueError(f"{name} takes {required} to {len(limits)} arguments, got {len(args)}")
+    for arg, (low, high) in zip(args, limits):
+        if (isinstance(arg, bool) or not isinstance(arg, (int, float))
+                or not (low <= arg < samplerate / 2 if high is None else low <= arg <= high)):
+            raise ValueError(f"{name} argument {arg!r} is out of range at {samplerate} Hz")
+
+
+def parse_hello(payload, spec, block_size, samplerate):
+    """(spec, block_size, samplerate) from a HELLO payload, ValueError if it is not usable
+
+    Missing settings fall back to the given defaults.
+    """
+    settings = json.loads(bytes(payload))
+    if not isinstance(settings, dict):
+        raise ValueError("HELLO settings must be a JSON object")
+    block_size = _bounded_int(settings, 'block_size', block_size, 1, MAX_FRAMES)
+    samplerate = _bounded_int(settings, 'samplerate', samplerate, MIN_SAMPLERATE, MAX_SAMPLERATE)
+    spec = settings.get('effect', spec)
+    if not isinstance(spec, (list, tuple)) or len(spec) > MAX_STAGES:
+        raise ValueError(f"effect must be a list of at most {MAX_STAGES} stages")
+    for stage in spec:
+        check_stage(stage, samplerate)
+    return spec, block_size, samplerate
+
+
+def conceal(last, out, run):
+    """Packet-loss concealment: repeat the last good block, fading each time"""
+    if run > MAX_CONCEAL:
+        out.fill(0)
+        return
+    np.multiply(last, CONCEAL_FADE ** run, out=out)
+
+
+class JitterBuffer:
+    """Reorders received blocks by sequence number and plays them out evenly
+
+    Playout follows the sender's own clock: the callback that sends block k
+    plays block k - target. The target (in blocks) covers four RFC 3550
+    interarrival jitters of the round trip and grows by one whenever a
+    block arrives too late to play. It shrinks one block at a time only
+    after CALM_BLOCKS arrivals that would fit a smaller buffer. A growing
+    target holds playback for one concealed block, a shrinking one skips a
+    block. Anything missing at play time is concealed, and dropped if it
+    turns up later. The network thread only writes slots and their sequence
+    numbers; the audio thread only advances the play position.
+    """
+
+    CALM_BLOCKS = 200
+
+    def __init__(self, block_size, channels=1, samplerate=SAMPLE_RATE,
+                 min_blocks=MIN_BUFFER, max_blocks=MAX_BUFFER):
+        self.block_seconds = block_size / samplerate
+        self.min_blocks = int(min_blocks)
+        self.max_blocks = int(max_blocks)
+        self.capacity = self.max_blocks * 2
+        self._slots = np.zeros((self.capacity, block_size, channels), dtype=np.float32)
+        self._seqs = np.full(self.capacity, -1, dtype=np.int64)
+        self._last = np.zeros((block_size, channels), dtype=np.float32)
+        self.target = self.min_blocks
+        self.jitter = 0.0       # Seconds, smoothed |change in round trip|
+        self._transit = None
+        self._calm = 0
+        self._next = None       # Sequence number the next pop plays
+        self._run = 0           # Consecutive concealed blocks
+        self.received = 0
+        self.played = 0
+        self.concealed = 0
+        self.late = 0
+        self.skipped = 0
+        self.held = 0
+        self.delay_sum = 0
+
+    # Network thread
+
+    def put(self, seq, pcm, transit):
+        """Store one int16 block; `transit` is its round trip in seconds"""
+        if self._next is not None and seq < self._next:
+            # Already concealed, play later blocks with more headroom
+            self.late += 1
+            self.target = min(self.max_blocks, self.target + 1)
+            self._calm = 0
+            return
+        if self._transit is not None:
+            self.jitter += (abs(transit - self._transit) - self.jitter) / 16
+        self._transit = transit
+        # Blocks of sender time the round trip plus the jitter cover take
+        needed = max(self.min_blocks,
+                     math.ceil((transit + 4 * self.jitter) / self.block_seconds))
+        if needed > self.target:
+            self.target = min(self.max_blocks, needed)
+            self._calm = 0
+        elif needed < self.target:
+            self._calm += 1
+            if self._calm >= self.CALM_BLOCKS:
+                self.target -= 1
+                self._calm = 0
+        slot = seq % self.capacity
+        int16_to_float32(pcm, self._slots[slot, :len(pcm)])
+        self._seqs[slot] = seq
+        self.received += 1
+
+    # Audio thread
+
+    def pop(self, out, sent):
+        """Fill out with the block due now; `sent` is the newest sequence number sent"""
+        frames = len(out)
+        due = sent - self.target
+        if self._next is None:
+            if due < 0:
+                out.fill(0)
+                return False
+            self._next = due
+        elif due > self._next:
+            # Target shrank, skip a block to cut the latency
+            self._next += 1
+            self.skipped += 1
+        elif due < self._next:
+            # Target grew, hold for one block to make room
+            self.held += 1
+            return self._conceal(out, frames, sent)
+        slot = self._next % self.capacity
+        if self._seqs[slot] != self._next:
+            self._next += 1
+            return self._conceal(out, frames, sent)
+        block = self._slots[slot, :frames]
+        np.copyto(out, block)
+        np.copyto(self._last[:frames], block)
+        self._run = 0
+        self._next += 1
+        self.played += 1
+        self.delay_sum += sent - self._next + 1
+        return True
+
+    def _conceal(self, out, frames, sent):
+        self._run += 1
+        conceal(self._last[:frames], out, self._run)
+        self.concealed += 1
+        self.played += 1
+        self.delay_sum += sent - self._next + 1
+        return False
+
+    def stats(self):
+        return {
+            'received': self.received,
+            'played': self.played,
+            'concealed': self.concealed,
+            'late': self.late,
+            'skipped': self.skipped,
+            'held': self.held,
+            'target_blocks': self.target,
+            'mean_delay_blocks': self.delay_sum / self.played if self.played else 0.0,
+            'jitter_ms': self.jitter * 1000,
+        }
+
+
+# Server
+
+class Session:
+    """One client's effect, sequence tracking and uplink concealment"""
+
+    def __init__(self, spec, block_size, samplerate, channels):
+        self.settings = (spec, block_size, samplerate, channels)
+        self.block_size = int(block_size)
+        self.channels = int(channels)
+        chain = build_chain(spec, self.block_size, samplerate, channels=self.channels)
+        self.processor = BlockProcessor(chain, self.block_size, self.channels, self.channels,
+                                        self.channels)
+        shape = (self.block_size, self.channels)
+        self._in = np.zeros(shape, dtype=np.float32)
+        self._last = np.zeros(shape, dtype=np.float32)
+        self._wet = np.zeros(shape, dtype=np.float32)
+        self._pcm = np.zeros(shape, dtype=np.int16)
+        self._scratch = np.zeros(shape, dtype=np.float32)
+        self.expected = None
+        self.processed = 0
+        self.concealed = 0
+        self.late = 0
+        self.last_seen = monotonic()
+
+    def handle(self, seq, sent, pcm, frames):
+        """Replies (seq, sent, payload) for one received block, in order"""
+        replies = []
+        if self.expected is not None and seq < self.expected:
+            # Already concealed when the gap was noticed
+            self.late += 1
+            return replies
+        if self.expected is not None and seq - self.expected <= MAX_CONCEAL:
+            # Bridge a lost uplink block so the effect's state stays continuous
+            for run, missing in enumerate(range(self.expected, seq), 1):
+                conceal(self._last[:frames], self._in[:frames], run)
+                replies.append((missing, sent, self._process(frames)))
+                self.concealed += 1
+        int16_to_float32(pcm, self._in[:frames])
+        np.copyto(self._last[:frames], self._in[:frames])
+        replies.append((seq, sent, self._process(frames)))
+        self.expected = seq + 1
+        return replies
+
+    def _process(self, frames):
+        self.processor.process(self._in[:frames], self._wet[:frames], frames)
+        float32_to_int16(self._wet[:frames], self._pcm[:frames], self._scratch[:frames])
+        self.processed += 1
+        return self._pcm[:frames].tobytes()
+
+
+class AudioServer:
+    """asyncio UDP and TCP server running one effect Session per client
+
+    Packets outside the limits above are rejected before anything is built
+    for them, and a packet that fails while processing only costs its own
+    reply. UDP sessions idle for `session_timeout` seconds are dropped; TCP
+    sessions end with their connection.
+    """
+
+    def __init__(self, preset='Robot', block_size=BLOCK_SIZE, samplerate=SAMPLE_RATE,
+                 max_sessions=MAX_SESSIONS, session_timeout=SESSION_TIMEOUT):
+        self.spec = PRESETS[preset]
+        self.block_size = int(block_size)
+        self.samplerate = int(samplerate)
+        self.max_sessions = int(max_sessions)
+        self.session_timeout = float(session_timeout)
+        self.sessions = {}
+        self.rejected = 0
+        self.errors = 0
+        self.refused = 0
+        self.expired = 0
+        self._swept = monotonic()
+        self._udp = None
+        self._tcp = None
+
+    async def start(self, host='0.0.0.0', port=PORT, udp=True, tcp=True):
+        """Bind and return the (udp, tcp) ports actually in use (port 0 picks free ones)"""
+        loop = asyncio.get_running_loop()
+        udp_port = tcp_port = None
+        if udp:
+            self._udp, _ = await loop.create_datagram_endpoint(
+                lambda: _ServerDatagram(self), local_addr=(host, port))
+            udp_port = self._udp.get_extra_info('sockname')[1]
+        if tcp:
+            self._tcp = await asyncio.start_server(self._serve_tcp, host,
+                                                   port if not udp else udp_port)
+            tcp_port = self._tcp.sockets[0].getsockname()[1]
+        return udp_port, tcp_port
+
+    def close(self):
+        if self._udp is not None:
+            self._udp.close()
+        if self._tcp is not None:
+            self._tcp.close()
+
+    def receive(self, data, key):
+        """Handle one packet from client `key`, returning the packets to send back"""
+        now = monotonic()
+        if now - self._swept >= 1.0:
+            self.expire(now)
+        packet = unpack(data)
+        if packet is None:
+            self.rejected += 1
+            return []
+        try:
+            return self._receive(key, now, *packet)
+        except Exception:
+            # A chain that fails to build or process drops this packet, not the server
+            self.errors += 1
+            return []
+
+    def _receive(self, key, now, kind, channels, frames, seq, sent, payload):
+        session = self.sessions.get(key)
+        if kind == HELLO:
+            try:
+                settings = parse_hello(payload, self.spec, self.block_size, self.samplerate)
+            except ValueError:
+                self.rejected += 1
+                return []
+            if session is None or session.settings != settings + (channels,):
+                # A resent HELLO for the same settings keeps the running session
+                session = self._open(key, *settings, channels)
+            if session is not None:
+                session.last_seen = now
+                return [pack(HELLO, seq, sent, b'', 0, channels)]
+            return []
+        if session is None or session.channels != channels or frames > session.block_size:
+            # No hello yet (or it was lost): fall back to the server's preset
+            session = self._open(key, self.spec, max(frames, self.block_size),
+                                 self.samplerate, channels)
+            if session is None:
+                return []
+        session.last_seen = now
+        pcm = np.frombuffer(payload, dtype='<i2').reshape(frames, channels)
+        return [pack(AUDIO, s, t, reply, frames, channels)
+                for s, t, reply in session.handle(seq, sent, pcm, frames)]
+
+    def _open(self, key, spec, block_size, samplerate, channels):
+        """New Session for `key`, or None while the table is full"""
+        self.sessions.pop(key, None)
+        if len(self.sessions) >= self.max_sessions:
+            self.refused += 1
+            return None
+        session = self.sessions[key] = Session(spec, block_size, samplerate, channels)
+        return session
+
+    def expire(self, now=None):
+        """Drop UDP sessions that have been silent for longer than the timeout"""
+        now = monotonic() if now is None else now
+        self._swept = now
+        for key, session in list(self.sessions.items()):
+            if key[0] == 'udp' and now - session.last_seen > self.session_timeout:
+                del self.sessions[key]
+                self.expired += 1
+
+    async def _serve_tcp(self, reader, writer):
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        key = ('tcp', writer.get_extra_info('peername'))
+        try:
+            while True:
+                header = await reader.readexactly(HEADER.size)
+                magic, kind, channels, frames, _, _ = HEADER.unpack(header)
+                if not header_ok(magic, kind, channels, frames):
+                    # The stream cannot be resynchronised after a bad header
+                    self.rejected += 1
+                    break
+                payload = await reader.readexactly(payload_size(kind, frames, channels))
+                for packet in self.receive(header + payload, key):
+                    writer.write(packet)
+        except (asyncio.IncompleteReadError, ConnectionError, struct.error):
+            pass
+        finally:
+            self.sessions.pop(key, None)
+            writer.close()
+
+    def stats(self):
+        return {
+            'clients': len(self.sessions),
+            'processed': sum(s.processed for s in self.sessions.values()),
+            'concealed': sum(s.concealed for s in self.sessions.values()),
+            'late': sum(s.late for s in self.sessions.values()),
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'refused': self.refused,
+            'expired': self.expired,
+        }
+
+
+class _ServerDatagram(asyncio.DatagramProtocol):
+    def __init__(self, server):
+        self.server = server
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        for packet in self.server.receive(data, ('udp', addr)):
+            self.transport.sendto(packet, addr)
+
+
+# Client
+
+class NetworkClient:
+    """Capture-side stream callback that sends blocks to an AudioServer
+
+    The audio callback encodes its input block and hands it to an asyncio
+    loop on a background thread, then plays the next block out of the
+    jitter buffer. `effect` is the chain spec the server should run, e.g.
+    [('pitch', 0.75)]; without it the server uses its own preset. start()
+    resends the HELLO until the server answers it and raises TimeoutError
+    if no answer comes.
+    """
+
+    def __init__(self, host, port=PORT, protocol='udp', block_size=BLOCK_SIZE,
+                 samplerate=SAMPLE_RATE, channels=1, effect=None):
+        self.address = (host, int(port))
+        self.protocol = protocol
+        self.block_size = int(block_size)
+        self.samplerate = int(samplerate)
+        self.channels = int(channels)
+        self.effect = effect
+        self.jitter = JitterBuffer(self.block_size, self.channels, self.samplerate)
+        shape = (self.block_size, self.channels)
+        self._pcm = np.zeros(shape, dtype=np.int16)
+        self._scratch = np.zeros(shape, dtype=np.float32)
+        self._out = np.zeros(shape, dtype=np.float32)
+        self._seq = 0
+        self._send = None
+        self._loop = None
+        self._thread = None
+        self._transport = None
+        self._reader = None
+        self._ready = None
+        self.sent = 0
+        self.round_trips = deque(maxlen=10000)
+
+    def start(self, timeout=5.0):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="net-audio",
+                                        daemon=True)
+        self._thread.start()
+        connect = asyncio.wait_for(self._connect(), timeout)
+        try:
+            asyncio.run_coroutine_threadsafe(connect, self._loop).result()
+        except asyncio.TimeoutError:
+            self.stop()
+            raise TimeoutError(f"no reply from {self.address[0]}:{self.address[1]} "
+                               f"within {timeout:g} s") from None
+        except BaseException:
+            self.stop()
+            raise
+        return self
+
+    async def _connect(self):
+        loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+        if self.protocol == 'udp':
+            self._transport, _ = await loop.create_datagram_endpoint(
+                lambda: _ClientDatagram(self._received), remote_addr=self.address)
+            self._send = self._transport.sendto
+        else:
+            reader, writer = await asyncio.open_connection(*self.address)
+            writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._transport = writer
+            self._send = writer.write
+            self._reader = loop.create_task(self._read_tcp(reader))
+        settings = {'block_size': self.block_size, 'samplerate': self.samplerate}
+        if self.effect is not None:
+            settings['effect'] = [list(stage) for stage in self.effect]
+        body = json.dumps(settings).encode()
+        while not self._ready.is_set():
+            # A lost HELLO (or reply) over UDP would leave the server on its own preset
+            self._send(pack(HELLO, 0, perf_counter(), body, len(body), self.channels))
+            try:
+                await asyncio.wait_for(self._ready.wait(), HELLO_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _read_tcp(self, reader):
+        try:
+            while True:
+                header = await reader.readexactly(HEADER.size)
+                _, kind, channels, frames, _, _ = HEADER.unpack(header)
+                self._received(header + await reader.readexactly(
+                    payload_size(kind, frames, channels)))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    def _received(self, data):
+        packet = unpack(data)
+        if packet is None:
+            return
+        if packet[0] == HELLO:
+            self._ready.set()
+            return
+        _, channels, frames, seq, sent, payload = packet
+        transit = perf_counter() - sent
+        self.round_trips.append(transit)
+        pcm = np.frombuffer(payload, dtype='<i2').reshape(frames, channels)
+        self.jitter.put(seq, pcm, transit)
+
+    async def _close(self):
+        if self._transport is not None:
+            self._transport.close()
+        if self._reader is not None:
+            self._reader.cancel()
+            await asyncio.gather(self._reader, return_exceptions=True)
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def send(self, indata):
+        """Queue one input block (float32 or int16) for the server"""
+        frames = len(indata)
+        if indata.dtype == np.int16:
+            pcm = indata
+        else:
+            pcm = self._pcm[:frames]
+            float32_to_int16(indata, pcm, self._scratch[:frames])
+        packet = pack(AUDIO, self._seq, perf_counter(), pcm.tobytes(), frames, self.channels)
+        self._seq += 1
+        self.sent += 1
+        self._loop.call_soon_threadsafe(self._send, packet)
+
+    def callback(self, indata, outdata, frames, time, status):
+        """sounddevice-compatible callback: send the input, play the returned audio"""
+        self.send(indata[:frames, :self.channels])
+        sent = self._seq - 1
+        if outdata.dtype == np.float32:
+            self.jitter.pop(outdata[:frames, :self.channels], sent)
+        else:
+            wet = self._out[:frames]
+            self.jitter.pop(wet, sent)
+            float32_to_int16(wet, outdata[:frames, :self.channels], self._scratch[:frames])
+
+    def stats(self):
+        """Jitter buffer counters plus round-trip and end-to-end latency"""
+        stats = self.jitter.stats()
+        stats['sent'] = self.sent
+        stats['lost'] = max(0, self.sent - stats['received'] - stats['late'])
+        block_ms = self.block_size / self.samplerate * 1000
+        if self.round_trips:
+            rtt = np.array(self.round_trips) * 1000
+            stats['rtt_p50_ms'] = float(np.percentile(rtt, 50))
+            stats['rtt_p99_ms'] = float(np.percentile(rtt, 99))
+            stats['rtt_max_ms'] = float(rtt.max())
+            # Capture block plus the blocks playout runs behind sending
+            stats['latency_ms'] = (1 + stats['mean_delay_blocks']) * block_ms
+        return stats
+
+
+class _ClientDatagram(asyncio.DatagramProtocol):
+    def __init__(self, received):
+        self.received = received
+
+    def datagram_received(self, data, addr):
+        self.received(data)
+
+
+def format_stats(stats):
+    line = (f"{stats['sent']} sent, {stats['received']} received, {stats['lost']} lost, "
+            f"{stats['late']} late, {stats['concealed']} concealed, {stats['skipped']} skipped")
+    if 'rtt_p50_ms' in stats:
+        line += (f"\nRound trip p50 {stats['rtt_p50_ms']:.1f} ms, p99 {stats['rtt_p99_ms']:.1f} ms"
+                 f" | jitter {stats['jitter_ms']:.1f} ms, buffer {stats['mean_delay_blocks']:.1f}"
+                 f" blocks (target {stats['target_blocks']})"
+                 f" | end to end ~{stats['latency_ms']:.1f} ms")
+    return line
+
+
+# Command line
+
+async def serve(preset, port, block_size, samplerate):
+    server = AudioServer(preset, block_size, samplerate)
+    udp_port, tcp_port = await server.start(port=port)
+    print(f"✓ Listening on UDP {udp_port} and TCP {tcp_port}, default preset {preset}")
+    print("Press Ctrl+C to stop\n")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            server.expire()
+            stats = server.stats()
+            print(f"{stats['clients']} clients, {stats['processed']} blocks processed, "
+                  f"{stats['concealed']} concealed, {stats['late']} late, "
+                  f"{stats['rejected']} rejected, {stats['errors']} errors")
+    finally:
+        server.close()
+
+
+def loopback(protocol, preset, seconds, block_size, samplerate):
+    """Server and client in this process, fed by the (virtual) default device"""
+    from audio_backend import sd
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    server = AudioServer(preset, block_size, samplerate)
+    udp_port, tcp_port = asyncio.run_coroutine_threadsafe(
+        server.start('127.0.0.1', 0), loop).result()
+    port = udp_port if protocol == 'udp' else tcp_port
+    with NetworkClient('127.0.0.1', port, protocol, block_size, samplerate) as client:
+        with sd.Stream(samplerate=samplerate, blocksize=block_size, channels=1,
+                       callback=client.callback):
+            sd.sleep(int(seconds * 1000))
+        print(format_stats(client.stats()))
+    loop.call_soon_threadsafe(server.close)
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('mode', choices=['serve', 'loopback'])
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--protocol', choices=['udp', 'tcp'], default='udp',
+                        help="transport for loopback (the server always listens on both)")
+    parser.add_argument('--preset', default='Robot', choices=list(PRESETS),
+                        help="effect for clients that do not send their own")
+    parser.add_argument('--block-size', '-b', type=int, default=BLOCK_SIZE)
+    parser.add_argument('--samplerate', '-r', type=int, default=SAMPLE_RATE)
+    parser.add_argument('--seconds', type=float, default=5.0, help="loopback duration")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.mode == 'serve':
+        print("=== Voice Changer Network Server ===\n")
+        try:
+            asyncio.run(serve(args.preset, args.port, args.block_size, args.samplerate))
+        except KeyboardInterrupt:
+            print("\n✓ Stopped")
+    else:
+        print(f"=== Network Loopback ({args.protocol.upper()}) ===\n")
+        loopback(args.protocol, args.preset, args.seconds, args.block_size, args.samplerate)
@@ -0,0 +1,416 @@
+"""
+Shared-memory output bus: one writer, any number of local reader processes
+The audio callback puts each processed block into a ring in shared memory;
+recorders, encoders and meters in other processes read it in place, each at
+its own position. The writer never waits for a reader: a reader that falls a
+ring behind is told so and skips ahead.
+
+    python output_bus.py voice-changer       # level meter on a running bus
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+
+RING_SECONDS = 1.0   # Audio kept in the ring for readers that fall behind
+MAX_READERS = 16     # Readers that can report their position at once
+MAGIC = 0x56435242   # 'VCRB', marks a segment as an output bus
+DTYPES = ('float32', 'int16')
+
+# Header fields (int64)
+_MAGIC, _SLOTS, _BLOCK, _CHANNELS, _RATE, _DTYPE, _HEAD, _CLOSED, _READERS, _WRITER = range(10)
+HEADER = 16
+# Reader table columns (int64)
+_PID, _POSITION, _OVERRUNS, _DROPPED = range(4)
+
+
+def _layout(slots, block_size, channels, dtype, readers):
+    """Byte offsets of the frame counts, stamps, reader table and slots, and the total size"""
+    align = lambda n: (n + 63) // 64 * 64
+    frames = align(HEADER * 8)
+    stamps = align(frames + slots * 8)
+    table = align(stamps + slots * 8)
+    data = align(table + readers * 4 * 8)
+    return frames, stamps, table, data, data + slots * block_size * channels * dtype.itemsize
+
+
+class _Segment:
+    """NumPy views of a bus segment, shared by the writer and the readers"""
+
+    def __init__(self, shm):
+        self.shm = shm
+        self.header = np.ndarray((HEADER,), dtype=np.int64, buffer=shm.buf)
+        if self.header[_MAGIC] != MAGIC:
+            raise ValueError(f"{shm.name} is not an output bus")
+        self.slots = int(self.header[_SLOTS])
+        self.block_size = int(self.header[_BLOCK])
+        self.channels = int(self.header[_CHANNELS])
+        self.samplerate = int(self.header[_RATE])
+        self.dtype = np.dtype(DTYPES[self.header[_DTYPE]])
+        self.max_readers = int(self.header[_READERS])
+        frames, stamps, table, data, _ = _layout(self.slots, self.block_size, self.channels,
+                                                 self.dtype, self.max_readers)
+        self.frames = np.ndarray((self.slots,), dtype=np.int64, buffer=shm.buf, offset=frames)
+        # Sequence number of the block in each slot, -1 while it is being written
+        self.stamps = np.ndarray((self.slots,), dtype=np.int64, buffer=shm.buf, offset=stamps)
+        self.table = np.ndarray((self.max_readers, 4), dtype=np.int64, buffer=shm.buf,
+                                offset=table)
+        self.data = np.ndarray((self.slots, self.block_size, self.channels), dtype=self.dtype,
+                               buffer=shm.buf, offset=data)
+
+    def close(self):
+        # The views pin the mapping, they go first
+        self.header = self.frames = self.stamps = self.table = self.data = None
+        self.shm.close()
+
+
+def _alive(pid):
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _attach(name):
+    """Open an existing segment without this process unlinking it at exit"""
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers every attachment with the resource tracker,
+        # which would remove the writer's segment when a reader exits.
+        # Unregistering afterwards is not enough: a tracker shared with the
+        # writer's process would forget the writer's own registration.
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class OutputBus:
+    """Writer end: a broadcast ring of (block_size, channels) slots in shared memory
+
+    A seqlock per slot keeps readers honest: the slot's stamp is -1 while it
+    is written and the block's sequence number after, so a reader that finds
+    the stamp changed under it knows the block was overwritten. The head (the
+    number of blocks published) is stored last. Nothing here waits or
+    allocates, so `publish` is safe in the audio callback. Readers report
+    their positions in a table in the segment, for `readers()` and `lag()`.
+    """
+
+    def __init__(self, name, samplerate, block_size, channels=1, dtype=np.float32,
+                 seconds=RING_SECONDS, max_readers=MAX_READERS):
+        dtype = np.dtype(dtype)
+        if dtype.name not in DTYPES:
+            raise ValueError(f"bus samples must be one of {DTYPES}, not {dtype.name}")
+        slots = max(4, math.ceil(seconds * samplerate / block_size))
+        *_, size = _layout(slots, block_size, channels, dtype, max_readers)
+        try:
+            shm = SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left by a writer that did not stop cleanly: end it for its readers
+            self._retire(name)
+            shm = SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((HEADER,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[[_SLOTS, _BLOCK, _CHANNELS, _RATE, _DTYPE, _READERS, _WRITER]] = (
+            slots, block_size, channels, samplerate, DTYPES.index(dtype.name), max_readers,
+            os.getpid())
+        header[_MAGIC] = MAGIC
+        del header
+        self._seg = _Segment(shm)
+        self._seg.stamps.fill(-1)
+        self._seg.table.fill(0)
+        self.name = name
+        self.slots = slots
+        self.block_size = int(block_size)
+        self.channels = int(channels)
+        self.dtype = dtype
+        self._seq = 0
+        self._slot = None
+        self.published = 0
+
+    @staticmethod
+    def _retire(name):
+        shm = SharedMemory(name=name)
+        try:
+            header = np.ndarray((HEADER,), dtype=np.int64, buffer=shm.buf)
+            if header[_MAGIC] == MAGIC:
+                header[_CLOSED] = 1
+            del header
+        finally:
+            shm.close()
+            shm.unlink()
+
+    # Audio thread
+
+    def write_slot(self):
+        """Next slot to fill in place (the whole block); publish it with commit()"""
+        slot = self._seq % self.slots
+        self._seg.stamps[slot] = -1
+        self._slot = slot
+        return self._seg.data[slot]
+
+    def commit(self, frames=None):
+        """Publish the slot from write_slot()"""
+        seg, slot = self._seg, self._slot
+        seg.frames[slot] = self.block_size if frames is None else frames
+        seg.stamps[slot] = self._seq
+        self._seq += 1
+        seg.header[_HEAD] = self._seq
+        self.published += 1
+
+    def publish(self, block, frames=None):
+        """Copy one (frames, channels) block onto the bus"""
+        frames = len(block) if frames is None else frames
+        slot = self.write_slot()
+        np.copyto(slot[:frames], block[:frames, :self.channels])
+        self.commit(frames)
+
+    def wrap(self, callback):
+        """Stream callback that runs `callback`, then publishes what it wrote"""
+        def published_callback(indata, outdata, frames, time_info, status):
+            callback(indata, outdata, frames, time_info, status)
+            self.publish(outdata, frames)
+        return published_callback
+
+    # Any thread
+
+    def readers(self):
+        """Position, lag and losses of every reader still running"""
+        head = self._seq
+        return [{'pid': int(pid), 'position': int(position), 'lag': int(head - position),
+                 'overruns': int(overruns), 'dropped': int(dropped)}
+                for pid, position, overruns, dropped in self._seg.table.tolist()
+                if pid and _alive(pid)]
+
+    def lag(self):
+        """Blocks the slowest registered reader is behind, 0 without readers"""
+        table = self._seg.table
+        active = table[:, _PID] != 0
+        if not active.any():
+            return 0
+        return int(self._seq - table[active, _POSITION].min())
+
+    def stats(self):
+        readers = self.readers()
+        return {
+            'name': self.name,
+            'published': self.published,
+            'capacity': self.slots - 1,
+            'readers': len(readers),
+            'max_lag': max((r['lag'] for r in readers), default=0),
+            'overruns': sum(r['overruns'] for r in readers),
+        }
+
+    def close(self):
+        """Tell readers no more blocks are coming and remove the segment"""
+        if self._seg is None:
+            return
+        self._seg.header[_CLOSED] = 1
+        shm = self._seg.shm
+        self._seg.close()
+        self._seg = None
+        shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class BusReader:
+    """Reader end, one per consumer, each with its own position
+
+    `next_block()` returns the next block in place (no copy) and
+    `release()` says whether it stayed intact while it was used; `read()`
+    copies into the reader's own buffer and only returns intact blocks.
+    A reader more than a ring behind the writer has lost blocks: it counts
+    an overrun and the blocks dropped, and resumes half a ring behind the
+    writer so it is not overrun again straight away.
+    """
+
+    def __init__(self, name, start='latest', poll=None):
+        if start not in ('latest', 'oldest'):
+            raise ValueError(f"start must be 'latest' or 'oldest', not {start!r}")
+        self._seg = seg = _Segment(_attach(name))
+        self.name = name
+        self.samplerate = seg.samplerate
+        self.block_size = seg.block_size
+        self.channels = seg.channels
+        self.dtype = seg.dtype
+        self.slots = seg.slots
+        head = int(seg.header[_HEAD])
+        self.position = head if start == 'latest' else max(0, head - (self.slots - 1))
+        self.poll = poll or max(0.0005, self.block_size / self.samplerate / 4)
+        self.blocks = 0
+        self.overruns = 0
+        self.dropped = 0
+        self._block = np.zeros((self.block_size, self.channels), dtype=self.dtype)
+        self._entry = self._register()
+
+    def _register(self):
+        """Claim a row of the reader table (free, or left by a reader that died)"""
+        table, pid = self._seg.table, os.getpid()
+        for entry in range(len(table)):
+            owner = table[entry, _PID]
+            if owner and _alive(owner):
+                continue
+            table[entry] = (pid, self.position, 0, 0)
+            if table[entry, _PID] == pid:
+                return entry
+        return None  # Table full: reads work, the writer just cannot see this one
+
+    def _report(self):
+        if self._entry is not None:
+            self._seg.table[self._entry, 1:] = (self.position, self.overruns, self.dropped)
+
+    def _skip(self, head):
+        """Lost blocks: resume half a ring behind the writer"""
+        resume = max(self.position + 1, head - self.slots // 2)
+        self.dropped += resume - self.position
+        self.overruns += 1
+        self.position = resume
+        self._report()
+
+    @property
+    def closed(self):
+        """True once the writer has stopped (or died) and every block has been read"""
+        header = self._seg.header
+        return (self.position >= header[_HEAD]
+                and bool(header[_CLOSED] or not _alive(header[_WRITER])))
+
+    def available(self):
+        """Blocks published but not read yet"""
+        return int(self._seg.header[_HEAD]) - self.position
+
+    def next_block(self):
+        """Next block in shared memory, or None if there is none yet
+
+        The view is only valid until release(); the writer may reuse its
+        slot at any time, which release() reports.
+        """
+        seg = self._seg
+        while True:
+            head = int(seg.header[_HEAD])
+            if self.position >= head:
+                return None
+            if head - self.position >= self.slots:
+                self._skip(head)
+                continue
+            slot = self.position % self.slots
+            if seg.stamps[slot] != self.position:
+                # Overwritten between reading the head and the stamp
+                self._skip(int(seg.header[_HEAD]))
+                continue
+            frames = seg.frames[slot]
+            block = seg.data[slot]
+            return block if frames == self.block_size else block[:frames]
+
+    def release(self):
+        """Move past the block from next_block(), True if it was intact all along"""
+        intact = self._seg.stamps[self.position % self.slots] == self.position
+        if intact:
+            self.position += 1
+            self.blocks += 1
+            self._report()
+        else:
+            self._skip(int(self._seg.header[_HEAD]))
+        return bool(intact)
+
+    def read(self, timeout=None):
+        """Copy of the next intact block, waiting up to `timeout` seconds (None = until closed)
+
+        The copy lives in the reader's own buffer and is overwritten by the
+        next read. Returns None on timeout or once the bus is closed.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            block = self.next_block()
+            if block is not None:
+                out = self._block[:len(block)]
+                np.copyto(out, block)
+                if self.release():
+                    return out
+                continue
+            if self.closed or (deadline is not None and time.monotonic() >= deadline):
+                return None
+            time.sleep(self.poll)
+
+    def __iter__(self):
+        while True:
+            block = self.read()
+            if block is None:
+                return
+            yield block
+
+    def stats(self):
+        return {
+            'blocks': self.blocks,
+            'overruns': self.overruns,
+            'dropped': self.dropped,
+            'lag': self.available(),
+        }
+
+    def close(self):
+        if self._seg is None:
+            return
+        if self._entry is not None and self._seg.table[self._entry, _PID] == os.getpid():
+            self._seg.table[self._entry] = 0
+        self._block = None
+        self._seg.close()
+        self._seg = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Level meter, an example consumer
+
+def meter(name, interval=0.1):
+    """Print the bus level in dBFS until the writer stops"""
+    with BusReader(name) as reader:
+        scale = 32768.0 if reader.dtype == np.int16 else 1.0
+        print(f"Reading {name}: {reader.samplerate} Hz, {reader.channels} ch, "
+              f"{reader.dtype}, {reader.slots - 1}-block ring")
+        energy, count, last = 0.0, 0, time.monotonic()
+        for block in reader:
+            energy += float(np.square(block, dtype=np.float64).sum()) / scale ** 2
+            count += block.size
+            if time.monotonic() - last >= interval:
+                db = 10 * math.log10(energy / count) if energy > 0 else -120.0
+                bar = '#' * max(0, int((db + 60) / 1.5))
+                print(f"\r{db:6.1f} dBFS |{bar:<40}| overruns {reader.overruns}",
+                      end='', flush=True)
+                energy, count, last = 0.0, 0, time.monotonic()
+        print(f"\nBus closed after {reader.blocks} blocks, {reader.dropped} dropped")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('name', help="bus name, OUTPUT_BUS in voice_changer.py")
+    parser.add_argument('--interval', type=float, default=0.1, help="seconds per reading")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        meter(args.name, args.interval)
+    except FileNotFoundError:
+        print(f"❌ No output bus named {args.name!r} (is the voice changer running?)")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print()
@@ -0,0 +1,99 @@
+"""
+Pipelined processing: the audio callback only moves blocks in and out of
+ring buffers and a worker thread runs the DSP
+"""
+import threading
+import numpy as np
+from ring_buffer import BlockRingBuffer
+
+
+class PipelinedProcessor:
+    """Run `process(indata, outdata, frames)` on a worker thread
+
+    The output ring starts with `latency_blocks` blocks of silence, which is
+    the time budget the worker gets for each block and also the extra
+    latency this mode adds. Blocks the callback could not queue are counted
+    as overruns, blocks it had to replace with silence as underruns.
+    `thread_setup`, if given, runs first on the worker thread (priority,
+    CPU affinity).
+    """
+
+    def __init__(self, process, block_size, in_channels=1, out_channels=1,
+                 latency_blocks=2, dtype=np.float32, thread_setup=None):
+        self.process = process
+        self.thread_setup = thread_setup
+        self.block_size = int(block_size)
+        self.latency_blocks = max(1, int(latency_blocks))
+        capacity = self.latency_blocks * 2
+        # Rings hold the stream's own sample format, `process` converts
+        self._input = BlockRingBuffer(capacity, block_size, in_channels, dtype)
+        self._output = BlockRingBuffer(capacity, block_size, out_channels, dtype)
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+        self.overruns = 0
+        self.underruns = 0
+        self.processed = 0
+
+    def start(self):
+        """Prime the output with silence and start the worker thread"""
+        for _ in range(self.latency_blocks):
+            self._output.write_slot().fill(0)
+            self._output.commit_write()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="dsp-worker", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the worker thread and wait for it to exit"""
+        self._running = False
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def callback(self, indata, outdata, frames, time, status):
+        """sounddevice-compatible callback, never runs DSP itself"""
+        if not self._input.push(indata):
+            self.overruns += 1
+        self._wake.set()
+
+        if not self._output.pop(outdata):
+            self.underruns += 1
+            outdata.fill(0)
+
+    def _run(self):
+        if self.thread_setup is not None:
+            self.thread_setup()
+        while self._running:
+            self._wake.wait(0.1)
+            self._wake.clear()
+            while True:
+                block = self._input.read_slot()
+                if block is None:
+                    break
+                slot = self._output.write_slot()
+                if slot is None:
+                    # Output is full, leave the input queued for later
+                    break
+                frames = len(block)
+                self.process(block, slot[:frames], frames)
+                self._output.commit_write(frames)
+                self._input.commit_read()
+                self.processed += 1
+
+    def stats(self):
+        """Counters for reporting after the stream stops"""
+        return {
+            'latency_blocks': self.latency_blocks,
+            'processed': self.processed,
+            'overruns': self.overruns,
+            'underruns': self.underruns,
+        }
@@ -0,0 +1,322 @@
+"""
+Streaming pitch shifter for real-time use
+Keeps its state across callbacks so block boundaries do not click
+"""
+import math
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+COARSE_STEP = 4  # Tap alignment first compares every 4th sample, then refines around the best
+
+
+class StreamingPitchShifter:
+    """Delay-line pitch shifter with two crossfaded read taps
+
+    Incoming audio is written into a ring buffer. Two read taps move through
+    it at `ratio` times the write speed, each one sweeping a delay window of
+    `window` samples. The taps are half a window apart and faded with
+    complementary Hann gains, so the jump when a tap wraps around is silent.
+    The tap phase and write position carry over between calls, which makes
+    the output continuous no matter how small the blocks are.
+
+    Two taps at an arbitrary distance would cancel wherever their delays put
+    a frequency out of phase (a comb filter) and pull the pitch towards the
+    sweep's sidebands. So when a tap wraps, its new delay is chosen within
+    `search` samples by normalised cross-correlation with the other tap,
+    which puts the two a whole number of periods apart for the crossfade.
+    The search runs on every COARSE_STEP-th sample first and is refined at
+    full rate around the best match.
+
+    Blocks are mono (frames,) or (frames, channels). Every channel shares the
+    tap gains and the channels of a group share the tap positions, so extra
+    channels only cost the gather and the multiply-adds, not the index math.
+    Buffers are channel-major so each gather is one np.take over the ring.
+
+    `groups` splits the channels into independent streams stacked side by
+    side, e.g. (2, 1) for a stereo and a mono one: each group aligns its taps
+    on its own first channel, so it sounds exactly as it would alone.
+    """
+
+    def __init__(self, ratio=1.0, block_size=1024, window=1024, channels=1, groups=None):
+        self.window = int(window)
+        self.ratio = float(ratio)
+        self.channels = int(channels)
+        self.groups = tuple(int(g) for g in groups) if groups else (self.channels,)
+        if self.window < 2:
+            raise ValueError(f"window must be at least 2 samples, got {self.window}")
+        if sum(self.groups) != self.channels or min(self.groups) < 1:
+            raise ValueError(f"channel groups {self.groups} do not split {self.channels} channels")
+        # Delay range a wrapping tap may land in, and the audio compared to pick it
+        self.search = self.window // 2
+        self._span = self.window // 2
+        self._phase = 0.0
+        self._count = 0      # Samples shifted since the start, tap positions derive from it
+        self._write = 0
+        self._offsets = [[0, 0] for _ in self.groups]
+        self._allocate(int(block_size))
+
+    def _allocate(self, block_size):
+        """Size the ring and the per-block work buffers once"""
+        self.block_size = block_size
+        channels = self.channels
+        # Oldest tap reads window + search + 1 samples behind the newest one,
+        # and the correlation looks `span` samples further back
+        self._size = self.window + self.search + self._span + block_size + 4
+        self._ring = np.zeros((channels, self._size), dtype=np.float32)
+        self._flat = self._ring.reshape(-1)
+        # Per-sample delay offset of each tap and group, changed where the tap wraps
+        groups = len(self.groups)
+        self._base = np.zeros((2, groups, block_size), dtype=np.float32)
+        self._base_rows = [(self._base[0, g], self._base[1, g]) for g in range(groups)]
+        span, search = self._span, self.search
+        self._span_ramp = np.arange(span, dtype=np.intp)
+        self._region_ramp = np.arange(span + search, dtype=np.intp)
+        self._span_idx = np.empty(span, dtype=np.intp)
+        self._region_idx = np.empty(span + search, dtype=np.intp)
+        self._reference = np.empty(span, dtype=np.float32)
+        self._region = np.empty(span + search, dtype=np.float32)
+        # Every candidate window of the region, made once (a view allocates)
+        self._windows = sliding_window_view(self._region, span)
+        self._squares = np.empty(span + search, dtype=np.float32)
+        # Running energy of the region: window j holds energy[j + span] - energy[j]
+        energy = np.zeros(span + search + 1, dtype=np.float32)
+        self._running = energy[1:]
+        self._energy_end = energy[span:]
+        self._energy_start = energy[:search + 1]
+        self._scores = np.empty(search + 1, dtype=np.float32)
+        self._norms = np.empty(search + 1, dtype=np.float32)
+        # The same at a quarter of the rate: every 4th lag over every 4th sample
+        step = COARSE_STEP
+        self._coarse_reference = np.empty(span // step, dtype=np.float32)
+        self._coarse_region = np.empty((span + search) // step, dtype=np.float32)
+        self._every_reference = self._reference[:span // step * step:step]
+        self._every_region = self._region[:(span + search) // step * step:step]
+        self._coarse_windows = sliding_window_view(self._coarse_region, span // step)
+        self._coarse_scores = np.empty(len(self._coarse_windows), dtype=np.float32)
+        self._coarse_norms = self._norms[:len(self._coarse_windows) * step:step]
+        # Full-rate lags within a step of the coarse best, copied out so the views stay fixed
+        fine = 2 * step - 1
+        self._fine_ramp = np.arange(span + fine - 1, dtype=np.intp)
+        self._fine_idx = np.empty(span + fine - 1, dtype=np.intp)
+        self._fine_region = np.empty(span + fine - 1, dtype=np.float32)
+        self._fine_windows = sliding_window_view(self._fine_region, span)
+        self._fine_lags = self._fine_idx[:fine]
+        self._fine_scores = np.empty(fine, dtype=np.float32)
+        self._fine_norms = np.empty(fine, dtype=np.float32)
+        self._ramp = np.arange(block_size, dtype=np.float32)
+        self._tap = np.empty(block_size, dtype=np.float32)
+        self._shared = np.empty(block_size, dtype=np.float32)
+        self._gain = np.empty(block_size, dtype=np.float32)
+        # Positions are worked out once per group, then gathered for every channel
+        self._pos = np.empty((groups, block_size), dtype=np.float32)
+        self._frac = np.empty((groups, block_size), dtype=np.float32)
+        self._idx0 = np.empty((groups, block_size), dtype=np.intp)
+        self._idx1 = np.empty((groups, block_size), dtype=np.intp)
+        self._group_of = np.repeat(np.arange(groups), self.groups)
+        firsts = np.cumsum((0,) + self.groups[:-1])
+        self._leads = [self._ring[first] for first in firsts]  # Each group's first channel
+        if channels == groups:
+            self._cidx0, self._cidx1, self._frac_rows = self._idx0, self._idx1, self._frac
+        else:
+            self._cidx0 = np.empty((channels, block_size), dtype=np.intp)
+            self._cidx1 = np.empty((channels, block_size), dtype=np.intp)
+            self._frac_rows = np.empty((channels, block_size), dtype=np.float32)
+        # Where each channel's row starts in the flattened ring
+        self._row_start = np.repeat(np.arange(channels) * self._size, block_size)
+        self._row_start = self._row_start.reshape(channels, block_size)
+        self._s0 = np.empty((channels, block_size), dtype=np.float32)
+        self._s1 = np.empty((channels, block_size), dtype=np.float32)
+        self._acc = np.empty((channels, block_size), dtype=np.float32)
+        # Gains repeated per channel, broadcasting in a ufunc allocates
+        if channels == 1:
+            self._gain_rows = self._gain[np.newaxis]
+        else:
+            self._gain_rows = np.empty((channels, block_size), dtype=np.float32)
+        self._work = (self._ramp, self._tap, self._shared, self._gain, self._pos, self._frac,
+                      self._idx0, self._idx1, self._cidx0, self._cidx1, self._frac_rows,
+                      self._row_start, self._s0, self._s1, self._acc, self._gain_rows,
+                      self._base[0], self._base[1])
+
+    def _views(self, n):
+        """Work buffers trimmed to n samples (no new views for full blocks)"""
+        if n == self.block_size:
+            return self._work
+        return tuple(buf[..., :n] for buf in self._work)
+
+    def reset(self):
+        """Forget all buffered audio"""
+        self._ring.fill(0)
+        self._phase = 0.0
+        self._count = 0
+        self._write = 0
+        self._offsets = [[0, 0] for _ in self.groups]
+
+    @property
+    def latency(self):
+        """Average delay added by the shifter, in samples"""
+        return self.window / 2 + 1 + self.search / 2
+
+    def _write_block(self, audio):
+        n = len(audio)
+        start = self._write
+        first = min(n, self._size - start)
+        self._ring[:, start:start + first] = audio[:first].T
+        if first < n:
+            self._ring[:, :n - first] = audio[first:].T
+
+    def _tap_at(self, k, i, rate):
+        """Tap k's phase at sample i of this block
+
+        Worked out from the absolute sample count, so wraps and alignment
+        come out the same however the stream is cut into blocks.
+        """
+        return ((self._count + i) * rate + 0.5 * k) % 1.0
+
+    def _next_wrap(self, k, rate, after):
+        """First sample index from `after` on where tap k wraps around
+
+        A wrap at sample i means the tap crossed a whole number between
+        samples i - 1 and i, so one landing on a block edge counts as i = 0.
+        """
+        count, lead = self._count, 0.5 * k
+        if rate > 0:
+            m = math.floor((count + after - 1) * rate + lead) + 1
+            return max(after, math.ceil((m - lead) / rate) - count)
+        m = math.floor((count + after - 1) * rate + lead)
+        return max(after, math.floor((lead - m) / -rate) + 1 - count)
+
+    def _align(self, k, i, start, rate, g):
+        """Delay offset for group g's tap k wrapping at sample i: the one best in phase with the other tap"""
+        window, span, search = self.window, self._span, self.search
+        other = 1 - k
+        # Read positions as in _read_tap: write position - (tap * window + 1 + offset)
+        held = start + i - (self._tap_at(other, i, rate) * window + 1 + self._offsets[g][other])
+        landing = start + i - (self._tap_at(k, i, rate) * window + 1)
+        # Channels of a group share the taps, the first one decides
+        ring = self._leads[g]
+        np.add(self._span_ramp, round(held) - span, out=self._span_idx)
+        np.take(ring, self._span_idx, out=self._reference, mode='wrap')
+        np.add(self._region_ramp, round(landing) - span - search, out=self._region_idx)
+        np.take(ring, self._region_idx, out=self._region, mode='wrap')
+
+        # Window j of the region is the audio behind offset search - j
+        np.square(self._region, out=self._squares)
+        np.add.accumulate(self._squares, out=self._running)
+        np.subtract(self._energy_end, self._energy_start, out=self._norms)
+        # argmax, unlike max(), reduces without a work buffer
+        loudest = self._norms[self._norms.argmax()]
+        if loudest <= 1e-9:
+            return search // 2  # Silence, any offset will do
+        np.maximum(self._norms, loudest * 1e-3, out=self._norms)
+        np.sqrt(self._norms, out=self._norms)
+
+        # Coarse pass on every COARSE_STEP-th sample, a sixteenth of the work
+        step = COARSE_STEP
+        np.copyto(self._coarse_reference, self._every_reference)
+        np.copyto(self._coarse_region, self._every_region)
+        scores = self._coarse_scores
+        np.matmul(self._coarse_windows, self._coarse_reference, out=scores)
+        np.divide(scores, self._coarse_norms, out=scores)
+        best = int(scores.argmax()) * step
+
+        # Then every lag within a step of it at full rate
+        low = min(max(0, best - step + 1), search - len(self._fine_scores) + 1)
+        np.add(self._fine_ramp, low, out=self._fine_idx)
+        np.take(self._region, self._fine_idx, out=self._fine_region, mode='wrap')
+        np.take(self._norms, self._fine_lags, out=self._fine_norms, mode='wrap')
+        scores = self._fine_scores
+        np.matmul(self._fine_windows, self._reference, out=scores)
+        np.divide(scores, self._fine_norms, out=scores)
+        return search - (low + int(scores.argmax()))
+
+    def _place_taps(self, n, start, rate):
+        """Fill each tap's per-sample delay offset, realigning it wherever it wraps"""
+        for g, bases in enumerate(self._base_rows):
+            bases[0].fill(self._offsets[g][0])
+            bases[1].fill(self._offsets[g][1])
+        wraps = [self._next_wrap(0, rate, 0), self._next_wrap(1, rate, 0)]
+        while min(wraps) < n:
+            k = 0 if wraps[0] <= wraps[1] else 1
+            i = wraps[k]
+            for g, bases in enumerate(self._base_rows):
+                offset = self._offsets[g][k] = self._align(k, i, start, rate, g)
+                bases[k][i:n] = offset
+            wraps[k] = self._next_wrap(k, rate, i + 1)
+
+    def _read_tap(self, views, k, start):
+        """Add tap k's interpolated, windowed output to the accumulator"""
+        (ramp, tap, shared, gain, pos, frac, idx0, idx1, cidx0, cidx1, frac_rows,
+         row_start, s0, s1, acc, gain_rows, *bases) = views
+        offset = 0.5 * k
+
+        # Tap phase in [0, 1) for every output sample
+        np.multiply(ramp, (1.0 - self.ratio) / self.window, out=tap)
+        np.add(tap, self._phase + offset, out=tap)
+        np.remainder(tap, 1.0, out=tap)
+
+        # Read position = write position - delay, wrapped into the ring
+        np.multiply(tap, -self.window, out=shared)
+        np.add(shared, ramp, out=shared)
+        np.add(shared, start - 1, out=shared)
+        np.copyto(pos, shared)
+        np.subtract(pos, bases[k], out=pos)
+        np.remainder(pos, self._size, out=pos)
+
+        # Hann gain, zero where the tap wraps
+        np.multiply(tap, np.pi, out=gain)
+        np.sin(gain, out=gain)
+        np.square(gain, out=gain)
+
+        # Linear interpolation between neighbouring ring samples
+        np.floor(pos, out=frac)
+        np.copyto(idx0, frac, casting='unsafe')
+        np.subtract(pos, frac, out=frac)
+        np.add(idx0, 1, out=idx1)
+        np.remainder(idx1, self._size, out=idx1)
+        if self.channels != len(self.groups):
+            np.take(idx0, self._group_of, axis=0, out=cidx0, mode='wrap')
+            np.take(idx1, self._group_of, axis=0, out=cidx1, mode='wrap')
+            np.take(frac, self._group_of, axis=0, out=frac_rows, mode='wrap')
+        if self.channels > 1:
+            np.add(cidx0, row_start, out=cidx0)
+            np.add(cidx1, row_start, out=cidx1)
+            np.copyto(gain_rows, gain)
+        # mode='wrap' avoids buffering `out`
+        np.take(self._flat, cidx0, out=s0, mode='wrap')
+        np.take(self._flat, cidx1, out=s1, mode='wrap')
+        np.subtract(s1, s0, out=s1)
+        np.multiply(s1, frac_rows, out=s1)
+        np.add(s1, s0, out=s1)
+        np.multiply(s1, gain_rows, out=s1)
+        np.add(acc, s1, out=acc)
+
+    def process(self, audio, out=None):
+        """Pitch shift one block, returning exactly len(audio) frames"""
+        n = len(audio)
+        if n > self.block_size:
+            self._allocate(n)
+        if out is None:
+            out = np.empty(audio.shape, dtype=np.float32)
+        # Mono blocks are handled as a single column
+        block = audio.reshape(n, self.channels)
+        target = out.reshape(n, self.channels)
+
+        start = self._write
+        self._write_block(block)
+
+        if self.ratio == 1.0:
+            np.copyto(target, block)
+        else:
+            views = self._views(n)
+            acc = views[14]
+            acc.fill(0)
+            rate = (1.0 - self.ratio) / self.window
+            self._phase = self._tap_at(0, 0, rate)
+            self._place_taps(n, start, rate)
+            self._read_tap(views, 0, start)
+            self._read_tap(views, 1, start)
+            np.copyto(target, acc.T)
+            self._count += n
+
+        self._write = (start + n) % self._size
+        return out
@@ -0,0 +1,215 @@
+"""
+Streaming polyphase resampler with cached anti-aliasing filters
+Replaces the per-block FFT resample used by voice_changer_android.py
+"""
+from fractions import Fraction
+from functools import lru_cache
+import time
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+TAPS_PER_PHASE = 16  # Filter length per polyphase branch, higher = sharper, slower
+MAX_DENOMINATOR = 20  # Largest up/down factor used to approximate a ratio
+SLACK = 64  # Most resampled samples FixedLengthOutput carries into the next block
+
+
+def rational_ratio(ratio, max_denominator=MAX_DENOMINATOR):
+    """Approximate an output/input rate ratio as (up, down)"""
+    frac = Fraction(ratio).limit_denominator(max_denominator)
+    return frac.numerator, frac.denominator
+
+
+@lru_cache(maxsize=None)
+def design_filter(up, down, taps_per_phase=TAPS_PER_PHASE):
+    """Kaiser-windowed sinc low-pass split into `up` polyphase branches
+
+    Returns an (up, taps_per_phase) float32 array. Row k holds the taps that
+    produce outputs landing on phase k of the upsampled grid, reversed so a
+    branch can be applied as a dot product with the newest samples last.
+    """
+    num_taps = taps_per_phase * up
+    cutoff = 1.0 / max(up, down)  # Relative to the upsampled Nyquist
+    n = np.arange(num_taps) - (num_taps - 1) / 2
+    h = cutoff * np.sinc(cutoff * n) * np.kaiser(num_taps, 8.0)
+    h *= up / h.sum()
+    return np.ascontiguousarray(h.reshape(taps_per_phase, up).T[:, ::-1], dtype=np.float32)
+
+
+class PolyphaseResampler:
+    """Resample a stream by up/down, carrying filter state between blocks
+
+    The input history, the output and the strided views each branch reads
+    and writes are allocated once per block length and output phase, so a
+    block only costs the copies and one matrix-vector product per branch.
+    """
+
+    def __init__(self, up, down, taps_per_phase=TAPS_PER_PHASE):
+        self.up = int(up)
+        self.down = int(down)
+        self.taps = int(taps_per_phase)
+        self.filters = design_filter(self.up, self.down, self.taps)
+        self._capacity = -1
+        self._allocate(1)  # Grows to the first block's length
+        self.reset()
+
+    @classmethod
+    def from_ratio(cls, ratio, taps_per_phase=TAPS_PER_PHASE):
+        """Resampler producing about `ratio` output samples per input sample"""
+        up, down = rational_ratio(ratio)
+        return cls(up, down, taps_per_phase)
+
+    @property
+    def ratio(self):
+        return self.up / self.down
+
+    def _allocate(self, block_size):
+        """Size the input and output buffers for blocks of up to block_size samples"""
+        keep = self.taps - 1
+        x = np.zeros(keep + block_size, dtype=np.float32)
+        if self._capacity >= 0:
+            x[:keep] = self._history  # Grown mid-stream, the filter state carries over
+        self._capacity = block_size
+        self._x = x
+        self._history = x[:keep]
+        self._windows = sliding_window_view(x, self.taps)
+        self._out = np.empty(-(-block_size * self.up // self.down) + 1, dtype=np.float32)
+        self._plans = {}
+
+    def _plan(self, t, n):
+        """Views for an n-sample block starting at upsampled position t"""
+        keep = self.taps - 1
+        # Output positions whose newest input sample falls in this block
+        last = n * self.up
+        count = max(0, -(-(last - t) // self.down))
+        # Every up-th output uses the same branch and steps `down` inputs
+        # further, so each branch is one strided matrix-vector product
+        branches = []
+        for first in range(min(self.up, count)):
+            base, phase = divmod(t + self.down * first, self.up)
+            outputs = self._out[first:count:self.up]
+            rows = self._windows[base::self.down][:len(outputs)]
+            branches.append((rows, self.filters[phase], outputs))
+        return (self._x[keep:keep + n], self._x[n:n + keep], self._out[:count],
+                branches, t + self.down * count - last)
+
+    def reset(self):
+        """Clear the filter history"""
+        self._history.fill(0)
+        self._t = 0  # Next output position on the upsampled grid
+
+    def process(self, audio):
+        """Resample one block, returning about len(audio) * up / down samples
+
+        The result is a view of a buffer the next call overwrites.
+        """
+        n = len(audio)
+        if n > self._capacity:
+            self._allocate(n)
+        key = (self._t, n)
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = self._plans[key] = self._plan(self._t, n)
+        block, tail, out, branches, self._t = plan
+
+        np.copyto(block, audio)
+        for rows, taps, outputs in branches:
+            np.matmul(rows, taps, out=outputs)
+        # The block's last samples are the next block's history
+        np.copyto(self._history, tail)
+        return out
+
+
+class FixedLengthOutput:
+    """FIFO that turns a resampler's uneven output into blocks of a fixed length
+
+    A block's output count varies by a sample or more with the resampler's
+    phase. Surplus samples wait for the next block instead of being cut off,
+    and a short block is made up from what earlier blocks left, so the stream
+    stays continuous. When the ratio keeps producing more than is read, no
+    more than `slack` samples are carried over and the oldest are dropped.
+    When it keeps producing less, a block is finished with silence once the
+    FIFO runs dry.
+    """
+
+    def __init__(self, block_size, ratio, slack=SLACK):
+        self.slack = int(slack)
+        # Room for the carried-over samples plus one block's worth of output
+        self._ring = np.zeros(int(block_size * max(ratio, 1.0)) + 2 + self.slack, dtype=np.float32)
+        self._read = 0
+        self.level = 0
+        self.dropped = 0  # Surplus samples thrown away
+        self.padded = 0   # Output samples filled with silence
+
+    def _skip(self, count):
+        self._read = (self._read + count) % len(self._ring)
+        self.level -= count
+
+    def write(self, samples):
+        """Queue resampled samples, dropping the oldest if they do not fit"""
+        size = len(self._ring)
+        n = len(samples)
+        if n > size:
+            self.dropped += n - size
+            samples = samples[n - size:]
+            n = size
+        over = self.level + n - size
+        if over > 0:
+            self.dropped += over
+            self._skip(over)
+        start = (self._read + self.level) % size
+        first = min(n, size - start)
+        self._ring[start:start + first] = samples[:first]
+        if first < n:
+            self._ring[:n - first] = samples[first:]
+        self.level += n
+
+    def read(self, out):
+        """Fill out with exactly len(out) samples and return it"""
+        size = len(self._ring)
+        n = len(out)
+        take = min(n, self.level)
+        first = min(take, size - self._read)
+        out[:first] = self._ring[self._read:self._read + first]
+        if first < take:
+            out[first:take] = self._ring[:take - first]
+        if take < n:
+            out[take:] = 0
+            self.padded += n - take
+        self._skip(take)
+        if self.level > self.slack:
+            self.dropped += self.level - self.slack
+            self._skip(self.level - self.slack)
+        return out
+
+    def stats(self):
+        return {'level': self.level, 'dropped': self.dropped, 'padded': self.padded}
+
+
+def benchmark(block_size=2048, ratios=(0.75, 1.5, 0.9, 1.1, 0.6, 1.8), repeats=200):
+    """Compare CPU time per block against scipy.signal.resample"""
+    from scipy import signal
+
+    rng = np.random.default_rng(0)
+    block = rng.standard_normal(block_size).astype(np.float32)
+
+    print(f"Block size: {block_size} samples\n")
+    print(f"{'shift':>6} {'up/down':>8} {'scipy (us)':>11} {'polyphase (us)':>15} {'speedup':>8}")
+    for shift in ratios:
+        num_samples = int(block_size / shift)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            signal.resample(block, num_samples)
+        fft_us = (time.perf_counter() - start) / repeats * 1e6
+
+        resampler = PolyphaseResampler.from_ratio(1.0 / shift)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            resampler.process(block)
+        poly_us = (time.perf_counter() - start) / repeats * 1e6
+
+        print(f"{shift:>6} {f'{resampler.up}/{resampler.down}':>8} "
+              f"{fft_us:>11.1f} {poly_us:>15.1f} {fft_us / poly_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,200 @@
+"""
+Join an input and an output stream that run on different clocks
+Input blocks go into a sample FIFO and the output side reads them back through
+a windowed-sinc resampler whose speed is trimmed to keep the FIFO level steady.
+"""
+import time
+import numpy as np
+from polyphase import design_filter
+
+TAPS = 16                # Input samples per output sample
+PHASES = 256             # Fractional positions in the interpolation table
+SMOOTHING_SECONDS = 2.0  # Averaging time of the FIFO level
+# PI gains on the level error in seconds of audio. The level integrates the
+# speed trim directly, so these give a critically damped loop settling in
+# under a minute, slow enough to ride out callback timing jitter.
+KP = 0.2                 # Speed trim per second of level error
+KI = 0.01                # Speed trim per second of error, per second
+MAX_CORRECTION = 0.005   # Largest speed trim either way (5000 ppm)
+
+
+class RateBridge:
+    """Elastic buffer with drift-compensating resampling between two clocks
+
+    The input callback calls write(block) at `in_rate` and the output callback
+    calls read(outdata) at `out_rate`, each on its own thread. Each side only
+    advances its own counter, so no lock is needed. The read side smooths the
+    FIFO level and trims the resampling step with a PI controller, which
+    absorbs the few hundred ppm two free-running sound cards differ by as
+    well as the nominal rate difference. If the FIFO runs dry the output is
+    silent until it has refilled to `target` samples.
+
+    Samples arrive in whole blocks, so the raw level is a sawtooth. Both
+    sides timestamp their calls (`now`, defaulting to time.perf_counter())
+    and the reader counts the input that has arrived since the last write,
+    which leaves a level smooth enough to trim by a few ppm.
+    """
+
+    def __init__(self, in_rate, out_rate, channels=1, in_block=1024, out_block=1024,
+                 target=None, taps=TAPS, phases=PHASES):
+        self.in_rate = float(in_rate)
+        self.out_rate = float(out_rate)
+        self.channels = int(channels)
+        self.taps = int(taps)
+        self.phases = int(phases)
+        self.nominal = self.in_rate / self.out_rate  # Input samples per output sample
+        if target is None:
+            # One block from each side plus the filter, with headroom for jitter
+            target = 1.5 * (in_block + out_block * self.nominal) + self.taps
+        self.target = float(target)
+        self.capacity = int(4 * self.target + 2 * in_block)
+
+        # Cut off at the lower of the two Nyquist frequencies
+        down = int(np.ceil(self.phases * max(1.0, self.nominal)))
+        # One contiguous row of phase coefficients per tap
+        self._columns = np.ascontiguousarray(design_filter(self.phases, down, self.taps).T)
+        self._ring = np.zeros((self.channels, self.capacity), dtype=np.float32)
+
+        self._written = 0  # Producer: samples written so far
+        self._stamp = (0, 0.0, 0)  # Producer: (samples written, time, block), one store
+        self._read = 0     # Consumer: first sample of the next filter window
+        self._frac = 0.0   # Consumer: fractional position past _read
+        self._playing = False
+        self._level = self.target
+        self._integral = 0.0
+        self.step = self.nominal
+        self.overruns = 0
+        self.underruns = 0
+        self._allocate(int(out_block))
+
+    def _allocate(self, block_size):
+        self.block_size = block_size
+        channels = self.channels
+        self._ramp = np.arange(block_size, dtype=np.float64)
+        self._pos = np.empty(block_size, dtype=np.float64)
+        self._t = np.empty(block_size, dtype=np.intp)
+        self._base = np.empty(block_size, dtype=np.intp)
+        self._phase = np.empty(block_size, dtype=np.intp)
+        self._coef = np.empty(block_size, dtype=np.float32)
+        self._s = np.empty((channels, block_size), dtype=np.float32)
+        self._acc = np.empty((channels, block_size), dtype=np.float32)
+        # Coefficients repeated per channel, broadcasting in a ufunc allocates
+        if channels == 1:
+            self._coef_rows = self._coef[np.newaxis]
+        else:
+            self._coef_rows = np.empty((channels, block_size), dtype=np.float32)
+
+    @property
+    def latency(self):
+        """Average delay through the FIFO and filter, in seconds"""
+        return (self.target + self.taps / 2) / self.in_rate
+
+    @property
+    def correction_ppm(self):
+        """Current speed trim relative to the nominal rate ratio"""
+        return (self.step / self.nominal - 1) * 1e6
+
+    def write(self, block, now=None):
+        """Queue one (frames, channels) input block; False if it was dropped"""
+        now = time.perf_counter() if now is None else now
+        n = len(block)
+        free = self.capacity - (self._written - self._read)
+        if n > free - self.taps:
+            self.overruns += 1
+            return False
+        block = block.reshape(n, self.channels)
+        start = self._written % self.capacity
+        first = min(n, self.capacity - start)
+        self._ring[:, start:start + first] = block[:first].T
+        if first < n:
+            self._ring[:, :n - first] = block[first:].T
+        # Publish only after the samples are in place
+        self._written += n
+        self._stamp = (self._written, now, n)
+        return True
+
+    def _trim(self, frames, now):
+        """PI update of the resampling step from the smoothed FIFO level"""
+        written, stamp, block = self._stamp
+        # Input that has reached the other device but not this FIFO yet
+        arriving = min(max(0.0, now - stamp) * self.in_rate, block)
+        level = written + arriving - self._read - self._frac
+        alpha = min(1.0, frames / (self.out_rate * SMOOTHING_SECONDS))
+        self._level += alpha * (level - self._level)
+        error = (self._level - self.target) / self.in_rate
+        limit = MAX_CORRECTION / KI
+        self._integral = min(limit, max(-limit, self._integral + error * frames / self.out_rate))
+        correction = KP * error + KI * self._integral
+        correction = min(MAX_CORRECTION, max(-MAX_CORRECTION, correction))
+        self.step = self.nominal * (1.0 + correction)
+
+    def read(self, outdata, now=None):
+        """Fill a (frames, channels) output block; False if it had to be silence"""
+        now = time.perf_counter() if now is None else now
+        n = len(outdata)
+        if n > self.block_size:
+            self._allocate(n)
+        available = self._written - self._read
+        if not self._playing:
+            if available < self.target:
+                outdata.fill(0)
+                return False
+            # Start exactly at the target level, dropping any excess
+            self._read += int(available - self.target)
+            available = self._written - self._read
+            self._level = available
+            self._playing = True
+
+        self._trim(n, now)
+        step = self.step
+        if int(self._frac + (n - 1) * step) + self.taps > available:
+            # Ran dry, wait for the FIFO to refill instead of crackling
+            self.underruns += 1
+            self._playing = False
+            outdata.fill(0)
+            return False
+
+        pos, t, base, phase = self._pos[:n], self._t[:n], self._base[:n], self._phase[:n]
+        coef, coef_rows = self._coef[:n], self._coef_rows[:, :n]
+        s, acc = self._s[:, :n], self._acc[:, :n]
+
+        # Filter position of every output sample, split into input sample and phase
+        np.multiply(self._ramp[:n], step * self.phases, out=pos)
+        np.add(pos, self._frac * self.phases, out=pos)
+        np.rint(pos, out=pos)
+        np.copyto(t, pos, casting='unsafe')
+        np.floor_divide(t, self.phases, out=base)
+        np.remainder(t, self.phases, out=phase)
+        # Ring offsets stay small, mode='wrap' loops once per wrap-around
+        np.add(base, self._read % self.capacity, out=base)
+
+        acc.fill(0)
+        for column in self._columns:
+            # mode='wrap' covers windows running past the end of the ring
+            np.take(self._ring, base, axis=1, out=s, mode='wrap')
+            np.take(column, phase, out=coef, mode='wrap')
+            if self.channels > 1:
+                np.copyto(coef_rows, coef)
+            np.multiply(s, coef_rows, out=s)
+            np.add(acc, s, out=acc)
+            np.add(base, 1, out=base)
+        np.copyto(outdata.reshape(n, self.channels), acc.T)
+
+        total = self._frac + n * step
+        advance = int(total)
+        self._frac = total - advance
+        # Hand the consumed samples back to the producer
+        self._read += advance
+        return True
+
+    def stats(self):
+        return {
+            'in_rate': self.in_rate,
+            'out_rate': self.out_rate,
+            'correction_ppm': self.correction_ppm,
+            'level': self._level,
+            'target': self.target,
+            'latency_ms': self.latency * 1000,
+            'overruns': self.overruns,
+            'underruns': self.underruns,
+        }
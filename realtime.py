@@ -0,0 +1,333 @@
+"""
+Realtime profile for the audio path
+Warms the effect code up before the stream opens, keeps the garbage collector
+out of the callbacks while it runs, and gives the audio and DSP threads their
+own cores and a higher priority where the OS allows it. Each step reports
+what it did; a step the OS refuses is noted, never fatal.
+
+    python realtime.py                       # p99/max with the profile off and on
+    python realtime.py --preset Demon --cpus fast
+"""
+import argparse
+import gc
+import glob
+import os
+import sys
+import threading
+import time
+import numpy as np
+
+GC_MODE = 'freeze'       # 'freeze' the heap and collect rarely, 'disable' collection, or None
+GC_THRESHOLDS = (50000, 50, 100)  # Collection thresholds while streaming in 'freeze' mode
+SWITCH_INTERVAL = 0.0005  # Seconds another Python thread may hold the GIL before the audio thread
+WARMUP_SECONDS = 0.5     # Speech run through every effect before the stream opens
+FLUSH_SECONDS = 0.5      # Silence after the warm-up so no speech is left in the effect
+RT_PRIORITY = 10         # SCHED_FIFO priority for the audio threads (Linux/Android, needs privileges)
+DSP_PRIORITY = 9         # For a DSP worker: below the audio threads, so it never delays a callback
+NICE = -10               # Fallback when SCHED_FIFO is refused
+GC_MODES = ('freeze', 'disable', None)
+
+
+def fastest_cpus():
+    """CPUs with the highest maximum clock (the big cores on big.LITTLE), None if unknown"""
+    speeds = {}
+    for path in glob.glob('/sys/devices/system/cpu/cpu[0-9]*/cpufreq/cpuinfo_max_freq'):
+        cpu = int(path.split('/')[-3][3:])
+        try:
+            with open(path) as f:
+                speeds[cpu] = int(f.read())
+        except (OSError, ValueError):
+            continue
+    if not speeds:
+        return None
+    top = max(speeds.values())
+    return {cpu for cpu, speed in speeds.items() if speed == top}
+
+
+def parse_cpus(spec):
+    """Set of CPUs from None, 'fast', '2,3' or an iterable of ints"""
+    if spec is None or spec == '':
+        return None
+    if spec == 'fast':
+        return fastest_cpus()
+    if isinstance(spec, str):
+        spec = spec.replace(',', ' ').split()
+    return {int(cpu) for cpu in spec}
+
+
+def describe_cpus(cpus):
+    return ','.join(str(cpu) for cpu in sorted(cpus))
+
+
+class RealtimeProfile:
+    """Settings for the audio path, applied in steps around the stream
+
+    warm_up() before the stream opens, enter() right before it starts,
+    wrap() / setup_thread() from the threads that run audio, exit() when it
+    stops. With everything off it still counts garbage collections, so runs
+    with and without the profile report the same way.
+    """
+
+    def __init__(self, gc_mode=GC_MODE, cpus=None, priority=True,
+                 switch_interval=SWITCH_INTERVAL, warmup_seconds=WARMUP_SECONDS):
+        if gc_mode not in GC_MODES:
+            raise ValueError(f"gc_mode must be one of {GC_MODES}, not {gc_mode!r}")
+        self.gc_mode = gc_mode
+        self.cpus = parse_cpus(cpus)
+        self.priority = priority
+        self.switch_interval = switch_interval
+        self.warmup_seconds = warmup_seconds
+        self.warmup_blocks = 0
+        self.threads = {}         # Role -> what setup_thread managed
+        self.frozen = 0
+        self.collections = [0, 0, 0]
+        self.max_gc_ms = 0.0
+        self._gc_started = None
+        self._saved = None
+        self.active = False
+
+    @classmethod
+    def off(cls):
+        """Profile that changes nothing and only counts collections"""
+        return cls(gc_mode=None, cpus=None, priority=False, switch_interval=None,
+                   warmup_seconds=0.0)
+
+    # Before the stream
+
+    def warm_up(self, process, block_size, in_channels, out_channels, samplerate,
+                dtype=np.float32, effects=()):
+        """Run `process(indata, outdata, frames)` and every extra effect on speech, then silence
+
+        First use of an effect pays for lazy set-up (ufunc loops, FFT plans,
+        interpolation tables); here it happens before the first callback.
+        `effects` are chains with process(audio, out=...), run once and
+        dropped, so switching to them later finds their code paths warm.
+        """
+        if not self.warmup_seconds:
+            return 0
+        from synthetic import speech_like
+        blocks = max(1, round(self.warmup_seconds * samplerate / block_size))
+        flush = max(1, round(FLUSH_SECONDS * samplerate / block_size))
+        speech = speech_like((blocks + 1) * block_size / samplerate, samplerate)
+        dtype = np.dtype(dtype)
+        scale = 32767 if dtype == np.int16 else 1
+        indata = np.zeros((block_size, in_channels), dtype=dtype)
+        outdata = np.zeros((block_size, out_channels), dtype=dtype)
+        for i in range(blocks + flush):
+            if i < blocks:
+                np.copyto(indata, (speech[i * block_size:(i + 1) * block_size, np.newaxis]
+                                   * scale), casting='unsafe')
+            else:
+                indata.fill(0)
+            process(indata, outdata, block_size)
+        for effect in effects:
+            channels = getattr(effect, 'channels', 1)
+            audio = np.repeat(speech[:, np.newaxis], channels, axis=1)
+            out = np.empty((block_size, channels), dtype=np.float32)
+            for i in range(blocks):
+                block = audio[i * block_size:(i + 1) * block_size]
+                effect.process(block if channels > 1 else block[:, 0],
+                               out=out if channels > 1 else out[:, 0])
+        self.warmup_blocks = blocks + flush
+        return self.warmup_blocks
+
+    def enter(self):
+        """Freeze the heap and tune the collector and the GIL for streaming"""
+        self._saved = (gc.isenabled(), gc.get_threshold(), sys.getswitchinterval())
+        if self.gc_mode is not None:
+            # Everything alive now is set-up that lives until exit: the
+            # collector stops walking it
+            gc.collect()
+            gc.freeze()
+            self.frozen = gc.get_freeze_count()
+            if self.gc_mode == 'disable':
+                gc.disable()
+            else:
+                gc.set_threshold(*GC_THRESHOLDS)
+        if self.switch_interval:
+            sys.setswitchinterval(self.switch_interval)
+        gc.callbacks.append(self._on_gc)
+        self.active = True
+        return self
+
+    def exit(self):
+        """Undo enter(), leaving the collector as it was"""
+        if not self.active:
+            return
+        self.active = False
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+        enabled, thresholds, interval = self._saved
+        sys.setswitchinterval(interval)
+        if self.gc_mode is not None:
+            gc.set_threshold(*thresholds)
+            if enabled:
+                gc.enable()
+            gc.unfreeze()
+
+    def __enter__(self):
+        return self.enter()
+
+    def __exit__(self, *exc):
+        self.exit()
+
+    def _on_gc(self, phase, info):
+        if phase == 'start':
+            self._gc_started = time.perf_counter()
+        elif self._gc_started is not None:
+            self.collections[info['generation']] += 1
+            self.max_gc_ms = max(self.max_gc_ms,
+                                 (time.perf_counter() - self._gc_started) * 1000)
+            self._gc_started = None
+
+    # On the audio threads
+
+    def setup_thread(self, role, priority=RT_PRIORITY):
+        """Pin the calling thread to `cpus` and raise its priority, noting what worked"""
+        done = []
+        if self.cpus:
+            if not hasattr(os, 'sched_setaffinity'):
+                done.append("affinity not supported")
+            else:
+                try:
+                    os.sched_setaffinity(0, self.cpus)
+                    done.append(f"cpus {describe_cpus(self.cpus)}")
+                except (OSError, ValueError) as e:
+                    done.append(f"affinity refused ({e})")
+        if self.priority:
+            done.append(self._raise_priority(priority))
+        self.threads[role] = ', '.join(done) or 'unchanged'
+        return self.threads[role]
+
+    def _raise_priority(self, priority):
+        # On Linux both calls take the calling thread when given 0 / its id
+        if hasattr(os, 'sched_setscheduler'):
+            try:
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+                return f"SCHED_FIFO {priority}"
+            except (OSError, ValueError):
+                pass
+        if hasattr(os, 'setpriority'):
+            try:
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), NICE)
+                return f"nice {NICE}"
+            except OSError:
+                pass
+        return "priority not permitted"
+
+    def wrap(self, callback, role='audio'):
+        """Callback that sets up whichever thread first calls it
+
+        The audio thread belongs to the audio library, so it can only be
+        configured from inside its first callback; that one call pays for
+        the system calls.
+        """
+        ready = []
+
+        def realtime_callback(*args):
+            if not ready:
+                ready.append(self.setup_thread(role))
+            callback(*args)
+        return realtime_callback
+
+    # Reporting
+
+    def report(self):
+        return {
+            'gc_mode': self.gc_mode,
+            'frozen_objects': self.frozen,
+            'collections': list(self.collections),
+            'max_gc_ms': self.max_gc_ms,
+            'switch_interval_ms': (self.switch_interval or sys.getswitchinterval()) * 1000,
+            'warmup_blocks': self.warmup_blocks,
+            'threads': dict(self.threads),
+        }
+
+
+def format_profile(report):
+    """One-line report"""
+    gc_part = (f"gc {report['gc_mode']} ({report['frozen_objects']} objects frozen)"
+               if report['gc_mode'] else "gc untouched")
+    young, middle, full = report['collections']
+    line = (f"{gc_part}, {young + middle + full} collections while streaming "
+            f"({full} full, longest {report['max_gc_ms']:.1f} ms)")
+    for role, state in report['threads'].items():
+        line += f" | {role}: {state}"
+    return line
+
+
+# Profile on/off comparison on the virtual backend
+
+def busy_app(stop, heap_objects):
+    """Stand-in for the rest of a Python app: a large live heap and steady cyclic garbage"""
+    heap = [{'id': i, 'tags': [i]} for i in range(heap_objects)]
+    while not stop.is_set():
+        nodes = [{'n': i} for i in range(50)]
+        for a, b in zip(nodes, nodes[1:]):
+            a['next'], b['prev'] = b, a
+        time.sleep(0.001)
+    return heap
+
+
+def compare(preset='Demon', block_size=512, samplerate=48000, seconds=5.0, cpus=None,
+            gc_mode=GC_MODE, heap_objects=300000, emit=print):
+    """Stream speech through `preset` with the profile off, then on; returns both summaries"""
+    import virtual_audio
+    from block_processor import BlockProcessor
+    from effect_chain import PRESETS, build_chain
+    from instrumentation import CallbackMonitor
+    from synthetic import speech_like
+
+    results = {}
+    for label, profile in (('off', RealtimeProfile.off()),
+                           ('on', RealtimeProfile(gc_mode=gc_mode, cpus=cpus))):
+        chain = build_chain(PRESETS[preset], block_size, samplerate, channels=2)
+        processor = BlockProcessor(chain, block_size, 2, 2, 2)
+        profile.warm_up(processor.process, block_size, 2, 2, samplerate,
+                        effects=[build_chain(spec, block_size, samplerate, channels=2)
+                                 for spec in PRESETS.values()])
+        monitor = CallbackMonitor(samplerate, block_size)
+        stop = threading.Event()
+        app = threading.Thread(target=busy_app, args=(stop, heap_objects), daemon=True)
+        app.start()
+        time.sleep(0.2)  # Let the app build its heap first
+        profile.enter()
+        try:
+            virtual_audio.run_callback(monitor.wrap(profile.wrap(processor.callback)),
+                                       source=speech_like(seconds, samplerate),
+                                       samplerate=samplerate, blocksize=block_size,
+                                       channels=2, realtime=True)
+        finally:
+            profile.exit()
+            stop.set()
+            app.join()
+        summary = monitor.summary()
+        summary['profile'] = profile.report()
+        results[label] = summary
+        emit(f"{label:>3}: p50 {summary['p50_ms']:.2f} ms, p99 {summary['p99_ms']:.2f} ms, "
+             f"max {summary['max_ms']:.2f} ms, late {summary['deadline_misses']} | "
+             f"{format_profile(summary['profile'])}")
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--preset', '-p', default='Demon', help="effect preset (default Demon)")
+    parser.add_argument('--block-size', '-b', type=int, default=512)
+    parser.add_argument('--seconds', '-s', type=float, default=5.0,
+                        help="audio streamed per run (default 5)")
+    parser.add_argument('--cpus', help="pin the audio thread, e.g. '2,3' or 'fast' for the big cores")
+    parser.add_argument('--gc', choices=['freeze', 'disable'], default=GC_MODE)
+    parser.add_argument('--heap', type=int, default=300000,
+                        help="live objects held by the simulated app (default 300000)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    os.environ.setdefault('VOICE_CHANGER_BACKEND', 'virtual')
+    args = parse_args()
+    print("=== Realtime Profile: Off vs On ===\n")
+    print(f"{args.preset}, {args.block_size} frames at 48000 Hz, stereo, "
+          f"{args.seconds:g}s per run next to a busy Python thread\n")
+    compare(args.preset, args.block_size, seconds=args.seconds, cpus=parse_cpus(args.cpus),
+            gc_mode=args.gc, heap_objects=args.heap)
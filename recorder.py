@@ -0,0 +1,228 @@
+"""
+Record the raw input and the processed output without touching the deadline
+The audio callback only copies each block pair into a preallocated ring; a
+writer thread drains it in batches to WAV (or raw) files and flushes them to
+disk every few seconds. Blocks that find the ring full are dropped, counted
+and written as silence, so both files keep the stream's timing.
+"""
+import math
+import os
+import threading
+import time
+import numpy as np
+from ring_buffer import BlockRingBuffer
+from wav_io import WavWriter
+
+RING_SECONDS = 2.0    # Audio the ring holds while the disk is slow
+BATCH_BLOCKS = 32     # Most blocks gathered into one write
+FLUSH_SECONDS = 2.0   # How often the files are put on disk
+FORMATS = ('wav', 'raw')
+
+
+class RawWriter:
+    """Headerless interleaved samples in the stream's own format"""
+
+    def __init__(self, path, samplerate, channels=1):
+        self.path = str(path)
+        self.samplerate = int(samplerate)
+        self.channels = int(channels)
+        self.frames_written = 0
+        self._file = open(self.path, 'wb')
+
+    def write(self, block):
+        self._file.write(np.ascontiguousarray(block).tobytes())
+        self.frames_written += len(block)
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class Recorder:
+    """Tap for the audio callback that archives input and output off the audio thread
+
+    `tap(indata, outdata, frames)` (or a callback from `wrap`) runs on the
+    audio thread: one copy into a ring slot, no locks, no allocation. The
+    ring holds both sides of a block in one slot, input channels first, so
+    they can never drift apart. The writer thread owns the files. A drop is
+    noted on the next slot that does get in, which is where the writer puts
+    the silence.
+    """
+
+    def __init__(self, directory, samplerate, block_size, in_channels=1, out_channels=1,
+                 dtype=np.float32, fmt='wav', name=None, ring_seconds=RING_SECONDS,
+                 batch_blocks=BATCH_BLOCKS, flush_seconds=FLUSH_SECONDS):
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of {FORMATS}, not {fmt!r}")
+        self.samplerate = int(samplerate)
+        self.block_size = int(block_size)
+        self.in_channels = int(in_channels)
+        self.out_channels = int(out_channels)
+        self.dtype = np.dtype(dtype)
+        self.flush_seconds = flush_seconds
+        blocks = max(4, math.ceil(ring_seconds * self.samplerate / self.block_size))
+        self._ring = BlockRingBuffer(blocks, self.block_size,
+                                     self.in_channels + self.out_channels, self.dtype)
+        # Blocks dropped just before each slot, written with the slot
+        self._gaps = np.zeros(self._ring.num_slots, dtype=np.int64)
+        self._slot = 0           # Producer's slot index, moves with the ring's head
+        self._pending = 0        # Drops not yet attached to a slot
+        self._read = 0           # Writer's slot index, moves with the ring's tail
+        self.batch_blocks = int(batch_blocks)
+        self._batch = np.zeros((self.batch_blocks * self.block_size,
+                                self.in_channels + self.out_channels), dtype=self.dtype)
+        self._silence = np.zeros((self.block_size, self.in_channels + self.out_channels),
+                                 dtype=self.dtype)
+
+        os.makedirs(directory, exist_ok=True)
+        name = name or time.strftime('%Y%m%d-%H%M%S')
+        if fmt == 'wav':
+            suffix, writer = 'wav', WavWriter
+        else:
+            suffix, writer = ('f32' if self.dtype == np.float32 else 's16'), RawWriter
+        self.paths = {side: os.path.join(directory, f"{name}_{side}.{suffix}")
+                      for side in ('input', 'output')}
+        self._writers = {'input': writer(self.paths['input'], self.samplerate, self.in_channels),
+                         'output': writer(self.paths['output'], self.samplerate,
+                                          self.out_channels)}
+        self._stop = threading.Event()
+        self._thread = None
+        # Audio thread counters
+        self.blocks = 0
+        self.dropped = 0
+        # Writer thread counters
+        self.written_blocks = 0
+        self.silence_blocks = 0
+        self.writes = 0
+        self.flushes = 0
+        self.max_write_ms = 0.0
+        self.max_queued = 0
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="recorder", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Write everything still queued, flush and close the files"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # Audio thread
+
+    def tap(self, indata, outdata, frames):
+        """Queue one block pair; False (and a counted drop) if the ring is full"""
+        self.blocks += 1
+        slot = self._ring.write_slot()
+        if slot is None:
+            self.dropped += 1
+            self._pending += 1
+            return False
+        np.copyto(slot[:frames, :self.in_channels], indata[:frames, :self.in_channels])
+        np.copyto(slot[:frames, self.in_channels:], outdata[:frames, :self.out_channels])
+        self._gaps[self._slot] = self._pending
+        self._pending = 0
+        self._ring.commit_write(frames)
+        self._slot = (self._slot + 1) % self._ring.num_slots
+        return True
+
+    def wrap(self, callback):
+        """Stream callback that runs `callback`, then taps what it read and wrote"""
+        def recorded_callback(indata, outdata, frames, time_info, status):
+            callback(indata, outdata, frames, time_info, status)
+            self.tap(indata, outdata, frames)
+        return recorded_callback
+
+    # Writer thread
+
+    def _run(self):
+        poll = min(0.1, self.batch_blocks * self.block_size / self.samplerate / 4)
+        last_flush = time.monotonic()
+        while True:
+            # Checked before draining, so blocks queued before stop() are kept
+            stopping = self._stop.is_set()
+            self._drain()
+            if stopping:
+                break
+            if time.monotonic() - last_flush >= self.flush_seconds:
+                self._flush()
+                last_flush = time.monotonic()
+            self._stop.wait(poll)
+        # Drops after the last block that got in
+        self._write_silence(self._pending)
+        self._flush()
+        for writer in self._writers.values():
+            writer.close()
+
+    def _drain(self):
+        """Move every queued block to the files, BATCH_BLOCKS per write"""
+        self.max_queued = max(self.max_queued, len(self._ring))
+        filled = 0
+        while True:
+            block = self._ring.read_slot()
+            if block is None:
+                break
+            gap = self._gaps[self._read]
+            if gap:
+                self._write(filled)
+                filled = 0
+                self._write_silence(gap)
+            frames = len(block)
+            if filled + frames > len(self._batch):
+                self._write(filled)
+                filled = 0
+            np.copyto(self._batch[filled:filled + frames], block)
+            filled += frames
+            self._ring.commit_read()
+            self._read = (self._read + 1) % self._ring.num_slots
+            self.written_blocks += 1
+        self._write(filled)
+
+    def _write(self, frames):
+        if not frames:
+            return
+        started = time.perf_counter()
+        batch = self._batch[:frames]
+        self._writers['input'].write(batch[:, :self.in_channels])
+        self._writers['output'].write(batch[:, self.in_channels:])
+        self.writes += 1
+        self.max_write_ms = max(self.max_write_ms, (time.perf_counter() - started) * 1000)
+
+    def _write_silence(self, blocks):
+        for _ in range(int(blocks)):
+            self._writers['input'].write(self._silence[:, :self.in_channels])
+            self._writers['output'].write(self._silence[:, self.in_channels:])
+            self.silence_blocks += 1
+
+    def _flush(self):
+        for writer in self._writers.values():
+            writer.flush()
+        self.flushes += 1
+
+    def stats(self):
+        """Counters for reporting; `dropped` blocks are silence in the files"""
+        seconds = (self.written_blocks + self.silence_blocks) * self.block_size / self.samplerate
+        return {
+            'blocks': self.blocks,
+            'dropped': self.dropped,
+            'written_blocks': self.written_blocks,
+            'seconds': seconds,
+            'writes': self.writes,
+            'flushes': self.flushes,
+            'max_write_ms': self.max_write_ms,
+            'max_queued': self.max_queued,
+            'capacity': self._ring.capacity,
+        }
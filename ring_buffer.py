@@ -0,0 +1,84 @@
+"""
+Single-producer/single-consumer ring buffer of fixed-size audio blocks
+The audio thread and one worker thread exchange blocks without locks
+"""
+import numpy as np
+
+
+class BlockRingBuffer:
+    """Preallocated ring of (block_size, channels) slots
+
+    Exactly one thread may write and exactly one other thread may read. The
+    writer only ever advances `_head` and the reader only `_tail`, each after
+    the slot data is in place, so neither side needs a lock. One slot is kept
+    free to tell "full" from "empty".
+    """
+
+    def __init__(self, num_blocks, block_size, channels=1, dtype=np.float32):
+        self.num_slots = int(num_blocks) + 1
+        self.block_size = int(block_size)
+        self.channels = int(channels)
+        self._slots = np.zeros((self.num_slots, self.block_size, self.channels), dtype=dtype)
+        self._frames = np.zeros(self.num_slots, dtype=np.intp)
+        self._head = 0  # next slot to write, owned by the producer
+        self._tail = 0  # next slot to read, owned by the consumer
+
+    def __len__(self):
+        """Number of blocks ready to read"""
+        return (self._head - self._tail) % self.num_slots
+
+    @property
+    def capacity(self):
+        return self.num_slots - 1
+
+    def full(self):
+        return (self._head + 1) % self.num_slots == self._tail
+
+    def empty(self):
+        return self._head == self._tail
+
+    # Producer side
+
+    def write_slot(self):
+        """Slot to fill in place, or None if the ring is full"""
+        if self.full():
+            return None
+        return self._slots[self._head]
+
+    def commit_write(self, frames=None):
+        """Publish the slot returned by write_slot()"""
+        self._frames[self._head] = self.block_size if frames is None else frames
+        self._head = (self._head + 1) % self.num_slots
+
+    def push(self, block):
+        """Copy one block in, returning False if the ring is full"""
+        slot = self.write_slot()
+        if slot is None:
+            return False
+        frames = len(block)
+        np.copyto(slot[:frames], block.reshape(frames, -1))
+        self.commit_write(frames)
+        return True
+
+    # Consumer side
+
+    def read_slot(self):
+        """Oldest published slot trimmed to its frame count, or None if empty"""
+        if self.empty():
+            return None
+        frames = self._frames[self._tail]
+        slot = self._slots[self._tail]
+        return slot if frames == self.block_size else slot[:frames]
+
+    def commit_read(self):
+        """Release the slot returned by read_slot()"""
+        self._tail = (self._tail + 1) % self.num_slots
+
+    def pop(self, out):
+        """Copy the oldest block into out, returning False if the ring is empty"""
+        slot = self.read_slot()
+        if slot is None:
+            return False
+        np.copyto(out, slot)
+        self.commit_read()
+        return True
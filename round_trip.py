@@ -0,0 +1,322 @@
+"""
+Measure the real round-trip latency from output to input
+Plays a test signal (log chirp or MLS) through the output, records the input
+and finds the delay by FFT cross-correlation, over many trials. Needs a path
+from output to input: a loopback cable, the speaker next to the mic, or the
+virtual backend's 'loopback' source. Results are cached per device pair and
+configuration, and voice_changer.py shows them next to its own estimate.
+
+    python round_trip.py --block-size 256 512 1024 --pipeline 0 2
+    VOICE_CHANGER_BACKEND=virtual VOICE_CHANGER_INPUT=loopback python round_trip.py
+"""
+import argparse
+import math
+import threading
+import time
+import numpy as np
+from block_processor import BlockProcessor
+from cache import load_json, save_json
+from device_probe import pair_key
+from effect_chain import PRESETS, build_chain
+
+CACHE_NAME = 'round_trip'
+SIGNAL = 'chirp'       # 'chirp' (log sweep) or 'mls' (maximum length sequence)
+TRIALS = 10            # Test signals played per configuration
+SIGNAL_SECONDS = 0.1   # Length of each test signal
+MAX_LATENCY = 0.5      # Longest round trip looked for (seconds), also the gap between trials
+LEVEL_DB = -12         # Test signal peak level (dBFS)
+MIN_CONFIDENCE = 8.0   # Correlation peak over its RMS below which a trial is discarded
+
+# Feedback taps of maximal-length shift registers, by register length
+MLS_TAPS = {10: (10, 7), 11: (11, 9), 12: (12, 11, 10, 4), 13: (13, 12, 11, 8),
+            14: (14, 13, 12, 2), 15: (15, 14), 16: (16, 15, 13, 4), 17: (17, 14), 18: (18, 11)}
+
+
+def chirp(samplerate, seconds=SIGNAL_SECONDS, f0=100.0, f1=8000.0):
+    """Logarithmic sine sweep with short fades, so it starts and stops without clicks"""
+    f1 = min(f1, 0.45 * samplerate)
+    t = np.arange(int(seconds * samplerate)) / samplerate
+    rate = math.log(f1 / f0)
+    sweep = np.sin(2 * np.pi * f0 * seconds / rate * (np.exp(t / seconds * rate) - 1))
+    fade = min(len(t) // 4, int(0.005 * samplerate))
+    ramp = np.sin(np.linspace(0, np.pi / 2, fade)) ** 2
+    sweep[:fade] *= ramp
+    sweep[len(sweep) - fade:] *= ramp[::-1]
+    return sweep.astype(np.float32)
+
+
+def mls(samplerate, seconds=SIGNAL_SECONDS):
+    """±1 maximum length sequence at least `seconds` long"""
+    order = min(max(10, math.ceil(math.log2(seconds * samplerate + 1))), max(MLS_TAPS))
+    taps = MLS_TAPS[order]
+    mask = (1 << order) - 1
+    state = 1
+    bits = np.empty(mask, dtype=np.float32)
+    for i in range(mask):
+        bits[i] = state & 1
+        feedback = 0
+        for tap in taps:
+            feedback ^= (state >> (tap - 1)) & 1
+        state = ((state << 1) | feedback) & mask
+    return 2 * bits - 1
+
+
+def test_signal(kind, samplerate, seconds=SIGNAL_SECONDS, level_db=LEVEL_DB):
+    signal = chirp(samplerate, seconds) if kind == 'chirp' else mls(samplerate, seconds)
+    return signal * np.float32(10 ** (level_db / 20))
+
+
+def find_delay(recording, reference):
+    """(delay in frames, confidence) of reference inside recording
+
+    Cross-correlation by FFT over the lags where the whole reference fits,
+    refined to a fraction of a frame with a parabola through the peak.
+    Confidence is the peak over the RMS of the correlation.
+    """
+    lags = len(recording) - len(reference) + 1
+    if lags < 1:
+        raise ValueError("recording is shorter than the reference")
+    size = 1 << (len(recording) + len(reference) - 1).bit_length()
+    spectrum = np.fft.rfft(recording, size) * np.conj(np.fft.rfft(reference, size))
+    corr = np.abs(np.fft.irfft(spectrum, size)[:lags])
+    peak = int(np.argmax(corr))
+    delay = float(peak)
+    if 0 < peak < lags - 1:
+        left, centre, right = corr[peak - 1:peak + 2]
+        curve = left - 2 * centre + right
+        if curve < 0:
+            delay += 0.5 * (left - right) / curve
+    rms = math.sqrt(float(np.mean(corr * corr)))
+    return delay, (corr[peak] / rms if rms > 0 else 0.0)
+
+
+class RoundTripProbe:
+    """Stream callback that plays test signals and records what comes back
+
+    Trial k plays the signal at frame k * period and looks for it in the
+    next `period` frames of input. `process`, a stream callback such as the
+    voice changer's own, sits between the signal and the output, so its
+    delay (pipeline blocks, effect latency) is part of what is measured.
+    """
+
+    def __init__(self, signal, samplerate, block_size, trials=TRIALS, max_latency=MAX_LATENCY,
+                 in_channels=1, process=None):
+        self.signal = signal
+        self.samplerate = int(samplerate)
+        self.trials = int(trials)
+        self.period = len(signal) + int(max_latency * samplerate)
+        self.frames = self.period * self.trials + len(signal)
+        self._play = np.zeros(self.frames, dtype=np.float32)
+        for k in range(self.trials):
+            self._play[k * self.period:k * self.period + len(signal)] = signal
+        self._recorded = np.zeros(self.frames, dtype=np.float32)
+        self._source = np.zeros((block_size, in_channels), dtype=np.float32)
+        self.process = process
+        self.position = 0
+        self.xruns = 0
+        self.done = threading.Event()
+
+    def callback(self, indata, outdata, frames, time, status):
+        if status:
+            self.xruns += 1
+        start = self.position
+        n = max(0, min(frames, self.frames - start))
+        if n:
+            self._recorded[start:start + n] = indata[:n, 0]
+        if self.process is None:
+            outdata.fill(0)
+            np.copyto(outdata[:n], self._play[start:start + n, np.newaxis])
+        else:
+            source = self._source[:frames]
+            source.fill(0)
+            np.copyto(source[:n], self._play[start:start + n, np.newaxis])
+            self.process(source, outdata, frames, time, status)
+        self.position += n
+        if self.position >= self.frames:
+            self.done.set()
+
+    def analyse(self, min_confidence=MIN_CONFIDENCE):
+        """Per-trial delays and their summary, in milliseconds"""
+        delays = []
+        confidence = []
+        for k in range(self.trials):
+            start = k * self.period
+            window = self._recorded[start:start + self.period + len(self.signal)]
+            delay, strength = find_delay(window, self.signal)
+            confidence.append(strength)
+            if strength >= min_confidence:
+                delays.append(float(delay) / self.samplerate * 1000)
+        result = {
+            'trials': self.trials,
+            'valid': len(delays),
+            'xruns': self.xruns,
+            'delays_ms': [round(d, 3) for d in delays],
+            'best_confidence': float(max(confidence)),
+        }
+        if delays:
+            ms = np.array(delays)
+            result.update({
+                'median_ms': float(np.median(ms)),
+                'mean_ms': float(ms.mean()),
+                'min_ms': float(ms.min()),
+                'max_ms': float(ms.max()),
+                'jitter_ms': float(ms.std()),
+            })
+        return result
+
+
+def voice_changer_path(block_size, samplerate, channels=(1, 1), pipeline_blocks=0):
+    """The voice changer's stream callback with the passthrough preset
+
+    Returns (callback, pipeline), pipeline being None unless pipeline_blocks
+    > 0; start and stop it around the measurement.
+    """
+    in_channels, out_channels = channels
+    process_channels = min(in_channels, out_channels)
+    chain = build_chain(PRESETS['Normal (passthrough)'], block_size, samplerate,
+                        channels=process_channels)
+    processor = BlockProcessor(chain, block_size, in_channels, out_channels, process_channels)
+    if pipeline_blocks <= 0:
+        return processor.callback, None
+    from pipeline import PipelinedProcessor
+    pipeline = PipelinedProcessor(processor.process, block_size, in_channels, out_channels,
+                                  latency_blocks=pipeline_blocks)
+    return pipeline.callback, pipeline
+
+
+def measure(sd, stream_kwargs, block_size, signal=SIGNAL, trials=TRIALS,
+            max_latency=MAX_LATENCY, pipeline_blocks=None):
+    """Run the trials on one duplex stream and return probe.analyse()
+
+    pipeline_blocks None plays the signal straight to the output (the device
+    round trip only); 0 or more puts the voice changer's own block
+    processing, with that many pipeline blocks, in the loop.
+    """
+    samplerate = int(stream_kwargs['samplerate'])
+    channels = stream_kwargs.get('channels', 1)
+    if not isinstance(channels, (tuple, list)):
+        channels = (channels, channels)
+    process = pipeline = None
+    if pipeline_blocks is not None:
+        process, pipeline = voice_changer_path(block_size, samplerate, channels, pipeline_blocks)
+    probe = RoundTripProbe(test_signal(signal, samplerate), samplerate, block_size, trials,
+                           max_latency, channels[0], process)
+    if pipeline is not None:
+        pipeline.start()
+    timeout = 2 * probe.frames / samplerate + 2.0
+    try:
+        with sd.Stream(blocksize=block_size, callback=probe.callback,
+                       **stream_kwargs) as stream:
+            deadline = time.monotonic() + timeout
+            while not probe.done.is_set() and time.monotonic() < deadline:
+                sd.sleep(50)
+            stream.stop()
+    finally:
+        if pipeline is not None:
+            pipeline.stop()
+    result = probe.analyse()
+    if pipeline is not None:
+        # Each underrun pushes the rest of the run a block later
+        result['underruns'] = pipeline.stats()['underruns']
+    if not probe.done.is_set():
+        result['error'] = f"stream stopped after {probe.position} of {probe.frames} frames"
+    return result
+
+
+def config_key(samplerate, block_size, pipeline_blocks=None):
+    path = 'device only' if pipeline_blocks is None else f"pipeline {pipeline_blocks}"
+    return f"{int(samplerate)} Hz, {int(block_size)} frames, {path}"
+
+
+def save_result(sd, input_device, output_device, key, result):
+    """Keep the latest result per device pair and configuration"""
+    cached = load_json(CACHE_NAME)
+    entry = dict(result, measured=time.strftime('%Y-%m-%d %H:%M:%S'))
+    cached.setdefault(pair_key(sd, input_device, output_device), {})[key] = entry
+    save_json(CACHE_NAME, cached)
+
+
+def measured_latency(sd, input_device, output_device, samplerate, block_size,
+                     pipeline_blocks=0):
+    """Cached result for this configuration, or None if it was never measured"""
+    cached = load_json(CACHE_NAME).get(pair_key(sd, input_device, output_device), {})
+    result = cached.get(config_key(samplerate, block_size, pipeline_blocks))
+    return result if result and 'median_ms' in result else None
+
+
+def format_result(result):
+    if 'median_ms' not in result:
+        return (f"❌ no trial found the signal ({result['valid']}/{result['trials']}, "
+                f"best confidence {result['best_confidence']:.1f})")
+    xruns = f", {result['xruns']} xruns" if result['xruns'] else ""
+    if result.get('underruns'):
+        xruns += f", {result['underruns']} pipeline underruns"
+    return (f"{result['median_ms']:.1f} ms median, {result['min_ms']:.1f}-{result['max_ms']:.1f} ms, "
+            f"jitter {result['jitter_ms']:.2f} ms ({result['valid']}/{result['trials']} trials{xruns})")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--input', '-i', type=int, help="input device index (default: system default)")
+    parser.add_argument('--output', '-o', type=int, help="output device index (default: system default)")
+    parser.add_argument('--samplerate', '-r', type=int, help="default: the input's own rate")
+    parser.add_argument('--block-size', '-b', type=int, nargs='+', default=[512],
+                        help="block sizes to measure (default 512)")
+    parser.add_argument('--pipeline', '-p', type=int, nargs='+',
+                        help="also measure the voice changer path with these PIPELINE_BLOCKS")
+    parser.add_argument('--trials', '-n', type=int, default=TRIALS)
+    parser.add_argument('--signal', choices=['chirp', 'mls'], default=SIGNAL)
+    parser.add_argument('--max-latency', type=float, default=MAX_LATENCY,
+                        help=f"longest round trip to look for, seconds (default {MAX_LATENCY})")
+    parser.add_argument('--no-save', action='store_true', help="do not cache the results")
+    parser.add_argument('--show', action='store_true', help="print the cached results and exit")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    from audio_backend import sd
+
+    args = parse_args()
+    print("=== Round-Trip Latency ===\n")
+    if args.show:
+        for pair, configs in sorted(load_json(CACHE_NAME).items()):
+            print(pair)
+            for key, result in sorted(configs.items()):
+                print(f"  {key}: {format_result(result)} [{result.get('measured', '?')}]")
+        raise SystemExit(0)
+
+    input_device = args.input
+    if input_device is None:
+        input_device = sd.query_devices(kind='input')['index']
+    output_device = args.output
+    if output_device is None:
+        output_device = sd.query_devices(kind='output')['index']
+    samplerate = args.samplerate or int(sd.query_devices(input_device)['default_samplerate'])
+    device = input_device if input_device == output_device else (input_device, output_device)
+    stream_kwargs = dict(device=device, samplerate=samplerate, channels=1, dtype='float32')
+    print(f"{pair_key(sd, input_device, output_device)} @ {samplerate} Hz")
+    print(f"{args.trials} x {args.signal}, looking up to {args.max_latency * 1000:.0f} ms\n")
+
+    failed = False
+    for block_size in args.block_size:
+        for pipeline_blocks in [None] + (args.pipeline or []):
+            key = config_key(samplerate, block_size, pipeline_blocks)
+            try:
+                result = measure(sd, stream_kwargs, block_size, args.signal, args.trials,
+                                 args.max_latency, pipeline_blocks)
+            except Exception as e:
+                print(f"❌ {key}: {e}")
+                failed = True
+                continue
+            line = f"{key}: {format_result(result)}"
+            if pipeline_blocks is not None and 'median_ms' in result:
+                # What voice_changer.py prints for the same settings
+                estimate = (1 + pipeline_blocks) * block_size / samplerate * 1000
+                line += f" | estimate ~{estimate:.1f} ms"
+            print(("✓ " if 'median_ms' in result else "") + line)
+            if 'error' in result:
+                print(f"  ⚠ {result['error']}")
+            failed = failed or 'median_ms' not in result
+            if not args.no_save and 'median_ms' in result:
+                save_result(sd, input_device, output_device, key, result)
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,167 @@
+"""
+Startup time of the voice changer scripts
+Times each entry point's imports in a fresh interpreter, then launches
+voice_changer.py on the virtual backend (cached devices, no prompts to wait
+on) and reads back how long it took to deliver its first audio block.
+Results are saved as JSON so runs from different commits can be compared.
+
+    python startup_time.py --output startup.json
+    python startup_time.py --compare startup.json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+ENTRY_POINTS = ('voice_changer', 'voice_changer_android', 'main')
+HERE = os.path.dirname(os.path.abspath(__file__))
+STARTUP_LINE = re.compile(r"Startup: imports (\d+) ms, first audio block (\d+) ms")
+
+
+def child_env(cache_dir=None):
+    # A sine source is ready at once, synthetic speech would add its own start-up
+    env = dict(os.environ, VOICE_CHANGER_BACKEND='virtual', VOICE_CHANGER_INPUT='sine',
+               PYTHONUNBUFFERED='1')
+    if cache_dir:
+        env['VOICE_CHANGER_CACHE'] = cache_dir
+    return env
+
+
+def import_time(module, runs=5):
+    """Median seconds to import `module` in a fresh interpreter"""
+    code = (f"import time; start = time.perf_counter(); import {module}; "
+            f"print(time.perf_counter() - start)")
+    times = [float(subprocess.check_output([sys.executable, '-c', code], cwd=HERE,
+                                           env=child_env(), text=True))
+             for _ in range(runs)]
+    return float(np.median(times))
+
+
+def interpreter_time(runs=5):
+    """Median wall time of a bare `python -c pass`, paid before any import"""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, '-c', 'pass'])
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def launch(answers, cache_dir, timeout=60):
+    """Run voice_changer.py, answer its prompts and stop it after the first blocks
+
+    Returns (import seconds, set-up to first block seconds, total wall time
+    to the recording line), or None if it never reported a first block.
+    """
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, 'voice_changer.py'], cwd=HERE,
+                            env=child_env(cache_dir), stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    proc.stdin.write(answers)
+    proc.stdin.flush()
+    recording = None
+    output = []
+    deadline = time.monotonic() + timeout
+    for line in proc.stdout:
+        output.append(line)
+        if recording is None and 'RECORDING' in line:
+            recording = time.perf_counter() - start
+            # Let a few blocks through, then an empty line stops the stream
+            time.sleep(0.3)
+            proc.stdin.write('\n')
+            proc.stdin.flush()
+        if time.monotonic() > deadline:
+            proc.kill()
+            break
+    proc.wait()
+    match = STARTUP_LINE.search(''.join(output))
+    if match is None:
+        return None
+    return int(match.group(1)) / 1000, int(match.group(2)) / 1000, recording
+
+
+def time_to_first_block(runs=3):
+    """Median (imports, set-up to first block, launch to recording) in seconds"""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # The first launch picks the devices and probes them, later ones
+        # reuse the cache the way a normal second launch does
+        launch('0\n0\n1\n', cache_dir)
+        results = [launch('\n1\n', cache_dir) for _ in range(runs)]
+    results = [r for r in results if r is not None]
+    if not results:
+        return None
+    return tuple(float(np.median(column)) for column in zip(*results))
+
+
+def run(runs=5, launches=3):
+    """Measure everything and return a list of result dicts"""
+    results = [{'measure': 'interpreter', 'ms': interpreter_time(runs) * 1000}]
+    for module in ENTRY_POINTS:
+        results.append({'measure': f'import {module}', 'ms': import_time(module, runs) * 1000})
+    first_block = time_to_first_block(launches)
+    if first_block is not None:
+        imports, setup, recording = first_block
+        results.append({'measure': 'voice_changer imports (in process)', 'ms': imports * 1000})
+        results.append({'measure': 'voice_changer set-up to first block', 'ms': setup * 1000})
+        results.append({'measure': 'voice_changer launch to recording', 'ms': recording * 1000})
+    return results
+
+
+def compare(results, baseline, threshold=20.0, floor_ms=5.0):
+    """Print measures that got more than `threshold` percent (and `floor_ms`) slower"""
+    old = {r['measure']: r for r in baseline['results']}
+    regressions = 0
+    for r in results:
+        before = old.get(r['measure'])
+        if before is None:
+            continue
+        change = (r['ms'] / before['ms'] - 1) * 100
+        if change > threshold and r['ms'] - before['ms'] > floor_ms:
+            regressions += 1
+            print(f"✗ {r['measure']}: {before['ms']:.0f} -> {r['ms']:.0f} ms (+{change:.0f}%)")
+    if not regressions:
+        print(f"✓ No regressions over {threshold:.0f}% "
+              f"against {baseline['meta'].get('commit') or 'baseline'}")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', '-o', help="write results to this JSON file")
+    parser.add_argument('--compare', help="JSON file from an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=20.0,
+                        help="slowdown in percent reported as a regression (default 20)")
+    parser.add_argument('--runs', type=int, default=5, help="interpreters per import timing")
+    parser.add_argument('--launches', type=int, default=3, help="voice_changer.py launches")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # benchmark imports every script, only the report metadata is needed here
+    from benchmark import metadata
+
+    print("=== Startup Time ===\n")
+    results = run(args.runs, args.launches)
+    for r in results:
+        print(f"{r['measure']:<40} {r['ms']:>8.1f} ms")
+    if not any(r['measure'].endswith('first block') for r in results):
+        print("❌ voice_changer.py never reported its first audio block")
+
+    report = {'meta': metadata(), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Saved {len(results)} results to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print()
+        if compare(results, baseline, args.threshold):
+            raise SystemExit(1)
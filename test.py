@@ -1,4 +1,4 @@
-import sounddevice as sd
+from audio_backend import sd
 import numpy as np
 
 # List devices
@@ -0,0 +1,94 @@
+"""
+Check that the audio callback does not allocate per block
+Runs synthetic callbacks under tracemalloc (no audio device needed)
+"""
+import sys
+import tracemalloc
+import numpy as np
+from pitch_shifter import StreamingPitchShifter
+from effect_chain import PRESETS, build_chain, preserve_formants
+from block_processor import BlockProcessor
+from effect_switcher import SwitchableEffect
+from silence_gate import SilenceGate
+
+print("=== Callback Allocation Test ===\n")
+
+SAMPLE_RATE = 48000
+NUM_BLOCKS = 500
+
+# Test configurations: (name, block size, input channels, output channels,
+# channels processed by the effect, effect)
+configs = [
+    ("256 frames, mono, chipmunk", 256, 1, 1, 1, lambda n: StreamingPitchShifter(1.5, n)),
+    ("1024 frames, stereo, deep voice", 1024, 2, 2, 1, lambda n: StreamingPitchShifter(0.7, n)),
+    ("1024 frames, mono -> stereo, passthrough", 1024, 1, 2, 1,
+     lambda n: StreamingPitchShifter(1.0, n)),
+    ("256 frames, mono, robot chain", 256, 1, 1, 1,
+     lambda n: build_chain(PRESETS['Robot'], n, SAMPLE_RATE)),
+    ("512 frames, stereo, demon chain", 512, 2, 2, 1,
+     lambda n: build_chain(PRESETS['Demon'], n, SAMPLE_RATE)),
+    ("1024 frames, true stereo, deep voice", 1024, 2, 2, 2,
+     lambda n: StreamingPitchShifter(0.7, n, channels=2)),
+    ("512 frames, true stereo, demon chain", 512, 2, 2, 2,
+     lambda n: build_chain(PRESETS['Demon'], n, SAMPLE_RATE, channels=2)),
+    ("512 frames, true stereo, switching robot -> demon", 512, 2, 2, 2,
+     lambda n: SwitchableEffect(lambda spec: build_chain(spec, n, SAMPLE_RATE, channels=2),
+                                PRESETS['Robot'], n, channels=2)),
+    ("1024 frames, int16 mono, deep voice", 1024, 1, 1, 1,
+     lambda n: StreamingPitchShifter(0.7, n)),
+    ("512 frames, int16 true stereo, demon chain", 512, 2, 2, 2,
+     lambda n: build_chain(PRESETS['Demon'], n, SAMPLE_RATE, channels=2)),
+    ("512 frames, true stereo, demon chain, formants kept", 512, 2, 2, 2,
+     lambda n: build_chain(preserve_formants(PRESETS['Demon']), n, SAMPLE_RATE, channels=2)),
+    ("480 frames, mono, chipmunk, formants kept", 480, 1, 1, 1,
+     lambda n: build_chain(preserve_formants(PRESETS['Chipmunk']), n, SAMPLE_RATE)),
+    ("256 frames, mono, silence-gated deep voice", 256, 1, 1, 1,
+     lambda n: SilenceGate(StreamingPitchShifter(0.7, n), n, SAMPLE_RATE)),
+    ("512 frames, true stereo, silence-gated demon chain, dry while idle", 512, 2, 2, 2,
+     lambda n: SilenceGate(build_chain(PRESETS['Demon'], n, SAMPLE_RATE, channels=2), n,
+                           SAMPLE_RATE, channels=2, idle='passthrough')),
+]
+
+failed = False
+for name, block_size, in_ch, out_ch, channels, make_effect in configs:
+    print(f"Testing: {name}...", end=" ")
+    processor = BlockProcessor(make_effect(block_size), block_size, in_ch, out_ch, channels)
+
+    # int16 streams are converted at the edges, also without allocating
+    dtype = np.int16 if 'int16' in name else np.float32
+    t = np.arange(block_size * NUM_BLOCKS) / SAMPLE_RATE
+    signal = 0.3 * np.sin(2 * np.pi * 220 * t)
+    if 'gated' in name:
+        # Bursts and pauses longer than the hangover, so the gate opens and closes
+        signal *= (np.arange(len(t)) // (block_size * 60)) % 2
+    signal = (signal * 32767 if dtype == np.int16 else signal).astype(dtype)
+    indata = np.zeros((block_size, in_ch), dtype=dtype)
+    outdata = np.empty((block_size, out_ch), dtype=dtype)
+
+    # Warm up so lazily created state is not counted
+    for _ in range(10):
+        processor.callback(indata, outdata, block_size, None, None)
+
+    # Queue a preset change, the measured callbacks pick it up and crossfade
+    if isinstance(processor.effect, SwitchableEffect):
+        processor.effect.request(PRESETS['Demon'])
+
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    for i in range(NUM_BLOCKS):
+        indata[:] = signal[i * block_size:(i + 1) * block_size, np.newaxis]
+        processor.callback(indata, outdata, block_size, None, None)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Room for a few transient array views, but not for one float32 block
+    limit = block_size * 4 + 512
+    if peak - baseline < limit and current - baseline < limit:
+        print(f"✓ SUCCESS (peak +{peak - baseline} bytes)")
+    else:
+        print(f"✗ FAILED: peak +{peak - baseline} bytes, "
+              f"retained +{current - baseline} bytes")
+        failed = True
+
+print("\n=== Test Complete ===")
+sys.exit(1 if failed else 0)
@@ -1,9 +1,10 @@
 """
 Android-specific audio test script
-Tests different configurations to find what works on your device
+Tests different configurations to find what works on your device, and caches
+the results so voice_changer.py opens a working one straight away
 """
-import sounddevice as sd
-import numpy as np
+from audio_backend import sd
+from device_probe import known_configs, describe
 
 print("=== Android Audio Test ===\n")
 
@@ -20,38 +21,15 @@ device_id = 0
 dev_info = devices[device_id]
 print(f"Testing device: [{device_id}] {dev_info['name']}")
 
-# Test configurations
-configs = [
-    ("44100 Hz, 1 channel", 44100, 1),
-    ("48000 Hz, 1 channel", 48000, 1),
-    ("44100 Hz, 2 channels", 44100, 2),
-    ("48000 Hz, 2 channels", 48000, 2),
-]
-
 print("\n=== Testing Configurations ===\n")
 
-def callback(indata, outdata, frames, time, status):
-    """Simple passthrough"""
-    if indata.ndim == 1:
-        outdata.fill(0)
-        outdata[:len(indata), 0] = indata
-    else:
-        outdata[:] = indata
+# Always probe again here, the point of this script is a fresh answer
+probed, _ = known_configs(sd, device_id, device_id, reprobe=True)
 
-for name, sample_rate, channels in configs:
-    print(f"Testing: {name}...", end=" ")
-    try:
-        with sd.Stream(
-            device=device_id,
-            samplerate=sample_rate,
-            blocksize=1024,
-            dtype='float32',
-            channels=channels,
-            callback=callback
-        ):
-            sd.sleep(500)  # Test for 0.5 seconds
-        print("✓ SUCCESS")
-    except Exception as e:
-        print(f"✗ FAILED: {str(e)[:60]}")
+print("\nWorking configurations (best first, cached for voice_changer.py):")
+for config in probed['configs']:
+    print(f"  ✓ {describe(config)}")
+if not probed['configs']:
+    print("  ✗ None")
 
 print("\n=== Test Complete ===")
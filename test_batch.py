@@ -0,0 +1,184 @@
+"""
+Check offline batch processing against the live callback (no audio device needed)
+The memory-mapped reader must decode like read_wav, stay small on long files,
+and the batch output must equal a live virtual-stream run bit for bit.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+import wave
+import numpy as np
+import virtual_audio
+import batch
+from synthetic import speech_like
+from wav_io import WavReader, read_wav, write_wav
+
+print("=== Batch Processing Test ===\n")
+
+SAMPLE_RATE = 48000
+TMP = tempfile.mkdtemp(prefix='batch_test_')
+
+
+def write_pcm(path, audio, sampwidth):
+    """Write float audio at any PCM width, for reader coverage"""
+    scale = 2.0 ** (8 * sampwidth - 1)
+    ints = np.clip(np.round(audio * scale), -scale, scale - 1).astype('<i4')
+    if sampwidth == 1:
+        raw = (ints + 128).astype(np.uint8).tobytes()
+    elif sampwidth == 3:
+        raw = ints.view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+    else:
+        raw = ints.astype(f'<i{sampwidth}').tobytes()
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(audio.shape[1])
+        f.setsampwidth(sampwidth)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(raw)
+
+
+def clip(name, seconds, channels, seed=0):
+    """Speech-like test clip with a length that is not a whole number of blocks"""
+    audio = speech_like(seconds, SAMPLE_RATE, seed=seed)[:, np.newaxis]
+    audio = np.repeat(audio, channels, axis=1)
+    if channels > 1:
+        audio[:, 1] *= 0.5
+    path = os.path.join(TMP, name)
+    write_wav(path, audio, SAMPLE_RATE)
+    return path
+
+
+def live_output(path, preset, block_size, channels):
+    """Output of the live processor driven by a virtual stream over the file"""
+    processor = batch.make_processor(preset, block_size, SAMPLE_RATE, channels)
+    blocks = []
+
+    def callback(indata, outdata, frames, time, status):
+        processor.callback(indata, outdata, frames, time, status)
+        blocks.append(outdata.copy())
+
+    virtual_audio.run_callback(callback, source=path, samplerate=SAMPLE_RATE,
+                               blocksize=block_size, channels=channels)
+    return np.concatenate(blocks)
+
+
+# Each check returns (ok, details)
+
+def check_reader():
+    rng = np.random.default_rng(0)
+    audio = rng.uniform(-0.9, 0.9, (12345, 2))
+    wrong = []
+    for width in (1, 2, 3, 4):
+        path = os.path.join(TMP, f'pcm{width * 8}.wav')
+        write_pcm(path, audio, width)
+        expected, _ = read_wav(path)
+        with WavReader(path) as reader:
+            got = np.concatenate([chunk for _, chunk in reader.chunks(1000)])
+        if not np.array_equal(got, expected):
+            wrong.append(f"{width * 8}-bit")
+    return not wrong, "8/16/24/32-bit match read_wav" + (f", wrong: {wrong}" if wrong else "")
+
+
+def check_memory():
+    path = clip('long.wav', 60, 2)
+    size = os.path.getsize(path)
+    block_size = 1024
+    tracemalloc.start()
+    with WavReader(path) as reader:
+        processor = batch.make_processor('Robot', block_size, SAMPLE_RATE, 2)
+        frames = sum(len(out) for out in batch.process_blocks(reader, processor, block_size))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # A few decoded chunks (PCM view, float copy, output), never the whole file
+    chunk_bytes = block_size * batch.CHUNK_BLOCKS * 2 * 4
+    ok = peak < 6 * chunk_bytes and frames == reader.frames
+    return ok, (f"peak {peak / 1e6:.1f} MB for a {size / 1e6:.1f} MB file, "
+                f"{peak / chunk_bytes:.1f} chunks")
+
+
+def check_live_match(preset, channels, block_size):
+    path = clip(f'live_{channels}_{block_size}.wav', 2.3, channels, seed=channels)
+    live = live_output(path, preset, block_size, channels)
+    with WavReader(path) as reader:
+        processor = batch.make_processor(preset, block_size, SAMPLE_RATE, channels)
+        offline = np.concatenate(list(batch.process_blocks(reader, processor, block_size)))
+    same = np.array_equal(live[:len(offline)], offline)
+    return same, f"{len(offline)} frames " + ("identical" if same else "differ")
+
+
+def check_pool():
+    seconds = [1.5 + 0.4 * i for i in range(4)]
+    paths = [clip(f'pool{i}.wav', s, 1 + i % 2, seed=i) for i, s in enumerate(seconds)]
+    lines = []
+    _, inline = batch.run(paths, 'Demon', os.path.join(TMP, 'inline'), 512, jobs=1,
+                          report=lines.append)
+    results, pooled = batch.run(paths, 'Demon', os.path.join(TMP, 'pooled'), 512, jobs=2,
+                                report=lines.append)
+    same = True
+    for r in results:
+        with open(r['output'], 'rb') as a, \
+                open(r['output'].replace('pooled', 'inline'), 'rb') as b:
+            same = same and a.read() == b.read()
+    ok = same and not pooled['failed'] and abs(pooled['audio_seconds'] - sum(seconds)) < 0.01
+    return ok, (f"pool output {'identical' if same else 'differs'}, "
+                f"{pooled['speed']:.0f} audio-s/s with {pooled['jobs']} workers, "
+                f"{inline['speed']:.0f} inline")
+
+
+def check_bad_file():
+    bad = os.path.join(TMP, 'notes.wav')
+    with open(bad, 'w') as f:
+        f.write("not audio")
+    good = clip('good.wav', 0.5, 1)
+    lines = []
+    results, summary = batch.run([bad, good], 'Chipmunk', os.path.join(TMP, 'mixed'), 1024,
+                                 jobs=1, report=lines.append)
+    ok = summary['failed'] == 1 and 'error' in results[0] and 'output' in results[1]
+    return ok, results[0].get('error', 'no error reported')
+
+
+def check_same_names():
+    # Same basename in two folders, and one path given twice: every input gets its own file
+    for folder in ('a', 'b'):
+        os.makedirs(os.path.join(TMP, folder), exist_ok=True)
+    a = clip(os.path.join('a', 'take.wav'), 0.5, 1, seed=1)
+    b = clip(os.path.join('b', 'take.wav'), 0.5, 1, seed=2)
+    paths = [a, b, a]
+    results, summary = batch.run(paths, 'Chipmunk', os.path.join(TMP, 'same'), 512, jobs=3,
+                                 report=lambda line: None)
+    outputs = [r.get('output') for r in results]
+    alone = [batch.run([path], 'Chipmunk', os.path.join(TMP, f'alone{i}'), 512, jobs=1,
+                       report=lambda line: None)[0][0]['output'] for i, path in enumerate(paths)]
+    intact = all(np.array_equal(read_wav(out)[0], read_wav(ref)[0])
+                 for out, ref in zip(outputs, alone))
+    ok = (not summary['failed'] and len(set(outputs)) == 3 and intact
+          and [r['path'] for r in results] == paths)
+    return ok, f"outputs {[os.path.basename(out) for out in outputs]}"
+
+
+checks = [
+    ("memory-mapped reader decodes like read_wav", check_reader),
+    ("60 s file is read in chunks", check_memory),
+    ("Robot, stereo, 512 frames: batch == live", lambda: check_live_match('Robot', 2, 512)),
+    ("Demon, mono, 1024 frames: batch == live", lambda: check_live_match('Demon', 1, 1024)),
+    ("Chipmunk, stereo, 256 frames: batch == live",
+     lambda: check_live_match('Chipmunk', 2, 256)),
+    ("process pool matches inline processing", check_pool),
+    ("unreadable file is reported, others still run", check_bad_file),
+    ("inputs with the same name get separate outputs", check_same_names),
+]
+
+failed = False
+for name, check in checks:
+    print(f"Testing: {name}...", end=" ")
+    ok, details = check()
+    if ok:
+        print(f"✓ SUCCESS ({details})")
+    else:
+        print(f"✗ FAILED: {details}")
+        failed = True
+
+shutil.rmtree(TMP, ignore_errors=True)
+print("\n=== Test Complete ===")
+sys.exit(1 if failed else 0)
@@ -0,0 +1,146 @@
+"""
+Check device probing and its cache against the virtual backend (no audio device needed)
+The first lookup for a device pair must probe and cache what opened, later
+ones must reuse the cache without opening a stream, and forget() or
+reprobe=True must probe again.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+# A private cache, so the test neither reads nor clobbers the real one
+CACHE = tempfile.mkdtemp(prefix='vc-probe-test-')
+os.environ['VOICE_CHANGER_CACHE'] = CACHE
+
+import virtual_audio as sd
+from cache import load_json, save_json
+from device_probe import (BLOCK_SIZES, CACHE_NAME, candidate_configs, forget, known_configs,
+                          last_devices, pair_key, remember_devices)
+
+print("=== Device Probe Test ===\n")
+
+sd.config['realtime'] = False  # Probe streams only need their first callbacks
+DUPLEX, INPUT, OUTPUT = 0, 1, 2
+
+
+def streams_opened(fn):
+    """Run fn, returning its result and how many streams it opened"""
+    before = len(sd.history)
+    result = fn()
+    return result, len(sd.history) - before
+
+
+def quiet(line):
+    pass
+
+
+# Each check returns (ok, details)
+
+def check_first_probe():
+    lines = []
+    (entry, from_cache), opened = streams_opened(
+        lambda: known_configs(sd, DUPLEX, DUPLEX, log=lines.append))
+    cached = load_json(CACHE_NAME).get(pair_key(sd, DUPLEX, DUPLEX))
+    candidates = candidate_configs(sd.query_devices(DUPLEX), sd.query_devices(DUPLEX))
+    ok = (not from_cache and opened > 0 and cached == entry
+          and entry['configs'] == candidates and entry['blocksizes'] == list(BLOCK_SIZES)
+          and lines[0].startswith('Probing'))
+    return ok, (f"{opened} probe streams, {len(entry['configs'])} of {len(candidates)} "
+                f"configurations and {len(entry['blocksizes'])} block sizes cached")
+
+
+def check_reused():
+    first, _ = known_configs(sd, DUPLEX, DUPLEX, log=quiet)
+    lines = []
+    (entry, from_cache), opened = streams_opened(
+        lambda: known_configs(sd, DUPLEX, DUPLEX, log=lines.append))
+    ok = from_cache and opened == 0 and not lines and entry == first
+    return ok, f"second lookup: from cache, {opened} streams opened"
+
+
+def check_split_pair():
+    # A different pair gets its own entry; the output runs at another rate
+    sd.config['output_samplerate'] = 44100
+    try:
+        entry, from_cache = known_configs(sd, INPUT, OUTPUT, log=quiet)
+    finally:
+        sd.config['output_samplerate'] = None
+    cached = load_json(CACHE_NAME)
+    rates = {(c['samplerate'], c['output_samplerate']) for c in entry['configs']}
+    ok = (not from_cache and pair_key(sd, INPUT, OUTPUT) in cached
+          and pair_key(sd, DUPLEX, DUPLEX) in cached and (48000, 44100) in rates)
+    return ok, f"{len(cached)} pairs cached, rates tried {sorted(rates)}"
+
+
+def check_reprobe_and_forget():
+    _, opened = streams_opened(
+        lambda: known_configs(sd, DUPLEX, DUPLEX, reprobe=True, log=quiet))
+    forget(sd, DUPLEX, DUPLEX)
+    dropped = pair_key(sd, DUPLEX, DUPLEX) not in load_json(CACHE_NAME)
+    (_, from_cache), again = streams_opened(lambda: known_configs(sd, DUPLEX, DUPLEX, log=quiet))
+    ok = opened > 0 and dropped and not from_cache and again > 0
+    return ok, f"reprobe opened {opened} streams, after forget() {again}"
+
+
+def check_last_devices():
+    remember_devices(sd, INPUT, OUTPUT)
+    found = last_devices(sd)
+    # A remembered device that is gone is not guessed at
+    cached = load_json(CACHE_NAME)
+    cached['_last']['input'] = 'Virtual: Unplugged Mic'
+    save_json(CACHE_NAME, cached)
+    gone = last_devices(sd)
+    ok = found == (INPUT, OUTPUT) and gone is None
+    return ok, f"remembered pair {found}, None once a device is missing"
+
+
+def check_start_failure():
+    # A cached configuration that opens but fails to start must send run() back
+    # to the re-probe path instead of the troubleshooting one
+    import contextlib
+    import io
+    os.environ['VOICE_CHANGER_BACKEND'] = 'virtual'
+    import voice_changer
+    entry, _ = known_configs(sd, DUPLEX, DUPLEX, log=quiet)
+    config = entry['configs'][0]
+    start = sd.Stream.start
+
+    def refuse(stream):
+        raise sd.PortAudioError("Device unavailable [PaErrorCode -9985]")
+
+    sd.Stream.start = refuse
+    printed = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(printed):
+            result = voice_changer.run(DUPLEX, DUPLEX, config, entry['blocksizes'][0])
+    finally:
+        sd.Stream.start = start
+    ok = result is False and 'Could not open' in printed.getvalue()
+    return ok, "start failure reported as a configuration that does not open"
+
+
+checks = [
+    ("first lookup probes and caches", check_first_probe),
+    ("later lookups reuse the cache", check_reused),
+    ("each device pair cached separately", check_split_pair),
+    ("reprobe and forget() probe again", check_reprobe_and_forget),
+    ("last used pair found by name", check_last_devices),
+    ("stream that fails to start counts as not opened", check_start_failure),
+]
+
+failed = False
+try:
+    for name, check in checks:
+        print(f"Testing: {name}...", end=" ")
+        ok, details = check()
+        if ok:
+            print(f"✓ SUCCESS ({details})")
+        else:
+            print(f"✗ FAILED: {details}")
+            failed = True
+finally:
+    shutil.rmtree(CACHE, ignore_errors=True)
+
+print("\n=== Test Complete ===")
+sys.exit(1 if failed else 0)
@@ -1,4 +1,4 @@
-import sounddevice as sd
+from audio_backend import sd
 
 print("=== AUDIO DEVICES ===\n")
 devices = sd.query_devices()
@@ -0,0 +1,218 @@
+"""
+Check that audio stays float32 from input to output
+Every stage of every preset, the block processor (float32 and int16 streams),
+the rate bridge and the script-level pitch shifters are run while NumPy's
+ufuncs are traced, so any float32 buffer meeting a float64 operand is caught.
+"""
+import os
+import sys
+from contextlib import contextmanager
+import numpy as np
+
+# The scripts are only imported for their DSP functions, never opened
+os.environ.setdefault('VOICE_CHANGER_BACKEND', 'virtual')
+
+import main
+import voice_changer
+import voice_changer_android
+from block_processor import BlockProcessor
+from effect_chain import PRESETS, build_chain
+from effect_switcher import SwitchableEffect
+from pipeline import PipelinedProcessor
+from rate_bridge import RateBridge
+from synthetic import speech_like
+
+print("=== Float32 Pipeline Test ===\n")
+
+SAMPLE_RATE = 48000
+BLOCK_SIZE = 512
+NUM_BLOCKS = 20
+# Float arrays that are not audio: sample positions kept in float64 so long
+# blocks index the ring exactly, and per-stage timing totals
+NOT_AUDIO = {('RateBridge', '_ramp'), ('RateBridge', '_pos'),
+             ('EffectChain', 'stage_time'), ('EffectChain', 'stage_max')}
+
+promotions = []
+
+
+def _is_float64(x):
+    return (isinstance(x, np.ndarray) or isinstance(x, np.generic)) and x.dtype == np.float64
+
+
+def _is_float32(x):
+    return isinstance(x, np.ndarray) and x.dtype == np.float32
+
+
+class Traced:
+    """Stand-in for a ufunc that records float32/float64 meetings"""
+
+    def __init__(self, name, func):
+        self._name = name
+        self._func = func
+
+    def __call__(self, *args, **kwargs):
+        operands = list(args)
+        out = kwargs.get('out')
+        operands.extend(out if isinstance(out, tuple) else [out])
+        if any(map(_is_float32, operands)) and any(map(_is_float64, operands)):
+            promotions.append(self._name)
+        return self._func(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        # .reduce, .nin and friends, used inside NumPy itself
+        return getattr(self._func, attr)
+
+
+@contextmanager
+def trace_ufuncs():
+    """Record every ufunc call (and copyto) where float32 audio meets float64"""
+    originals = {name: getattr(np, name) for name in dir(np)
+                 if isinstance(getattr(np, name), np.ufunc)}
+    originals['copyto'] = np.copyto
+    for name, func in originals.items():
+        setattr(np, name, Traced(name, func))
+    try:
+        yield
+    finally:
+        for name, func in originals.items():
+            setattr(np, name, func)
+
+
+def wide_buffers(obj, seen=None):
+    """Names of float arrays held by obj (and its stages) that are not float32"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen or not hasattr(obj, '__dict__'):
+        return []
+    seen.add(id(obj))
+    found = []
+    for attr, value in vars(obj).items():
+        values = value if isinstance(value, (list, tuple)) else [value]
+        for item in values:
+            if isinstance(item, np.ndarray):
+                if (item.dtype.kind == 'f' and item.dtype != np.float32
+                        and (type(obj).__name__, attr) not in NOT_AUDIO):
+                    found.append(f"{type(obj).__name__}.{attr} ({item.dtype})")
+            elif type(item).__module__ not in ('builtins', 'numpy') and not callable(item):
+                found.extend(wide_buffers(item, seen))
+    return found
+
+
+SPEECH = speech_like(NUM_BLOCKS * BLOCK_SIZE / SAMPLE_RATE, SAMPLE_RATE)
+
+
+def blocks(channels=1, dtype=np.float32):
+    """Speech blocks in the stream's own sample format"""
+    audio = np.repeat(SPEECH[:, np.newaxis], channels, axis=1)
+    if dtype == np.int16:
+        audio = np.round(audio * 32767).astype(np.int16)
+    return audio.reshape(NUM_BLOCKS, BLOCK_SIZE, channels)
+
+
+# Each check returns (ok, details)
+
+def check_chain(spec, channels):
+    chain = build_chain(spec, BLOCK_SIZE, SAMPLE_RATE, channels=channels)
+    buf = np.empty((BLOCK_SIZE, channels), dtype=np.float32)
+    for block in blocks(channels):
+        np.copyto(buf, block)
+        for stage in chain.stages:
+            stage.process(buf)
+            if buf.dtype != np.float32:
+                return False, f"{stage!r} turned the block into {buf.dtype}"
+    wide = wide_buffers(chain)
+    return not wide, f"{len(chain.stages)} stages" + (f", wide buffers: {wide}" if wide else "")
+
+
+def check_processor(dtype, channels):
+    switcher = SwitchableEffect(lambda spec: build_chain(spec, BLOCK_SIZE, SAMPLE_RATE,
+                                                         channels=channels),
+                                PRESETS['Robot'], BLOCK_SIZE, channels)
+    processor = BlockProcessor(switcher, BLOCK_SIZE, 2, 2, channels)
+    outdata = np.empty((BLOCK_SIZE, 2), dtype=dtype)
+    for i, block in enumerate(blocks(2, dtype)):
+        if i == NUM_BLOCKS // 2:
+            switcher.request(PRESETS['Demon'])
+        processor.process(block, outdata, BLOCK_SIZE)
+    wide = wide_buffers(processor)
+    ok = outdata.dtype == dtype and not wide and np.any(outdata)
+    return ok, f"{np.dtype(dtype)} out" + (f", wide buffers: {wide}" if wide else "")
+
+
+def check_int16_passthrough():
+    processor = BlockProcessor(build_chain([], BLOCK_SIZE, SAMPLE_RATE, channels=2),
+                               BLOCK_SIZE, 2, 2, 2)
+    outdata = np.empty((BLOCK_SIZE, 2), dtype=np.int16)
+    worst = 0
+    for block in blocks(2, np.int16):
+        processor.process(block, outdata, BLOCK_SIZE)
+        worst = max(worst, int(np.abs(outdata.astype(np.int32) - block).max()))
+    return worst == 0, f"max error {worst} LSB"
+
+
+def check_pipeline_int16():
+    processor = BlockProcessor(build_chain(PRESETS['Chipmunk'], BLOCK_SIZE, SAMPLE_RATE),
+                               BLOCK_SIZE, 1, 1)
+    pipeline = PipelinedProcessor(processor.process, BLOCK_SIZE, 1, 1, dtype=np.int16)
+    outdata = np.empty((BLOCK_SIZE, 1), dtype=np.int16)
+    with pipeline:
+        for block in blocks(1, np.int16):
+            pipeline.callback(block, outdata, BLOCK_SIZE, None, None)
+    ok = pipeline._input._slots.dtype == np.int16 and pipeline._output._slots.dtype == np.int16
+    return ok, f"rings {pipeline._input._slots.dtype}"
+
+
+def check_rate_bridge():
+    bridge = RateBridge(SAMPLE_RATE, 44100, 2, BLOCK_SIZE, 470)
+    outdata = np.empty((470, 2), dtype=np.float32)
+    for i, block in enumerate(blocks(2)):
+        bridge.write(block, now=i * BLOCK_SIZE / SAMPLE_RATE)
+        bridge.read(outdata, now=i * BLOCK_SIZE / SAMPLE_RATE)
+    wide = wide_buffers(bridge)
+    return not wide, "float32 ring" + (f", wide buffers: {wide}" if wide else "")
+
+
+def check_scripts():
+    audio = blocks()[0, :, 0]
+    results = {
+        'voice_changer.pitch_shift_simple': voice_changer.pitch_shift_simple(audio, 1 / 1.5),
+        'main.pitch_shift': main.pitch_shift(audio, 1 / 1.5),
+        'voice_changer_android.pitch_shift_audio':
+            voice_changer_android.pitch_shift_audio(audio, 0.75),
+    }
+    wrong = [f"{name} ({out.dtype})" for name, out in results.items() if out.dtype != np.float32]
+    outdata = np.empty((BLOCK_SIZE, 1), dtype=np.int16)
+    voice_changer_android.process_block(blocks(1, np.int16)[0], outdata, BLOCK_SIZE)
+    return not wrong, f"{len(results)} functions + int16 Android block" + (
+        f", promoted: {wrong}" if wrong else "")
+
+
+checks = [(f"{name} chain ({'stereo' if ch > 1 else 'mono'})",
+           lambda spec=spec, ch=ch: check_chain(spec, ch))
+          for name, spec in PRESETS.items() for ch in (1, 2)]
+checks += [
+    ("block processor, float32 stream, switching", lambda: check_processor(np.float32, 2)),
+    ("block processor, int16 stream, switching", lambda: check_processor(np.int16, 2)),
+    ("block processor, int16 stream, mono effect", lambda: check_processor(np.int16, 1)),
+    ("int16 passthrough is bit-exact", check_int16_passthrough),
+    ("pipeline with int16 rings", check_pipeline_int16),
+    ("rate bridge 48k -> 44.1k", check_rate_bridge),
+    ("script pitch shifters", check_scripts),
+]
+
+failed = False
+for name, check in checks:
+    print(f"Testing: {name}...", end=" ")
+    del promotions[:]
+    with trace_ufuncs():
+        ok, details = check()
+    if promotions:
+        ok = False
+        details += f", float64 promotions in {sorted(set(promotions))}"
+    if ok:
+        print(f"✓ SUCCESS ({details})")
+    else:
+        print(f"✗ FAILED: {details}")
+        failed = True
+
+print("\n=== Test Complete ===")
+sys.exit(1 if failed else 0)
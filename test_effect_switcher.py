@@ -0,0 +1,147 @@
+"""
+Check switching effects on a running stream (no audio device needed)
+A switch must crossfade over exactly `crossfade` samples, prime the incoming
+chain with recent input, go through while a silence gate has the effect
+idle, and be reachable over the control channel.
+"""
+import os
+import sys
+import threading
+import time
+import numpy as np
+
+os.environ.setdefault('VOICE_CHANGER_BACKEND', 'virtual')
+
+import voice_changer
+from control import ControlServer, send_command
+from effect_chain import build_chain
+from effect_switcher import SwitchableEffect
+from silence_gate import SilenceGate
+
+print("=== Effect Switcher Test ===\n")
+
+SAMPLE_RATE = 48000
+BLOCK_SIZE = 512
+CROSSFADE = 1440
+
+
+class Recording:
+    """Chain stand-in that keeps a copy of every block it is given"""
+
+    latency = 0
+
+    def __init__(self, gain=1.0):
+        self.gain = gain
+        self.blocks = []
+
+    def process(self, audio, out=None):
+        self.blocks.append(audio.copy())
+        np.multiply(audio, self.gain, out=out)
+        return out
+
+
+def make_gain(spec):
+    return build_chain(spec, BLOCK_SIZE, SAMPLE_RATE)
+
+
+def run(effect, blocks):
+    out = np.empty(blocks.shape, dtype=np.float32)
+    for i, block in enumerate(blocks):
+        effect.process(block, out=out[i])
+    return out.reshape(-1)
+
+
+# Each check returns (ok, details)
+
+def check_crossfade():
+    switcher = SwitchableEffect(make_gain, [('gain', 1.0)], BLOCK_SIZE, crossfade=CROSSFADE)
+    ones = np.ones((2, BLOCK_SIZE), dtype=np.float32)
+    before = run(switcher, ones)
+    switcher.request([('gain', 0.25)])
+    after = run(switcher, np.ones((6, BLOCK_SIZE), dtype=np.float32))
+    # The fade starts at 1.0 on the first sample and settles on 0.25 after CROSSFADE
+    fading = int(np.count_nonzero((after > 0.25) & (after < 1.0)))
+    ok = (np.all(before == 1.0) and after[0] == 1.0 and fading == CROSSFADE - 1
+          and np.all(after[CROSSFADE:] == 0.25) and np.all(np.diff(after[:CROSSFADE + 1]) <= 0)
+          and switcher.switches == 1 and switcher.spec == [('gain', 0.25)]
+          and not switcher.switching)
+    return ok, f"gain 1.0 -> 0.25 over {fading + 1} samples, {switcher.switches} switch"
+
+
+def check_primed():
+    chains = {'old': Recording(), 'new': Recording(0.5)}
+    switcher = SwitchableEffect(lambda spec: chains[spec], 'old', BLOCK_SIZE, crossfade=CROSSFADE)
+    blocks = np.random.default_rng(0).standard_normal((4, BLOCK_SIZE)).astype(np.float32)
+    run(switcher, blocks[:2])
+    switcher.request('new')
+    run(switcher, blocks[2:])
+    seen = chains['new'].blocks
+    ok = len(seen) == 3 and all(np.array_equal(a, b) for a, b in zip(seen, blocks[1:]))
+    return ok, f"incoming chain saw the block before the switch, then {len(seen) - 1} live ones"
+
+
+def check_gated_switch():
+    chains = {'old': Recording(), 'new': Recording(0.5)}
+    switcher = SwitchableEffect(lambda spec: chains[spec], 'old', BLOCK_SIZE, crossfade=CROSSFADE)
+    gate = SilenceGate(switcher, BLOCK_SIZE, SAMPLE_RATE, hangover_ms=0)
+    quiet = np.zeros((3, BLOCK_SIZE), dtype=np.float32)
+    run(gate, quiet)
+    switcher.request('new')
+    run(gate, quiet[:1])
+    swapped = switcher.chain is chains['new'] and not switcher.switching
+    loud = np.full((1, BLOCK_SIZE), 0.5, dtype=np.float32)
+    out = run(gate, loud)
+    # Speech resumes on the new chain, pre-rolled with the last idle block
+    ok = (swapped and len(chains['new'].blocks) == 2 and np.all(out[-1] == 0.25)
+          and gate.skipped == 4)
+    return ok, f"switched on an idle block, {len(chains['new'].blocks)} blocks on the new chain"
+
+
+def check_control_channel():
+    switcher = SwitchableEffect(make_gain, voice_changer.EFFECTS['5'][1], BLOCK_SIZE,
+                                crossfade=CROSSFADE)
+    gate = SilenceGate(switcher, BLOCK_SIZE, SAMPLE_RATE)
+    voice_changer.switcher = switcher
+    stop = threading.Event()
+    quiet = np.zeros(BLOCK_SIZE, dtype=np.float32)
+    out = np.empty(BLOCK_SIZE, dtype=np.float32)
+
+    def stream():
+        # Stands in for the audio callback; the room is silent, so the gate is idle
+        while not stop.is_set():
+            gate.process(quiet, out=out)
+            time.sleep(BLOCK_SIZE / SAMPLE_RATE)
+
+    thread = threading.Thread(target=stream)
+    thread.start()
+    try:
+        with ControlServer(voice_changer.select_effect, port=0) as control:
+            reply = send_command('robot', port=control.port)
+            unknown = send_command('kazoo', port=control.port)
+    finally:
+        stop.set()
+        thread.join()
+    ok = (reply is not None and 'switched' in reply and 'Unknown' in unknown
+          and switcher.spec == voice_changer.EFFECTS['3'][1] and switcher.switches == 1)
+    return ok, f"replies: {reply!r}, {unknown!r}"
+
+
+checks = [
+    ("crossfade spans exactly the set length", check_crossfade),
+    ("incoming chain primed with recent input", check_primed),
+    ("switch goes through while the gate is idle", check_gated_switch),
+    ("switch over the control channel", check_control_channel),
+]
+
+failed = False
+for name, check in checks:
+    print(f"Testing: {name}...", end=" ")
+    ok, details = check()
+    if ok:
+        print(f"✓ SUCCESS ({details})")
+    else:
+        print(f"✗ FAILED: {details}")
+        failed = True
+
+print("\n=== Test Complete ===")
+sys.exit(1 if failed else 0)
@@ -0,0 +1,156 @@
+"""
+Check formant-preserving pitch shift (no audio device needed)
+The corrector must be transparent when it has nothing to correct, move the
+spectral envelope of shifted speech back, and stay cheap at 48 kHz / 512 frames.
+"""
+import sys
+import time
+import numpy as np
+from effect_chain import PRESETS, Gain, build_chain, preserve_formants
+from formant_corrector import FormantCorrector
+from pitch_shifter import StreamingPitchShifter
+from synthetic import speech_like
+
+print("=== Formant Correction Test ===\n")
+
+SAMPLE_RATE = 48000
+BLOCK_SIZE = 512
+SPEECH = speech_like(4.0, SAMPLE_RATE)
+
+
+def run(effect, audio, block_size=BLOCK_SIZE):
+    out = np.empty_like(audio)
+    for i in range(0, len(audio), block_size):
+        effect.process(audio[i:i + block_size], out=out[i:i + block_size])
+    return out
+
+
+def centroid(audio, limit=5000.0):
+    """Power-weighted mean frequency below `limit`, tracks where the formants are"""
+    size = 4096
+    frames = audio[:len(audio) // size * size].reshape(-1, size) * np.hanning(size)
+    power = (np.abs(np.fft.rfft(frames, axis=1)) ** 2).mean(axis=0)
+    freqs = np.fft.rfftfreq(size, 1 / SAMPLE_RATE)
+    band = freqs < limit
+    return (freqs[band] * power[band]).sum() / power[band].sum()
+
+
+def rms_db(audio):
+    return 20 * np.log10(np.sqrt(np.mean(np.square(audio, dtype=np.float64))))
+
+
+# Each check returns (ok, details)
+
+def check_transparent():
+    # With the correction limited to 0 dB the STFT alone must give the input back
+    rng = np.random.default_rng(0)
+    worst = 0.0
+    delays = []
+    for block_size, channels in ((512, 2), (480, 1), (441, 1), (64, 2)):
+        corrector = FormantCorrector(1.5, block_size, SAMPLE_RATE, channels, max_gain_db=0.0)
+        audio = rng.uniform(-0.5, 0.5, (block_size * 40, channels)).astype(np.float32)
+        out = run(corrector, audio, block_size)
+        delay, start = corrector.latency, corrector.frame
+        worst = max(worst, np.abs(out[start + delay:] - audio[start:len(audio) - delay]).max())
+        delays.append(f"{block_size}: {delay}")
+    return worst < 1e-6, f"max error {worst:.1e}, delay per block size {', '.join(delays)}"
+
+
+def check_formants_restored():
+    lines = []
+    ok = True
+    original = centroid(SPEECH)
+    for ratio in (1.5, 0.7):
+        shifted = run(StreamingPitchShifter(ratio, BLOCK_SIZE), SPEECH)
+        corrected = run(FormantCorrector(ratio, BLOCK_SIZE, SAMPLE_RATE), shifted)
+        moved, back = centroid(shifted), centroid(corrected)
+        ok = ok and abs(moved / original - 1) > 0.25 and abs(back / original - 1) < 0.08
+        lines.append(f"x{ratio:g}: {original:.0f} -> {moved:.0f} -> {back:.0f} Hz")
+    return ok, ", ".join(lines)
+
+
+def check_level_kept():
+    shifted = run(StreamingPitchShifter(0.7, BLOCK_SIZE), SPEECH)
+    corrected = run(FormantCorrector(0.7, BLOCK_SIZE, SAMPLE_RATE), shifted)
+    change = rms_db(corrected) - rms_db(shifted)
+    ok = abs(change) < 1.0 and np.isfinite(corrected).all()
+    return ok, f"level {change:+.2f} dB after correction"
+
+
+def check_short_last_block():
+    corrector = FormantCorrector(1.5, BLOCK_SIZE, SAMPLE_RATE)
+    audio = SPEECH[:BLOCK_SIZE * 10 + 100]
+    out = run(corrector, audio)
+    ok = len(out) == len(audio) and np.isfinite(out).all()
+    return ok, f"{len(audio) % BLOCK_SIZE}-frame last block, {len(out)} frames out"
+
+
+def check_chains():
+    spec = preserve_formants(PRESETS['Demon'])
+    names = [name for name, *_ in spec]
+    chain = build_chain(spec, BLOCK_SIZE, SAMPLE_RATE, channels=2)
+    plain = build_chain(PRESETS['Demon'], BLOCK_SIZE, SAMPLE_RATE, channels=2)
+    # Gain after the corrector is folded into its synthesis window
+    quiet = build_chain([('pitch', 1.5), ('formant', 1.5), ('gain', 0.5)], BLOCK_SIZE,
+                        SAMPLE_RATE)
+    loud = build_chain([('pitch', 1.5), ('formant', 1.5)], BLOCK_SIZE, SAMPLE_RATE)
+    folded = not any(isinstance(stage, Gain) for stage in quiet.stages)
+    same = np.allclose(run(quiet, SPEECH), 0.5 * run(loud, SPEECH), atol=1e-6)
+    ok = (names[names.index('pitch') + 1] == 'formant'
+          and chain.latency - plain.latency == 3 * BLOCK_SIZE // 2
+          and preserve_formants(PRESETS['Normal (passthrough)']) == []
+          and folded and same)
+    return ok, (f"{' -> '.join(names)}, +{chain.latency - plain.latency:.0f} samples, "
+                f"gain folded")
+
+
+def check_old_numpy_fft():
+    # NumPy before 2.0 has no out= on np.fft, the copying path must sound the same
+    shifted = run(StreamingPitchShifter(1.5, BLOCK_SIZE), SPEECH)
+    fast = FormantCorrector(1.5, BLOCK_SIZE, SAMPLE_RATE)
+    fallback = FormantCorrector(1.5, BLOCK_SIZE, SAMPLE_RATE)
+    fallback.fft_out = False
+    difference = np.abs(run(fast, shifted) - run(fallback, shifted)).max()
+    mode = "out=" if fast.fft_out else "copying"
+    return difference == 0, f"NumPy {np.__version__} uses {mode}, paths differ by {difference:.1e}"
+
+
+def check_budget():
+    deadline = BLOCK_SIZE / SAMPLE_RATE
+    stereo = np.stack([SPEECH, 0.8 * SPEECH], axis=1)
+    chain = build_chain(preserve_formants(PRESETS['Demon']), BLOCK_SIZE, SAMPLE_RATE,
+                        channels=2)
+    out = np.empty((BLOCK_SIZE, 2), dtype=np.float32)
+    times = []
+    for i in range(0, len(stereo) - BLOCK_SIZE + 1, BLOCK_SIZE):
+        start = time.perf_counter()
+        chain.process(stereo[i:i + BLOCK_SIZE], out=out)
+        times.append(time.perf_counter() - start)
+    median = float(np.median(times))
+    return median < 0.2 * deadline, (f"stereo demon chain with formants kept: "
+                                     f"{median * 1e6:.0f} us per block, "
+                                     f"{median / deadline * 100:.1f}% of the deadline")
+
+
+checks = [
+    ("unit gain gives the input back, delayed by its latency", check_transparent),
+    ("formants move back after a pitch shift", check_formants_restored),
+    ("frame energy is kept", check_level_kept),
+    ("short last block", check_short_last_block),
+    ("preserve_formants chains", check_chains),
+    ("FFTs without out= give the same output", check_old_numpy_fft),
+    ("within the callback budget at 48 kHz / 512 frames", check_budget),
+]
+
+failed = False
+for name, check in checks:
+    print(f"Testing: {name}...", end=" ")
+    ok, details = check()
+    if ok:
+        print(f"✓ SUCCESS ({details})")
+    else:
+        print(f"✗ FAILED: {details}")
+        failed = True
+
+print("\n=== Test Complete ===")
+sys.exit(1 if failed else 0)
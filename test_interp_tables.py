@@ -0,0 +1,105 @@
+"""
+Check the interpolation table cache (no audio device needed)
+Tables must be built once per (frames, factor, dtype, kind), evicted least
+recently used first and dropped on invalidate(), and applying one into a
+preallocated buffer must match np.interp without allocating.
+"""
+import sys
+import tracemalloc
+import numpy as np
+from interp_tables import InterpTableCache
+
+print("=== Interpolation Table Cache Test ===\n")
+
+BLOCK_SIZE = 1024
+
+
+# Each check returns (ok, details)
+
+def check_hits_and_misses():
+    cache = InterpTableCache()
+    first = cache.get(BLOCK_SIZE, 1.5)
+    again = [cache.get(BLOCK_SIZE, 1.5) for _ in range(9)]
+    cache.get(BLOCK_SIZE, 1.5, np.float64)
+    cache.get(BLOCK_SIZE, 1.5, kind='nearest')
+    stats = cache.stats()
+    ok = (all(table is first for table in again) and stats['hits'] == 9
+          and stats['misses'] == 3 and stats['size'] == 3)
+    return ok, (f"{stats['hits']} hits, {stats['misses']} misses, "
+                f"{stats['hit_rate'] * 100:.0f}% hit rate")
+
+
+def check_lru_eviction():
+    cache = InterpTableCache(maxsize=3)
+    oldest = cache.get(256, 0.75)
+    cache.get(512, 0.75)
+    cache.get(1024, 0.75)
+    # Using the oldest makes 512 the least recently used, so it goes first
+    kept = cache.get(256, 0.75) is oldest
+    cache.get(2048, 0.75)
+    keys = [key[0] for key in cache._tables]
+    rebuilt = cache.misses
+    cache.get(512, 0.75)
+    ok = kept and keys == [1024, 256, 2048] and cache.misses == rebuilt + 1
+    return ok, f"cached after a fourth table: {keys}, evicted one rebuilt on demand"
+
+
+def check_invalidate():
+    cache = InterpTableCache()
+    before = cache.get(BLOCK_SIZE, 1.5)
+    cache.invalidate()
+    empty = cache.stats()['size'] == 0
+    after = cache.get(BLOCK_SIZE, 1.5)
+    ok = empty and after is not before and cache.misses == 2 and cache.hits == 0
+    return ok, "every table dropped, the next lookup builds a new one"
+
+
+def check_apply_into_out():
+    cache = InterpTableCache()
+    audio = np.random.default_rng(0).standard_normal(BLOCK_SIZE).astype(np.float32)
+    worst = 0.0
+    for factor in (0.6, 0.75, 1.5, 1.8):
+        table = cache.get(BLOCK_SIZE, factor)
+        expected = np.interp(np.linspace(0, BLOCK_SIZE - 1, int(BLOCK_SIZE / factor)),
+                             np.arange(BLOCK_SIZE), audio)
+        out = np.empty(len(table), dtype=np.float32)
+        result = table.apply(audio, out=out)
+        worst = max(worst, float(np.abs(out - expected).max()))
+        if result is not out:
+            return False, f"factor {factor}: result is not the buffer passed in"
+    table = cache.get(BLOCK_SIZE, 0.75)
+    out = np.empty(len(table), dtype=np.float32)
+    tracemalloc.start()
+    # The first gathers under tracemalloc record a few KB of numpy set-up
+    for _ in range(1000):
+        table.apply(audio, out=out)
+    baseline, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for _ in range(1000):
+        table.apply(audio, out=out)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    ok = worst < 1e-5 and peak - baseline < BLOCK_SIZE
+    return ok, (f"max difference from np.interp {worst:.1e}, "
+                f"peak +{peak - baseline} bytes over 1000 applies")
+
+
+checks = [
+    ("repeat lookups hit, new keys miss", check_hits_and_misses),
+    ("least recently used table evicted", check_lru_eviction),
+    ("invalidate drops every table", check_invalidate),
+    ("apply writes into a preallocated buffer", check_apply_into_out),
+]
+
+failed = False
+for name, check in checks:
+    print(f"Testing: {name}...", end=" ")
+    ok, details = check()
+    if ok:
+        print(f"✓ SUCCESS ({details})")
+    else:
+        print(f"✗ FAILED: {details}")
+        failed = True
+
+print("\n=== Test Complete ===")
+sys.exit(1 if failed else 0)
@@ -0,0 +1,421 @@
+"""
+Check network audio over localhost (no audio device needed)
+The client callback is driven block by block against a real asyncio server;
+a small UDP relay in between drops, delays or reorders packets.
+"""
+import asyncio
+import json
+import socket
+import sys
+import threading
+import time
+import numpy as np
+from block_processor import BlockProcessor, float32_to_int16, int16_to_float32
+from effect_chain import PRESETS, build_chain
+from net_audio import (AUDIO, HEADER, HELLO, MAX_CHANNELS, MAX_FRAMES, AudioServer,
+                       NetworkClient, pack)
+from synthetic import speech_like
+
+print("=== Network Audio Test ===\n")
+
+SAMPLE_RATE = 48000
+BLOCK_SIZE = 512
+NUM_BLOCKS = 200
+EFFECT = PRESETS['Robot']
+
+loop = asyncio.new_event_loop()
+threading.Thread(target=loop.run_forever, daemon=True).start()
+server = AudioServer('Demon', BLOCK_SIZE, SAMPLE_RATE)
+UDP_PORT, TCP_PORT = asyncio.run_coroutine_threadsafe(server.start('127.0.0.1', 0), loop).result()
+
+
+class Relay(asyncio.DatagramProtocol):
+    """UDP hop between one client and the server that impairs audio packets"""
+
+    def __init__(self, up_loss=0.0, down_loss=0.0, delay=0.0, swap=False, seed=0,
+                 lose_hellos=0):
+        self.server = ('127.0.0.1', UDP_PORT)
+        self.lose_hellos = lose_hellos
+        self.up_loss = up_loss
+        self.down_loss = down_loss
+        self.delay = delay
+        self.swap = swap
+        self.rng = np.random.default_rng(seed)
+        self.client = None
+        self.held = None
+        self.dropped_up = []
+        self.dropped_down = []
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        _, kind, _, _, seq, _ = HEADER.unpack_from(data)
+        if addr != self.server:
+            self.client = addr
+            if kind == HELLO and self.lose_hellos:
+                self.lose_hellos -= 1
+            elif kind == AUDIO and self.rng.random() < self.up_loss:
+                self.dropped_up.append(seq)
+            else:
+                self.transport.sendto(data, self.server)
+            return
+        if kind != AUDIO:
+            self.transport.sendto(data, self.client)
+        elif self.rng.random() < self.down_loss:
+            self.dropped_down.append(seq)
+        elif self.delay:
+            loop.call_later(self.rng.uniform(0, self.delay), self.transport.sendto, data,
+                            self.client)
+        elif self.swap and self.held is None and seq % 2 == 0:
+            self.held = data
+        else:
+            self.transport.sendto(data, self.client)
+            if self.held is not None:
+                self.transport.sendto(self.held, self.client)
+                self.held = None
+
+
+def start_relay(**impairments):
+    async def create():
+        _, relay = await loop.create_datagram_endpoint(lambda: Relay(**impairments),
+                                                       local_addr=('127.0.0.1', 0))
+        return relay
+    relay = asyncio.run_coroutine_threadsafe(create(), loop).result()
+    return relay, relay.transport.get_extra_info('sockname')[1]
+
+
+def blocks():
+    audio = speech_like(NUM_BLOCKS * BLOCK_SIZE / SAMPLE_RATE, SAMPLE_RATE, seed=3)
+    return audio.astype(np.float32).reshape(NUM_BLOCKS, BLOCK_SIZE, 1)
+
+
+def quantise(block):
+    pcm = np.empty(block.shape, dtype=np.int16)
+    float32_to_int16(block, pcm, np.empty_like(block))
+    out = np.empty_like(block)
+    int16_to_float32(pcm, out)
+    return out
+
+
+def expected_blocks(audio):
+    """What the server's chain makes of the int16 blocks, as int16 again"""
+    processor = BlockProcessor(build_chain(EFFECT, BLOCK_SIZE, SAMPLE_RATE), BLOCK_SIZE, 1, 1, 1)
+    wet = np.empty((BLOCK_SIZE, 1), dtype=np.float32)
+    out = []
+    for block in audio:
+        processor.process(quantise(block), wet, BLOCK_SIZE)
+        out.append(quantise(wet))
+    return np.array(out)
+
+
+def wait(condition, timeout=0.05):
+    deadline = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < deadline:
+        time.sleep(0.0002)
+
+
+def run_client(port, protocol, audio, relay=None, pace=None):
+    """Play every block through the client; paced in real time or reply by reply"""
+    client = NetworkClient('127.0.0.1', port, protocol, BLOCK_SIZE, SAMPLE_RATE, 1,
+                           effect=EFFECT).start()
+    dropped = (lambda: len(relay.dropped_down)) if relay else (lambda: 0)
+
+    def answered():
+        stats = client.jitter
+        return stats.received + stats.late + dropped() >= client.sent
+
+    out = np.empty_like(audio)
+    for i, block in enumerate(audio):
+        client.callback(block, out[i], BLOCK_SIZE, None, None)
+        if pace:
+            time.sleep(pace)
+        else:
+            wait(answered)
+    wait(answered, 0.5)
+    client.stop()
+    return out, client.stats()
+
+
+def genuine(out, expected, max_delay):
+    """Output blocks that are some processed block unaltered (the delay may have grown)
+
+    Concealed blocks count too while both are silent, hence >= in the checks.
+    """
+    return sum(any(np.array_equal(out[k], expected[k - d]) for d in range(1, min(k, max_delay) + 1))
+               for k in range(1, len(out)))
+
+
+# Each check returns (ok, details)
+
+def check_clean(protocol):
+    audio = blocks()
+    port = UDP_PORT if protocol == 'udp' else TCP_PORT
+    out, stats = run_client(port, protocol, audio)
+    # Only a scheduling hiccup raising the target may interrupt playback
+    untouched = genuine(out, expected_blocks(audio), stats['target_blocks'])
+    ok = (untouched >= stats['played'] - stats['held'] and stats['concealed'] == stats['held']
+          and stats['lost'] == 0 and stats['late'] == 0)
+    return ok, (f"{stats['received']}/{stats['sent']} blocks back, {untouched} identical, "
+                f"{stats['target_blocks']} block late" if ok else f"stats {stats}")
+
+
+def check_downlink_loss():
+    audio = blocks()
+    relay, port = start_relay(down_loss=0.05, seed=1)
+    out, stats = run_client(port, 'udp', audio, relay)
+    delay = stats['target_blocks']
+    played = [seq for seq in relay.dropped_down if seq < NUM_BLOCKS - delay]
+    accounted = stats['received'] + len(relay.dropped_down) == stats['sent']
+    # Every lost block is concealed once (plus a hold if the target grew),
+    # every other block plays untouched
+    untouched = genuine(out, expected_blocks(audio), delay)
+    ok = (accounted and stats['late'] == 0
+          and stats['concealed'] == len(played) + stats['held']
+          and untouched >= stats['played'] - stats['concealed'])
+    return ok, (f"{len(relay.dropped_down)} replies dropped, {stats['concealed']} concealed, "
+                f"{untouched} untouched" if ok else f"stats {stats}, dropped {relay.dropped_down}")
+
+
+def check_uplink_loss():
+    audio = blocks()
+    before = server.stats()['concealed']
+    relay, port = start_relay(up_loss=0.05, seed=2)
+    _, stats = run_client(port, 'udp', audio, relay)
+    bridged = server.stats()['concealed'] - before
+    # The server bridges each gap, so every block still comes back (some late)
+    ok = bridged == len(relay.dropped_up) > 0 and stats['lost'] == 0
+    return ok, (f"{len(relay.dropped_up)} blocks dropped on the way in, {bridged} bridged "
+                f"by the server, {stats['late']} arrived late")
+
+
+def check_reorder():
+    audio = blocks()
+    relay, port = start_relay(swap=True)
+    out, stats = run_client(port, 'udp', audio, relay, pace=BLOCK_SIZE / SAMPLE_RATE)
+    # The first swapped pair arrives late and raises the target; from then on
+    # everything plays in order, only holds for a growing target interrupt it
+    untouched = genuine(out, expected_blocks(audio), stats['target_blocks'])
+    ok = (untouched >= stats['played'] - stats['concealed'] and stats['lost'] == 0
+          and stats['concealed'] == stats['held'] + stats['late'])
+    return ok, (f"target {stats['target_blocks']} blocks after {stats['late']} late, "
+                f"{stats['concealed']} concealed, {untouched} in order" if ok
+                else f"stats {stats}")
+
+
+def check_jitter():
+    audio = blocks()
+    block_seconds = BLOCK_SIZE / SAMPLE_RATE
+    relay, port = start_relay(delay=3 * block_seconds, seed=4)
+    _, stats = run_client(port, 'udp', audio, relay, pace=block_seconds)
+    ok = stats['target_blocks'] >= 3 and stats['jitter_ms'] > 1 and stats['lost'] == 0
+    return ok, (f"jitter {stats['jitter_ms']:.1f} ms -> target {stats['target_blocks']} blocks, "
+                f"{stats['concealed']} concealed, {stats['late']} late")
+
+
+def check_latency_stats():
+    _, stats = run_client(UDP_PORT, 'udp', blocks()[:50])
+    block_ms = BLOCK_SIZE / SAMPLE_RATE * 1000
+    # Capture block plus one to the final target's worth of buffering
+    ok = (0 < stats['rtt_p50_ms'] <= stats['rtt_p99_ms'] <= stats['rtt_max_ms']
+          and 2 * block_ms <= stats['latency_ms'] <= (1 + stats['target_blocks']) * block_ms)
+    return ok, (f"round trip p50 {stats['rtt_p50_ms']:.2f} ms, "
+                f"end to end {stats['latency_ms']:.1f} ms")
+
+
+def check_junk():
+    before = server.stats()['rejected']
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for junk in (b'', b'hello', b'VCN1' + bytes(40)):
+            sock.sendto(junk, ('127.0.0.1', UDP_PORT))
+    wait(lambda: server.stats()['rejected'] - before >= 2, 0.5)
+    rejected = server.stats()['rejected'] - before
+    return rejected >= 2, f"{rejected} malformed packets rejected"
+
+
+def hello(settings, channels=1):
+    body = settings if isinstance(settings, bytes) else json.dumps(settings).encode()
+    return pack(HELLO, 0, 0.0, body, len(body), channels)
+
+
+def check_bad_hello():
+    local = AudioServer('Robot', BLOCK_SIZE, SAMPLE_RATE)
+    bad = [
+        hello(b'{"block_size": 512'),
+        hello(b'\xff\xfe'),
+        hello([512]),
+        hello({'effect': [['chorus', 0.5]]}),
+        hello({'effect': 'pitch'}),
+        hello({'effect': [['pitch', 1.5, 1e12]]}),
+        hello({'effect': [['pitch', 1.5, 2, 3, 4]]}),
+        hello({'effect': [['pitch']]}),
+        hello({'effect': [['pitch', 100.0]]}),
+        hello({'effect': [['pitch', 1.5, 1]]}),
+        hello({'effect': [['stretch', 1.0, 0]]}),
+        hello({'effect': [['lowpass', 4000, 65535]]}),
+        hello({'effect': [['lowpass', 4000.0, -3]]}),
+        hello({'effect': [['lowpass', 0]]}),
+        hello({'effect': [['lowpass', 24000.0]]}),
+        hello({'effect': [['lowpass', 6000.0]], 'samplerate': 8000}),
+        hello({'effect': [['ringmod', 60.0, 'full']]}),
+        hello({'effect': [['distort', 0]]}),
+        hello({'block_size': 0}),
+        hello({'block_size': 10 ** 9}),
+        hello({'block_size': 512.5}),
+        hello({'samplerate': 1}),
+        hello({}, channels=0),
+        hello({}, channels=MAX_CHANNELS + 1),
+    ]
+    replies = sum(len(local.receive(packet, ('udp', i))) for i, packet in enumerate(bad))
+    stats = local.stats()
+    good = local.receive(hello({'effect': [['pitch', 0.75]], 'block_size': 256}), ('udp', 'ok'))
+    ok = replies == 0 and stats['clients'] == 0 and stats['rejected'] == len(bad) and len(good) == 1
+    return ok, (f"{stats['rejected']} of {len(bad)} bad HELLOs rejected without a session, "
+                f"a valid one still answered" if ok else f"stats {stats}, {len(good)} replies")
+
+
+def check_stage_limits():
+    # Every stage has limits, and the limits allow the presets and the defaults
+    from effect_chain import STAGES
+    from net_audio import STAGE_LIMITS, check_stage
+    for spec in PRESETS.values():
+        for stage in spec:
+            check_stage(stage, SAMPLE_RATE)
+    for name, (required, limits) in STAGE_LIMITS.items():
+        check_stage([name] + [low for low, _ in limits[:required]], SAMPLE_RATE)
+    # The heaviest chain a client may ask for still runs in real time
+    local = AudioServer('Robot', BLOCK_SIZE, SAMPLE_RATE)
+    answered = local.receive(hello({'effect': [['lowpass', 4000.0, 255]]}), ('udp', 'heavy'))
+    audio = pack(AUDIO, 0, 0.0, bytes(BLOCK_SIZE * 2), BLOCK_SIZE, 1)
+    started = time.perf_counter()
+    for _ in range(20):
+        local.receive(audio, ('udp', 'heavy'))
+    block_ms = (time.perf_counter() - started) / 20 * 1000
+    deadline_ms = BLOCK_SIZE / SAMPLE_RATE * 1000
+    ok = set(STAGE_LIMITS) == set(STAGES) and len(answered) == 1 and block_ms < deadline_ms / 4
+    return ok, (f"presets within the limits, longest low-pass {block_ms:.2f} ms a block "
+                f"against a {deadline_ms:.1f} ms deadline")
+
+
+def check_oversize():
+    local = AudioServer('Robot', BLOCK_SIZE, SAMPLE_RATE)
+    big = [pack(AUDIO, 0, 0.0, bytes(4000 * 200 * 2), 4000, 200),
+           pack(AUDIO, 0, 0.0, bytes((MAX_FRAMES + 1) * 2), MAX_FRAMES + 1, 1)]
+    replies = sum(len(local.receive(packet, ('udp', i))) for i, packet in enumerate(big))
+    largest = local.receive(pack(AUDIO, 0, 0.0, bytes(MAX_FRAMES * 2), MAX_FRAMES, 1),
+                            ('udp', 'max'))
+    # Over TCP the stream cannot be resynchronised, so a bad header ends the connection
+    before = server.stats()['rejected']
+    with socket.create_connection(('127.0.0.1', TCP_PORT), timeout=2) as sock:
+        sock.sendall(HEADER.pack(b'VCN1', AUDIO, 200, 60000, 0, 0.0))
+        closed = sock.recv(1) == b''
+    tcp_rejected = server.stats()['rejected'] - before
+    ok = (replies == 0 and local.stats()['rejected'] == len(big) and len(largest) == 1
+          and closed and tcp_rejected == 1)
+    return ok, (f"{len(big)} oversize UDP packets rejected, a {MAX_FRAMES}-frame one processed, "
+                f"oversize TCP header closes the connection" if ok
+                else f"stats {local.stats()}, tcp closed {closed}, rejected {tcp_rejected}")
+
+
+def check_errors():
+    # A server preset that cannot be built: clients without a HELLO fail packet by
+    # packet, one that sends its own effect is still served
+    local = AudioServer('Robot', BLOCK_SIZE, SAMPLE_RATE)
+    local.spec = [('stretch', 1.0, 0)]
+    audio = pack(AUDIO, 0, 0.0, bytes(BLOCK_SIZE * 2), BLOCK_SIZE, 1)
+    failed = sum(len(local.receive(audio, ('udp', i))) for i in range(3))
+    local.receive(hello({'effect': EFFECT}), ('udp', 'next'))
+    served = local.receive(audio, ('udp', 'next'))
+    stats = local.stats()
+    ok = failed == 0 and len(served) == 1 and stats['errors'] == 3 and stats['rejected'] == 0
+    return ok, (f"{stats['errors']} errors counted, the next client served" if ok
+                else f"stats {stats}")
+
+
+def check_session_limits():
+    local = AudioServer('Robot', BLOCK_SIZE, SAMPLE_RATE, max_sessions=2, session_timeout=0.05)
+    audio = pack(AUDIO, 0, 0.0, bytes(BLOCK_SIZE * 2), BLOCK_SIZE, 1)
+    answered = [len(local.receive(audio, key)) for key in
+                (('udp', 1), ('tcp', 2), ('udp', 3))]
+    full = local.stats()
+    time.sleep(0.1)
+    local.expire()
+    after = local.stats()
+    # The UDP session is gone, the TCP one lasts as long as its connection
+    ok = (answered == [1, 1, 0] and full['refused'] == 1 and after['expired'] == 1
+          and list(local.sessions) == [('tcp', 2)])
+    return ok, (f"third client refused at a cap of 2, idle UDP session expired"
+                if ok else f"answered {answered}, stats {after}, sessions {list(local.sessions)}")
+
+
+def check_hello_resent():
+    relay, port = start_relay(lose_hellos=2)
+    started = time.perf_counter()
+    client = NetworkClient('127.0.0.1', port, 'udp', BLOCK_SIZE, SAMPLE_RATE, 1,
+                           effect=EFFECT).start()
+    seconds = time.perf_counter() - started
+    session = server.sessions.get(('udp', relay.transport.get_extra_info('sockname')))
+    client.stop()
+    expected = [list(stage) for stage in EFFECT]
+    ok = relay.lose_hellos == 0 and session is not None and session.settings[0] == expected
+    return ok, (f"2 HELLOs lost, the third set up the client's effect after {seconds:.2f}s"
+                if ok else f"session {session and session.settings}")
+
+
+def check_no_server():
+    # A socket that never answers, so no port-unreachable error cuts the wait short
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as silent:
+        silent.bind(('127.0.0.1', 0))
+        client = NetworkClient('127.0.0.1', silent.getsockname()[1], 'udp', BLOCK_SIZE,
+                               SAMPLE_RATE, 1)
+        started = time.perf_counter()
+        try:
+            client.start(timeout=0.6)
+            error = None
+        except TimeoutError as e:
+            error = e
+        seconds = time.perf_counter() - started
+        silent.settimeout(0)
+        hellos = 0
+        try:
+            while silent.recv(65536):
+                hellos += 1
+        except BlockingIOError:
+            pass
+    ok = error is not None and hellos >= 2 and client._loop is None
+    return ok, (f"TimeoutError after {seconds:.2f}s and {hellos} HELLOs: {error}" if ok
+                else f"error {error!r}, {hellos} HELLOs")
+
+
+checks = [
+    ("clean UDP round trip matches the local chain", lambda: check_clean('udp')),
+    ("clean TCP round trip matches the local chain", lambda: check_clean('tcp')),
+    ("lost replies are concealed", check_downlink_loss),
+    ("lost uplink blocks are bridged by the server", check_uplink_loss),
+    ("reordered replies are played in order", check_reorder),
+    ("jitter grows the buffer", check_jitter),
+    ("latency stats", check_latency_stats),
+    ("malformed packets are ignored", check_junk),
+    ("malformed HELLOs are rejected", check_bad_hello),
+    ("stage limits cover every stage and allow the presets", check_stage_limits),
+    ("oversize packets are rejected", check_oversize),
+    ("processing errors are counted per packet", check_errors),
+    ("session table is capped and idle sessions expire", check_session_limits),
+    ("HELLO is resent until the server answers", check_hello_resent),
+    ("start() times out without a server", check_no_server),
+]
+
+failed = False
+for name, check in checks:
+    print(f"Testing: {name}...", end=" ")
+    ok, details = check()
+    if ok:
+        print(f"✓ SUCCESS ({details})")
+    else:
+        print(f"✗ FAILED: {details}")
+        failed = True
+
+loop.call_soon_threadsafe(server.close)
+loop.call_soon_threadsafe(loop.stop)
+print("\n=== Test Complete ===")
+sys.exit(1 if failed else 0)
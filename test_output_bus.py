@@ -0,0 +1,232 @@
+"""
+Check the shared-memory output bus (no audio device needed)
+Every reader must get every block intact and in order while it keeps up,
+find out when it does not, and publishing must not allocate. The throughput
+check runs several reader processes against one writer.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+from output_bus import BusReader, OutputBus
+
+SAMPLE_RATE = 48000
+BLOCK_SIZE = 512
+CHANNELS = 2
+NAME = f"vc-bus-test-{os.getpid()}"
+
+
+def stamped(seq, frames=BLOCK_SIZE):
+    """Block whose every sample says which block it is, so torn reads show"""
+    block = np.empty((frames, CHANNELS), dtype=np.float32)
+    block[:, 0] = seq % 1000003
+    block[:, 1] = -(seq % 1000003)
+    return block
+
+
+def intact(block, seq):
+    value = seq % 1000003
+    return bool((block[:, 0] == value).all() and (block[:, 1] == -value).all())
+
+
+def reader_process(name):
+    """Read a bus until it closes, checking every block (run in another process)"""
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            reader = BusReader(name, start='oldest')
+            break
+        except FileNotFoundError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.01)
+    bad = 0
+    started = None
+    for block in reader:
+        started = started or time.perf_counter()
+        bad += not intact(block, reader.position - 1)
+    seconds = time.perf_counter() - started if started else 0.0
+    result = dict(reader.stats(), bad=bad, seconds=seconds,
+                  bytes=reader.blocks * BLOCK_SIZE * CHANNELS * 4)
+    reader.close()
+    print(json.dumps(result))
+
+
+if __name__ == "__main__" and sys.argv[1:2] == ['--reader']:
+    reader_process(sys.argv[2])
+    sys.exit(0)
+
+
+print("=== Output Bus Test ===\n")
+
+
+# Each check returns (ok, details)
+
+def check_in_order():
+    with OutputBus(NAME, SAMPLE_RATE, BLOCK_SIZE, CHANNELS) as bus:
+        reader = BusReader(NAME)
+        sizes = [BLOCK_SIZE] * 40 + [100]
+        good = 0
+        for seq, frames in enumerate(sizes):
+            bus.publish(stamped(seq, frames))
+            block = reader.read(timeout=0)
+            good += block is not None and len(block) == frames and intact(block, seq)
+        nothing = reader.read(timeout=0) is None
+        reader.close()
+    ok = good == len(sizes) and nothing
+    return ok, f"{good} of {len(sizes)} blocks intact, in order, short last block kept"
+
+
+def check_no_allocation():
+    block = stamped(1)
+    with OutputBus(NAME, SAMPLE_RATE, BLOCK_SIZE, CHANNELS) as bus:
+        callback = bus.wrap(lambda indata, outdata, frames, time_info, status: None)
+        callback(block, block, BLOCK_SIZE, None, None)
+        tracemalloc.start()
+        baseline, _ = tracemalloc.get_traced_memory()
+        for _ in range(2000):
+            callback(block, block, BLOCK_SIZE, None, None)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    limit = BLOCK_SIZE * 4 + 512
+    ok = peak - baseline < limit and current - baseline < limit
+    return ok, f"peak +{peak - baseline} bytes over 2000 callbacks"
+
+
+def check_zero_copy():
+    with OutputBus(NAME, SAMPLE_RATE, BLOCK_SIZE, CHANNELS) as bus:
+        reader = BusReader(NAME)
+        bus.publish(stamped(0))
+        view = reader.next_block()
+        in_place = np.shares_memory(view, reader._seg.data) and intact(view, 0)
+        kept = reader.release()
+        # Held while the writer laps the ring: release() must say so
+        bus.publish(stamped(1))
+        view = reader.next_block()
+        for seq in range(2, bus.slots + 2):
+            bus.publish(stamped(seq))
+        torn = not reader.release()
+        del view
+        reader.close()
+    ok = in_place and kept and torn
+    return ok, "blocks read in place, a block overwritten while held is reported"
+
+
+def check_overrun():
+    with OutputBus(NAME, SAMPLE_RATE, BLOCK_SIZE, CHANNELS, seconds=0.2) as bus:
+        reader = BusReader(NAME)
+        behind = 3 * bus.slots
+        for seq in range(behind):
+            bus.publish(stamped(seq))
+        block = reader.read(timeout=0)
+        resumed = reader.position - 1
+        ok = (reader.overruns == 1 and reader.dropped == resumed
+              and intact(block, resumed) and bus.lag() == behind - reader.position)
+        stats = reader.stats()
+        reader.close()
+    return ok, (f"{behind} blocks behind a {bus.slots - 1}-block ring: {stats['overruns']} "
+                f"overrun, {stats['dropped']} dropped, resumed {stats['lag']} blocks behind")
+
+
+def check_positions():
+    with OutputBus(NAME, SAMPLE_RATE, BLOCK_SIZE, CHANNELS) as bus:
+        first, second = BusReader(NAME), BusReader(NAME)
+        for seq in range(10):
+            bus.publish(stamped(seq))
+        for _ in range(7):
+            first.read(timeout=0)
+        for _ in range(2):
+            second.read(timeout=0)
+        lags = sorted(r['lag'] for r in bus.readers())
+        worst = bus.lag()
+        first.close()
+        left = len(bus.readers())
+        second.close()
+    ok = lags == [3, 8] and worst == 8 and left == 1
+    return ok, f"lags {lags}, slowest {worst}, {left} reader left after one closed"
+
+
+def check_throughput():
+    readers = 3
+    blocks = 20000
+    procs = [subprocess.Popen([sys.executable, __file__, '--reader', NAME],
+                              stdout=subprocess.PIPE, text=True) for _ in range(readers)]
+    block = stamped(0)
+    with OutputBus(NAME, SAMPLE_RATE, BLOCK_SIZE, CHANNELS) as bus:
+        deadline = time.monotonic() + 10
+        while len(bus.readers()) < readers and time.monotonic() < deadline:
+            time.sleep(0.01)
+        started = time.perf_counter()
+        for seq in range(blocks):
+            # Paced by the slowest reader, so none of them may lose a block
+            while bus.lag() >= bus.slots - 2:
+                time.sleep(0.0002)
+            slot = bus.write_slot()
+            value = seq % 1000003
+            slot[:, 0] = value
+            slot[:, 1] = -value
+            bus.commit()
+        while bus.lag() and time.monotonic() - started < 60:
+            time.sleep(0.001)
+        seconds = time.perf_counter() - started
+    results = [json.loads(proc.communicate(timeout=30)[0]) for proc in procs]
+    ok = all(r['blocks'] == blocks and r['bad'] == 0 and r['overruns'] == 0 for r in results)
+    mb = blocks * block.nbytes / 1e6
+    audio = blocks * BLOCK_SIZE / SAMPLE_RATE
+    return ok, (f"{readers} reader processes, {mb:.0f} MB each in {seconds:.2f}s "
+                f"({mb * readers / seconds:.0f} MB/s delivered, {audio / seconds:.0f}x real time), "
+                f"blocks intact {[r['blocks'] - r['bad'] for r in results]}")
+
+
+def check_live_stream():
+    import virtual_audio
+    from block_processor import BlockProcessor
+    from effect_chain import PRESETS, build_chain
+    from synthetic import speech_like
+
+    chain = build_chain(PRESETS['Robot'], BLOCK_SIZE, SAMPLE_RATE, channels=CHANNELS)
+    processor = BlockProcessor(chain, BLOCK_SIZE, CHANNELS, CHANNELS, CHANNELS)
+    played, received = [], []
+    with OutputBus(NAME, SAMPLE_RATE, BLOCK_SIZE, CHANNELS, seconds=3.0) as bus:
+        reader = BusReader(NAME)
+
+        def callback(indata, outdata, frames, time_info, status):
+            processor.callback(indata, outdata, frames, time_info, status)
+            played.append(outdata.copy())
+
+        virtual_audio.run_callback(bus.wrap(callback), source=speech_like(1.0, SAMPLE_RATE),
+                                   samplerate=SAMPLE_RATE, blocksize=BLOCK_SIZE,
+                                   channels=CHANNELS)
+        while (block := reader.read(timeout=0)) is not None:
+            received.append(block.copy())
+        reader.close()
+    ok = len(received) == len(played) and np.array_equal(np.concatenate(received),
+                                                          np.concatenate(played))
+    return ok, f"{len(received)} blocks read back, identical to what was played"
+
+
+checks = [
+    ("blocks reach a reader intact and in order", check_in_order),
+    ("publishing does not allocate", check_no_allocation),
+    ("reads are zero-copy, torn blocks are reported", check_zero_copy),
+    ("a reader a ring behind detects the overrun", check_overrun),
+    ("each consumer has its own position", check_positions),
+    ("throughput with several reader processes", check_throughput),
+    ("virtual stream through the bus", check_live_stream),
+]
+
+failed = False
+for name, check in checks:
+    print(f"Testing: {name}...", end=" ")
+    ok, details = check()
+    if ok:
+        print(f"✓ SUCCESS ({details})")
+    else:
+        print(f"✗ FAILED: {details}")
+        failed = True
+
+print("\n=== Test Complete ===")
+sys.exit(1 if failed else 0)
@@ -2,7 +2,7 @@
 Test audio OUTPUT only (no microphone needed)
 Plays a simple tone to verify speakers/headphones work
 """
-import sounddevice as sd
+from audio_backend import sd
 import numpy as np
 
 print("=== Audio Output Test ===\n")
@@ -0,0 +1,116 @@
+"""
+Check the streaming polyphase resampler and its fixed-length output (no audio device needed)
+Resampling must not depend on how the stream is cut into blocks or allocate
+per block, and the FIFO must hand back whole blocks without gaps while the
+resampler's output only jitters around the block length.
+"""
+import sys
+import tracemalloc
+import numpy as np
+from polyphase import SLACK, FixedLengthOutput, PolyphaseResampler
+
+print("=== Polyphase Resampler Test ===\n")
+
+BLOCK_SIZE = 512
+RATIOS = (1 / 0.75, 1 / 1.5, 1 / 0.9, 1 / 1.1)
+
+
+def noise(samples, seed=0):
+    return np.random.default_rng(seed).standard_normal(samples).astype(np.float32)
+
+
+# Each check returns (ok, details)
+
+def check_block_independent():
+    audio = noise(BLOCK_SIZE * 20)
+    worst = 0.0
+    for ratio in RATIOS:
+        whole = PolyphaseResampler.from_ratio(ratio).process(audio).copy()
+        resampler = PolyphaseResampler.from_ratio(ratio)
+        cuts = np.cumsum([0, 100, 7, 1000, 2048, 3] + [BLOCK_SIZE] * 20)
+        cuts = cuts[cuts < len(audio)].tolist() + [len(audio)]
+        pieces = [resampler.process(audio[a:b]).copy() for a, b in zip(cuts, cuts[1:])]
+        worst = max(worst, float(np.abs(np.concatenate(pieces) - whole).max()))
+    return worst < 1e-6, f"largest difference from one-shot resampling {worst:.1e}"
+
+
+def check_no_allocation():
+    block = noise(BLOCK_SIZE)
+    out = np.empty(BLOCK_SIZE, dtype=np.float32)
+    resampler = PolyphaseResampler.from_ratio(1 / 0.75)
+    fifo = FixedLengthOutput(BLOCK_SIZE, resampler.ratio)
+    tracemalloc.start()
+    # Every output phase gets its views on the first pass
+    for _ in range(200):
+        fifo.write(resampler.process(block))
+        fifo.read(out)
+    baseline, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for _ in range(500):
+        fifo.write(resampler.process(block))
+        fifo.read(out)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    limit = BLOCK_SIZE * 4 + 512
+    ok = peak - baseline < limit and current - baseline < limit
+    return ok, f"peak +{peak - baseline} bytes over 500 blocks"
+
+
+def check_jitter_absorbed():
+    # Output counts alternating around the block length come out gapless
+    audio = noise(BLOCK_SIZE * 40)
+    fifo = FixedLengthOutput(BLOCK_SIZE, 1.0)
+    fifo.write(audio[:SLACK // 2])
+    sizes = [BLOCK_SIZE - 3, BLOCK_SIZE + 3, BLOCK_SIZE + 1, BLOCK_SIZE - 1] * 9
+    written, blocks = SLACK // 2, []
+    for size in sizes:
+        fifo.write(audio[written:written + size])
+        written += size
+        blocks.append(fifo.read(np.empty(BLOCK_SIZE, dtype=np.float32)))
+    ok = (np.array_equal(np.concatenate(blocks), audio[:len(blocks) * BLOCK_SIZE])
+          and fifo.dropped == 0 and fifo.padded == 0)
+    return ok, f"{len(blocks)} blocks identical to the input stream, none dropped or padded"
+
+
+def check_surplus_and_deficit():
+    out = np.empty(BLOCK_SIZE, dtype=np.float32)
+    # Steady surplus: at most SLACK samples carried, each block contiguous
+    audio = np.arange(BLOCK_SIZE * 60, dtype=np.float32)
+    fifo = FixedLengthOutput(BLOCK_SIZE, 1.5)
+    contiguous, levels = True, []
+    for i in range(40):
+        fifo.write(audio[i * 768:(i + 1) * 768])
+        fifo.read(out)
+        contiguous &= bool((np.diff(out) == 1).all())
+        levels.append(fifo.level)
+    surplus_ok = contiguous and max(levels) <= SLACK and fifo.padded == 0
+    # Steady deficit: every sample is kept, the rest of the block is silence
+    short = FixedLengthOutput(BLOCK_SIZE, 2 / 3)
+    for _ in range(10):
+        short.write(np.ones(341, dtype=np.float32))
+        short.read(out)
+    deficit_ok = short.dropped == 0 and short.padded == 10 * (BLOCK_SIZE - 341)
+    return surplus_ok and deficit_ok, (f"surplus carried at most {max(levels)} samples "
+                                       f"({fifo.dropped} dropped), deficit padded "
+                                       f"{short.padded} samples")
+
+
+checks = [
+    ("output does not depend on the block cuts", check_block_independent),
+    ("resampling and FIFO do not allocate", check_no_allocation),
+    ("FIFO absorbs block-length jitter", check_jitter_absorbed),
+    ("FIFO bounds surplus and pads deficit", check_surplus_and_deficit),
+]
+
+failed = False
+for name, check in checks:
+    print(f"Testing: {name}...", end=" ")
+    ok, details = check()
+    if ok:
+        print(f"✓ SUCCESS ({details})")
+    else:
+        print(f"✗ FAILED: {details}")
+        failed = True
+
+print("\n=== Test Complete ===")
+sys.exit(1 if failed else 0)
@@ -0,0 +1,87 @@
+"""
+Check the rate bridge with two simulated device clocks
+Input and output callbacks are interleaved in the order two free-running
+sound cards with slightly wrong crystals would call them (no audio device needed)
+"""
+import sys
+import numpy as np
+from rate_bridge import RateBridge
+
+print("=== Rate Bridge Test ===\n")
+
+SECONDS = 120
+TONE = 1000.0
+JITTER = 0.001  # Callback timestamps are only this accurate (seconds, std)
+
+# (name, input rate, output rate, input clock error ppm, output clock error ppm, blocks)
+configs = [
+    ("44.1k mic -> 48k sink", 44100, 48000, 0, 0, (1024, 1024)),
+    ("44.1k mic -> 48k sink, +250 ppm drift", 44100, 48000, 250, 0, (1024, 1024)),
+    ("48k mic -> 44.1k sink, -180 ppm drift", 48000, 44100, 0, 180, (512, 1024)),
+    ("48k -> 48k, stereo, 2 clocks 400 ppm apart", 48000, 48000, -200, 200, (256, 480)),
+]
+
+failed = False
+for name, in_rate, out_rate, in_ppm, out_ppm, (in_block, out_block) in configs:
+    print(f"Testing: {name}...", end=" ")
+    channels = 2 if 'stereo' in name else 1
+    bridge = RateBridge(in_rate, out_rate, channels, in_block, out_block)
+
+    # Each device runs at its nominal rate times its clock error
+    in_period = in_block / (in_rate * (1 + in_ppm * 1e-6))
+    out_period = out_block / (out_rate * (1 + out_ppm * 1e-6))
+    expected_ppm = ((1 + in_ppm * 1e-6) / (1 + out_ppm * 1e-6) - 1) * 1e6
+
+    rng = np.random.default_rng(0)
+    block = np.empty((in_block, channels), dtype=np.float32)
+    outdata = np.empty((out_block, channels), dtype=np.float32)
+    output = []
+    corrections = []
+    written = 0
+    next_in, next_out = 0.0, out_period / 2
+    while next_out < SECONDS:
+        if next_in <= next_out:
+            n = np.arange(written, written + in_block)
+            block[:] = (0.5 * np.sin(2 * np.pi * TONE * n / in_rate))[:, np.newaxis]
+            bridge.write(block, now=next_in + rng.normal(0, JITTER))
+            written += in_block
+            next_in += in_period
+        else:
+            bridge.read(outdata, now=next_out + rng.normal(0, JITTER))
+            output.append(outdata[:, 0].copy())
+            corrections.append(bridge.correction_ppm)
+            next_out += out_period
+    output = np.concatenate(output)
+
+    # Drift is tracked once the controller has settled
+    settled = int(len(corrections) * 0.5)
+    tracking = np.mean(corrections[settled:]) - expected_ppm
+
+    # Every 20 ms of the last 10 seconds should be a clean tone at the same
+    # pitch. Slow phase wander from the trim is inaudible and fitted away.
+    segment = out_rate // 50
+    tail = output[-10 * out_rate:].reshape(-1, segment)
+    # The input clock error moves the tone as heard on the output clock
+    t = np.arange(segment) / out_rate * (1 + expected_ppm * 1e-6)
+    basis = np.column_stack([np.sin(2 * np.pi * TONE * t), np.cos(2 * np.pi * TONE * t)])
+    fit, *_ = np.linalg.lstsq(basis, tail.T, rcond=None)
+    residual = tail - (basis @ fit).T
+    snr = 10 * np.log10(np.mean(tail ** 2, axis=1) / np.maximum(np.mean(residual ** 2, axis=1), 1e-20))
+    snr = snr.min()
+    wobble = np.ptp(corrections[settled:])
+
+    # Only the start-up fill may be silent
+    startup_underruns = bridge.underruns
+    ok = (startup_underruns == 0 and bridge.overruns == 0
+          and abs(tracking) < 20 and snr > 40)
+    details = (f"trim {np.mean(corrections[settled:]):+.0f} ppm (want {expected_ppm:+.0f}), "
+               f"wobble {wobble:.0f} ppm, worst SNR {snr:.0f} dB, latency {bridge.latency * 1000:.0f} ms, "
+               f"{bridge.underruns} underruns, {bridge.overruns} overruns")
+    if ok:
+        print(f"✓ SUCCESS ({details})")
+    else:
+        print(f"✗ FAILED: {details}")
+        failed = True
+
+print("\n=== Test Complete ===")
+sys.exit(1 if failed else 0)
@@ -0,0 +1,133 @@
+"""
+Check the realtime profile (no audio device needed)
+The collector and GIL settings must be undone on exit, thread settings must
+stay on the thread that asked for them, and the warm-up must leave the
+effect silent.
+"""
+import gc
+import os
+import sys
+import threading
+import numpy as np
+from block_processor import BlockProcessor
+from effect_chain import PRESETS, build_chain
+from pipeline import PipelinedProcessor
+from realtime import GC_THRESHOLDS, RealtimeProfile, compare, format_profile
+
+print("=== Realtime Profile Test ===\n")
+
+SAMPLE_RATE = 48000
+BLOCK_SIZE = 512
+
+
+def in_thread(fn):
+    """Run fn on a new thread and return its result"""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fn()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+# Each check returns (ok, details)
+
+def check_gc_freeze():
+    before = (gc.isenabled(), gc.get_threshold(), sys.getswitchinterval())
+    profile = RealtimeProfile(gc_mode='freeze')
+    with profile:
+        during = (gc.get_freeze_count(), gc.get_threshold(), sys.getswitchinterval())
+        gc.collect(0)
+    after = (gc.isenabled(), gc.get_threshold(), sys.getswitchinterval())
+    ok = (during[0] > 0 and during[1] == GC_THRESHOLDS and during[2] == profile.switch_interval
+          and after == before and gc.get_freeze_count() == 0
+          and profile.report()['collections'][0] == 1)
+    return ok, (f"{during[0]} objects frozen, thresholds {during[1]}, "
+                f"{during[2] * 1000:g} ms switch interval, all restored")
+
+
+def check_gc_disable():
+    profile = RealtimeProfile(gc_mode='disable')
+    profile.enter()
+    disabled = not gc.isenabled()
+    profile.exit()
+    profile.exit()  # A second exit must not undo anything twice
+    ok = disabled and gc.isenabled() and gc.get_freeze_count() == 0
+    return ok, "collection off while streaming, back on after"
+
+
+def check_thread_setup():
+    cpu = min(os.sched_getaffinity(0))
+    main_affinity = os.sched_getaffinity(0)
+    main_policy = os.sched_getscheduler(0)
+    profile = RealtimeProfile(cpus={cpu})
+    state, affinity = in_thread(lambda: (profile.setup_thread('audio'),
+                                         os.sched_getaffinity(0)))
+    # A CPU that does not exist is reported, not raised
+    refused = in_thread(lambda: RealtimeProfile(cpus={4095}).setup_thread('audio'))
+    ok = (affinity == {cpu} and os.sched_getaffinity(0) == main_affinity
+          and os.sched_getscheduler(0) == main_policy and 'refused' in refused)
+    return ok, f"thread: {state}; main thread untouched; bad CPU: {refused.split(',')[0]}"
+
+
+def check_warm_up():
+    chain = build_chain(PRESETS['Demon'], BLOCK_SIZE, SAMPLE_RATE, channels=2)
+    processor = BlockProcessor(chain, BLOCK_SIZE, 2, 2, 2)
+    profile = RealtimeProfile()
+    others = [build_chain(spec, BLOCK_SIZE, SAMPLE_RATE) for spec in PRESETS.values()]
+    blocks = profile.warm_up(processor.process, BLOCK_SIZE, 2, 2, SAMPLE_RATE, effects=others)
+    silence = np.zeros((BLOCK_SIZE, 2), dtype=np.float32)
+    out = np.ones((BLOCK_SIZE, 2), dtype=np.float32)
+    processor.process(silence, out, BLOCK_SIZE)
+    pcm_in = np.zeros((BLOCK_SIZE, 1), dtype=np.int16)
+    pcm_out = np.ones((BLOCK_SIZE, 1), dtype=np.int16)
+    pcm = BlockProcessor(build_chain(PRESETS['Robot'], BLOCK_SIZE, SAMPLE_RATE), BLOCK_SIZE)
+    profile.warm_up(pcm.process, BLOCK_SIZE, 1, 1, SAMPLE_RATE, dtype=np.int16)
+    pcm.process(pcm_in, pcm_out, BLOCK_SIZE)
+    residue = np.abs(out).max()
+    ok = blocks > 0 and residue < 1e-4 and not pcm_out.any()
+    return ok, (f"{blocks} blocks plus {len(others)} extra chains, "
+                f"output after warm-up {residue:.1e}")
+
+
+def check_pipeline_thread():
+    names = []
+    pipeline = PipelinedProcessor(lambda i, o, n: None, BLOCK_SIZE,
+                                  thread_setup=lambda: names.append(threading.current_thread().name))
+    pipeline.start()
+    pipeline.stop()
+    return names == ['dsp-worker'], f"thread_setup ran on {names}"
+
+
+def check_on_off_report():
+    results = compare('Robot', BLOCK_SIZE, seconds=1.0, heap_objects=20000,
+                      emit=lambda line: None)
+    on = results['on']['profile']
+    ok = (set(results) == {'off', 'on'}
+          and all('p99_ms' in summary and 'max_ms' in summary for summary in results.values())
+          and on['collections'][2] == 0 and 'audio' in on['threads'])
+    return ok, (f"off p99 {results['off']['p99_ms']:.2f} / max {results['off']['max_ms']:.2f} ms, "
+                f"on p99 {results['on']['p99_ms']:.2f} / max {results['on']['max_ms']:.2f} ms; "
+                f"{format_profile(on)}")
+
+
+checks = [
+    ("GC frozen and tuned while streaming, restored after", check_gc_freeze),
+    ("GC disabled while streaming", check_gc_disable),
+    ("affinity and priority stay on the thread that sets them", check_thread_setup),
+    ("warm-up leaves every effect silent", check_warm_up),
+    ("pipeline worker runs thread_setup", check_pipeline_thread),
+    ("p99/max reported with the profile off and on", check_on_off_report),
+]
+
+failed = False
+for name, check in checks:
+    print(f"Testing: {name}...", end=" ")
+    ok, details = check()
+    if ok:
+        print(f"✓ SUCCESS ({details})")
+    else:
+        print(f"✗ FAILED: {details}")
+        failed = True
+
+print("\n=== Test Complete ===")
+sys.exit(1 if failed else 0)
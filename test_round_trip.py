@@ -0,0 +1,126 @@
+"""
+Check the round-trip latency tool against the virtual loopback (no audio device needed)
+The virtual loop's delay is known to the frame, so the measured figures must
+match it exactly, with and without the voice changer's pipeline in the loop.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import numpy as np
+
+TMP = tempfile.mkdtemp(prefix='round_trip_test_')
+os.environ['VOICE_CHANGER_CACHE'] = TMP
+
+import virtual_audio as sd
+import round_trip
+from round_trip import (RoundTripProbe, find_delay, format_result, measure, measured_latency,
+                        config_key, save_result, test_signal)
+
+print("=== Round-Trip Latency Test ===\n")
+
+SAMPLE_RATE = 48000
+
+
+def loopback(block_size, loopback_ms=0.0, pipeline_blocks=None, realtime=False, trials=4):
+    """Measure over the virtual loopback; returns (result, expected frames of delay)"""
+    sd.config.update(source='loopback', loopback_ms=loopback_ms, realtime=realtime)
+    try:
+        result = measure(sd, dict(device=0, samplerate=SAMPLE_RATE, channels=1), block_size,
+                         trials=trials, max_latency=0.1, pipeline_blocks=pipeline_blocks)
+    finally:
+        sd.config.update(source='speech', loopback_ms=0.0, realtime=True)
+    # One block of input and one of output buffering, the path, the pipeline
+    expected = ((2 + (pipeline_blocks or 0)) * block_size
+                + round(loopback_ms * SAMPLE_RATE / 1000))
+    return result, expected
+
+
+def frames(ms):
+    return ms * SAMPLE_RATE / 1000
+
+
+# Each check returns (ok, details)
+
+def check_find_delay():
+    rng = np.random.default_rng(0)
+    errors = []
+    for kind in ('chirp', 'mls'):
+        signal = test_signal(kind, SAMPLE_RATE)
+        for delay in (0, 37, 1000, 9999):
+            recording = rng.normal(0, 0.01, delay + len(signal) + 2000)
+            recording[delay:delay + len(signal)] += 0.3 * signal
+            found, confidence = find_delay(recording, signal)
+            errors.append(abs(found - delay))
+            if confidence < round_trip.MIN_CONFIDENCE:
+                return False, f"{kind} at {delay}: confidence {confidence:.1f}"
+    worst = max(errors)
+    return worst < 0.5, f"worst error {worst:.2f} frames (chirp and MLS, -30 dB noise)"
+
+
+def check_device_only(block_size, loopback_ms):
+    result, expected = loopback(block_size, loopback_ms)
+    error = abs(frames(result.get('median_ms', 0)) - expected)
+    ok = result['valid'] == result['trials'] and error < 0.5 and result['jitter_ms'] < 0.01
+    return ok, f"{format_result(result)}, expected {expected / SAMPLE_RATE * 1000:.1f} ms"
+
+
+def check_pipeline():
+    # Real time, so the pipeline worker keeps up as it would on a device
+    lines = []
+    ok = True
+    for pipeline_blocks in (0, 2):
+        result, expected = loopback(256, pipeline_blocks=pipeline_blocks, realtime=True, trials=3)
+        error = abs(frames(result.get('median_ms', 0)) - expected)
+        ok = ok and result['valid'] == result['trials'] and error < 0.5
+        lines.append(f"pipeline {pipeline_blocks}: {result.get('median_ms', 0):.1f} ms "
+                     f"(expected {expected / SAMPLE_RATE * 1000:.1f})")
+    return ok, ", ".join(lines)
+
+
+def check_no_loop():
+    signal = test_signal('chirp', SAMPLE_RATE)
+    probe = RoundTripProbe(signal, SAMPLE_RATE, 512, trials=3, max_latency=0.1)
+    silence = np.zeros((512, 1), dtype=np.float32)
+    out = np.zeros((512, 1), dtype=np.float32)
+    rng = np.random.default_rng(1)
+    while not probe.done.is_set():
+        # Nothing comes back but room noise
+        silence[:, 0] = rng.normal(0, 0.01, 512)
+        probe.callback(silence, out, 512, None, None)
+    result = probe.analyse()
+    ok = result['valid'] == 0 and 'median_ms' not in result
+    return ok, format_result(result)
+
+
+def check_cache():
+    result, _ = loopback(512, trials=2)
+    save_result(sd, 0, 0, config_key(SAMPLE_RATE, 512, 0), result)
+    found = measured_latency(sd, 0, 0, SAMPLE_RATE, 512, 0)
+    other = measured_latency(sd, 0, 0, SAMPLE_RATE, 512, 2)
+    ok = found is not None and found['median_ms'] == result['median_ms'] and other is None
+    return ok, f"{found['median_ms']:.1f} ms for 512 frames, nothing for pipeline 2" if ok else "missing"
+
+
+checks = [
+    ("cross-correlation finds known delays", check_find_delay),
+    ("256 frames over the virtual loopback", lambda: check_device_only(256, 0.0)),
+    ("1024 frames with 7.5 ms on the path", lambda: check_device_only(1024, 7.5)),
+    ("pipeline blocks add their latency", check_pipeline),
+    ("no loop reports no result", check_no_loop),
+    ("results cached per configuration", check_cache),
+]
+
+failed = False
+for name, check in checks:
+    print(f"Testing: {name}...", end=" ")
+    ok, details = check()
+    if ok:
+        print(f"✓ SUCCESS ({details})")
+    else:
+        print(f"✗ FAILED: {details}")
+        failed = True
+
+shutil.rmtree(TMP, ignore_errors=True)
+print("\n=== Test Complete ===")
+sys.exit(1 if failed else 0)
@@ -2,7 +2,7 @@
 Test Android audio routing with Bluetooth and wired headset
 This script will help us understand how Android routes audio
 """
-import sounddevice as sd
+from audio_backend import sd
 import numpy as np
 import subprocess
 import json
@@ -0,0 +1,161 @@
+"""
+Check the silence gate on talk-pause-talk audio (no audio device needed)
+Speech, including the first syllable after a pause, must come out at the
+level the ungated effect gives it; the pauses skip the effect and the gate
+switches without clicks.
+"""
+import sys
+import numpy as np
+from effect_chain import PRESETS, build_chain
+from silence_gate import SilenceGate
+from synthetic import speech_like
+
+print("=== Silence Gate Test ===\n")
+
+SAMPLE_RATE = 48000
+BLOCK_SIZE = 512
+PHRASES = 4
+TALK = 1.5       # Seconds of speech per phrase
+PAUSE = 2.0      # Seconds of room noise before each phrase
+NOISE_DB = -65   # Room noise level (dBFS)
+ATTACK = 0.05    # Seconds each phrase takes to rise from silence
+
+
+def talk_and_pause(channels):
+    """Phrases separated by quiet room noise, (frames, channels), and a speech mask"""
+    rng = np.random.default_rng(1)
+    talk = int(TALK * SAMPLE_RATE)
+    pause = int(PAUSE * SAMPLE_RATE)
+    speech = speech_like(TALK * PHRASES, SAMPLE_RATE)
+    frames = (talk + pause) * PHRASES // BLOCK_SIZE * BLOCK_SIZE
+    audio = 10 ** (NOISE_DB / 20) * rng.standard_normal((frames, channels))
+    mask = np.zeros(frames, dtype=bool)
+    for p in range(PHRASES):
+        start = p * (talk + pause) + pause
+        phrase = speech[p * talk:(p + 1) * talk][:frames - start].copy()
+        # Soft attack, the first block or two stay below the threshold
+        attack = int(ATTACK * SAMPLE_RATE)
+        phrase[:attack] *= np.linspace(0, 1, attack) ** 2
+        audio[start:start + len(phrase)] += phrase[:, np.newaxis]
+        mask[start:start + len(phrase)] = True
+    return audio.astype(np.float32), mask
+
+
+def make_chain(channels):
+    return build_chain(PRESETS['Deep Voice'], BLOCK_SIZE, SAMPLE_RATE, channels=channels)
+
+
+def run(effect, audio):
+    """Stream (frames, channels) audio through effect.process block by block
+
+    Returns the output and, for a gate, which blocks it skipped.
+    """
+    out = np.empty_like(audio)
+    skipped = []
+    for i in range(0, len(audio), BLOCK_SIZE):
+        src, dst = audio[i:i + BLOCK_SIZE], out[i:i + BLOCK_SIZE]
+        before = getattr(effect, 'skipped', 0)
+        if audio.shape[1] == 1:
+            # Mono effects take (frames,) blocks
+            effect.process(np.ascontiguousarray(src[:, 0]), out=dst[:, 0])
+        else:
+            effect.process(src, out=dst)
+        skipped.append(getattr(effect, 'skipped', 0) > before)
+    return out, np.repeat(skipped, BLOCK_SIZE)
+
+
+# Each check returns (ok, details)
+
+def phrase_starts(mask):
+    return np.flatnonzero(np.diff(mask.astype(int)) == 1) + 1
+
+
+def check_onsets(channels, idle):
+    audio, mask = talk_and_pause(channels)
+    reference, _ = run(make_chain(channels), audio)
+    gate = SilenceGate(make_chain(channels), BLOCK_SIZE, SAMPLE_RATE, channels, idle=idle)
+    gated, skipped = run(gate, audio)
+
+    # The first 300 ms of every phrase (plus the effect's delay) keeps its
+    # energy; the shifter's tap phase differs after a pause, so compare levels
+    span = int(0.3 * SAMPLE_RATE + gate.latency)
+    worst = 0.0
+    for start in phrase_starts(mask):
+        level = np.sum(gated[start:start + span] ** 2)
+        expected = np.sum(reference[start:start + span] ** 2)
+        worst = max(worst, abs(10 * np.log10(level / expected)))
+
+    # Skipped blocks carry silence, or the dry input in passthrough mode
+    expected = audio[skipped] if idle == 'passthrough' else np.zeros_like(audio[skipped])
+    idle_ok = np.array_equal(gated[skipped], expected)
+
+    ok = worst < 1.0 and idle_ok and gate.onsets >= PHRASES
+    return ok, (f"phrase onsets within {worst:.2f} dB of ungated, {gate.onsets} onsets, "
+                f"{gate.skipped_fraction * 100:.0f}% of blocks skipped"
+                + ("" if idle_ok else ", idle output wrong"))
+
+
+def check_skipped_fraction():
+    audio, mask = talk_and_pause(1)
+    gate = SilenceGate(make_chain(1), BLOCK_SIZE, SAMPLE_RATE)
+    run(gate, audio)
+    stats = gate.stats()
+    # At least the pauses minus one hangover (in whole blocks, plus the block
+    # that fades out) after each phrase, at most every quiet block
+    hangover = (-(-gate.hangover // BLOCK_SIZE) + 1) * BLOCK_SIZE / SAMPLE_RATE
+    least = (PAUSE * PHRASES - hangover * (PHRASES - 1)) / (len(audio) / SAMPLE_RATE)
+    blocks = audio[:, 0].reshape(-1, BLOCK_SIZE)
+    most = np.mean(np.mean(blocks ** 2, axis=1) <= 10 ** (gate.threshold_db / 10))
+    ok = least <= gate.skipped_fraction <= most and stats['blocks'] == len(blocks)
+    return ok, (f"{stats['skipped_pct']:.1f}% skipped, "
+                f"expected {least * 100:.1f}-{most * 100:.1f}%")
+
+
+def check_no_clicks():
+    audio, _ = talk_and_pause(1)
+    gate = SilenceGate(make_chain(1), BLOCK_SIZE, SAMPLE_RATE)
+    gated, skipped = run(gate, audio)
+    reference, _ = run(make_chain(1), audio)
+    # Around every switch between idle and effect, no step is steeper than
+    # the steepest one the effect produces on its own
+    ramp = int(SAMPLE_RATE * gate.ramp_ms / 1000)
+    worst = 0.0
+    for edge in np.flatnonzero(np.diff(skipped.astype(int))) + 1:
+        around = gated[max(0, edge - ramp - 1):edge + ramp + 1, 0]
+        worst = max(worst, float(np.max(np.abs(np.diff(around)))))
+    limit = float(np.max(np.abs(np.diff(reference[:, 0]))))
+    return worst < limit, f"largest step at a switch {worst:.4f} (effect alone {limit:.4f})"
+
+
+def check_always_on():
+    # A threshold below the noise floor keeps the effect running throughout
+    audio, _ = talk_and_pause(1)
+    gate = SilenceGate(make_chain(1), BLOCK_SIZE, SAMPLE_RATE, threshold_db=-100)
+    gated, _ = run(gate, audio)
+    reference, _ = run(make_chain(1), audio)
+    # Only the first block fades in
+    same = np.array_equal(gated[BLOCK_SIZE:], reference[BLOCK_SIZE:])
+    return same and gate.skipped == 0, f"{gate.skipped} blocks skipped"
+
+
+checks = [
+    ("mono, silent while idle", lambda: check_onsets(1, 'silence')),
+    ("stereo, silent while idle", lambda: check_onsets(2, 'silence')),
+    ("mono, dry passthrough while idle", lambda: check_onsets(1, 'passthrough')),
+    ("skipped fraction follows the pauses", check_skipped_fraction),
+    ("no clicks at onset or release", check_no_clicks),
+    ("threshold below the noise floor never skips", check_always_on),
+]
+
+failed = False
+for name, check in checks:
+    print(f"Testing: {name}...", end=" ")
+    ok, details = check()
+    if ok:
+        print(f"✓ SUCCESS ({details})")
+    else:
+        print(f"✗ FAILED: {details}")
+        failed = True
+
+print("\n=== Test Complete ===")
+sys.exit(1 if failed else 0)
@@ -0,0 +1,578 @@
+"""
+Virtual audio backend with the parts of the sounddevice API the scripts use
+Feeds callbacks from a WAV file, array or generator and writes their output
+to a WAV file, either paced to the wall clock or as fast as possible.
+
+    VOICE_CHANGER_BACKEND=virtual VOICE_CHANGER_INPUT=speech.wav \\
+    VOICE_CHANGER_OUTPUT=out.wav python main.py
+
+or, for a quick load test of any callback:
+
+    python virtual_audio.py main.py --input speech.wav --output out.wav --fast
+
+The source 'loopback' wires each duplex stream's output back to its input,
+like a cable, for round_trip.py.
+"""
+import argparse
+import functools
+import os
+import runpy
+import sys
+import threading
+import time
+import numpy as np
+from synthetic import sine, speech_like
+from wav_io import WavWriter, read_wav
+
+DEFAULT_SAMPLERATE = 48000
+DEFAULT_BLOCKSIZE = 512
+
+# Defaults used when a script opens a stream without virtual-only arguments
+config = {
+    'source': 'speech',   # WAV path, 'speech', 'sine', array or generator
+    'output': None,       # WAV path for everything the callbacks write
+    'realtime': True,     # False = free-running, as fast as possible
+    'duration': 5.0,      # Seconds of audio for the synthetic sources
+    'loop': False,        # Repeat the source instead of ending the stream
+    'output_samplerate': None,  # Rate of 'Virtual Output' if it differs from the input
+    'loopback_ms': 0.0,     # Extra output -> input delay of the 'loopback' source
+    'loopback_noise': 1e-3,  # Noise (RMS) the 'loopback' path adds
+}
+
+
+class CallbackStop(Exception):
+    """Raise from a callback to finish the stream (as in sounddevice)"""
+
+
+class CallbackAbort(Exception):
+    """Raise from a callback to abort the stream (as in sounddevice)"""
+
+
+class PortAudioError(Exception):
+    """Raised when a stream cannot be opened (as in sounddevice)"""
+
+
+class CallbackFlags:
+    """Status flags passed to callbacks, mirroring sounddevice.CallbackFlags"""
+
+    def __init__(self, input_overflow=False, output_underflow=False):
+        self.input_overflow = input_overflow
+        self.output_underflow = output_underflow
+        self.input_underflow = False
+        self.output_overflow = False
+        self.priming_output = False
+
+    def __bool__(self):
+        return self.input_overflow or self.output_underflow
+
+    def __str__(self):
+        flags = [name for name in ('input_overflow', 'output_underflow') if getattr(self, name)]
+        return ', '.join(name.replace('_', ' ') for name in flags)
+
+
+class TimeInfo:
+    """Stand-in for the PortAudio time struct"""
+
+    def __init__(self, now, latency):
+        self.currentTime = now
+        self.inputBufferAdcTime = now - latency
+        self.outputBufferDacTime = now + latency
+
+
+DEVICES = [
+    {'name': 'Virtual Duplex', 'max_input_channels': 2, 'max_output_channels': 2},
+    {'name': 'Virtual Input', 'max_input_channels': 2, 'max_output_channels': 0},
+    {'name': 'Virtual Output', 'max_input_channels': 0, 'max_output_channels': 2},
+]
+
+
+class DeviceList(tuple):
+    """Tuple of device dicts that prints like sounddevice's DeviceList"""
+
+    def __repr__(self):
+        return '\n'.join(f"{d['index']:>3} {d['name']}, {d['hostapi_name']} "
+                         f"({d['max_input_channels']} in, {d['max_output_channels']} out)"
+                         for d in self)
+
+
+def _device_info(index, samplerate):
+    info = dict(DEVICES[index])
+    if not info['max_input_channels'] and config['output_samplerate']:
+        samplerate = config['output_samplerate']
+    info.update({
+        'index': index,
+        'hostapi': 0,
+        'hostapi_name': 'Virtual',
+        'default_samplerate': float(samplerate),
+        'default_low_input_latency': DEFAULT_BLOCKSIZE / samplerate,
+        'default_low_output_latency': DEFAULT_BLOCKSIZE / samplerate,
+        'default_high_input_latency': 4 * DEFAULT_BLOCKSIZE / samplerate,
+        'default_high_output_latency': 4 * DEFAULT_BLOCKSIZE / samplerate,
+    })
+    return info
+
+
+def _source_samplerate():
+    source = config['source']
+    if isinstance(source, str) and source.endswith('.wav'):
+        return read_wav(source)[1]
+    return DEFAULT_SAMPLERATE
+
+
+def query_devices(device=None, kind=None):
+    samplerate = _source_samplerate()
+    if kind is not None and device is None:
+        device = default.device[0 if kind == 'input' else 1]
+    if device is not None:
+        return _device_info(device, samplerate)
+    return DeviceList(_device_info(i, samplerate) for i in range(len(DEVICES)))
+
+
+def query_hostapis(index=None):
+    apis = ({'name': 'Virtual', 'devices': list(range(len(DEVICES))),
+             'default_input_device': 0, 'default_output_device': 0},)
+    return apis if index is None else apis[index]
+
+
+class _Default:
+    device = [0, 0]
+    samplerate = None
+    blocksize = None
+
+
+default = _Default()
+
+
+@functools.lru_cache(maxsize=4)
+def _synthetic(kind, duration, samplerate):
+    """Synthetic source, generated once per setting (speech takes ~0.5 s)"""
+    return speech_like(duration, samplerate) if kind == 'speech' else sine(duration, samplerate)
+
+
+class BlockSource:
+    """Yields (frames, channels) float32 blocks from a file, array or generator"""
+
+    def __init__(self, source, channels, samplerate, loop=False):
+        self.channels = channels
+        self.loop = loop
+        self._pos = 0
+        self._generator = None
+        self._data = None
+
+        if isinstance(source, str) and source in ('speech', 'sine'):
+            self._data = _synthetic(source, config['duration'], samplerate)
+        elif isinstance(source, (str, os.PathLike)):
+            self._data, _ = read_wav(source)
+        elif isinstance(source, np.ndarray):
+            self._data = source
+        elif callable(source):
+            # Generator function called as source(frames) for every block
+            self._generator = source
+        else:
+            # Any iterable of blocks
+            blocks = iter(source)
+            self._generator = lambda frames: next(blocks, None)
+
+        if self._data is not None:
+            data = np.asarray(self._data, dtype=np.float32)
+            if data.ndim == 1:
+                data = data[:, np.newaxis]
+            # Match the stream's channel count by repeating or dropping
+            self._data = np.resize(data.T, (channels, len(data))).T.copy()
+
+    def read(self, frames, out):
+        """Fill out with the next block, returning False once the source ends"""
+        if self._generator is not None:
+            block = self._generator(frames)
+            if block is None:
+                return False
+            block = np.asarray(block, dtype=np.float32).reshape(len(block), -1)
+            out.fill(0)
+            out[:len(block)] = block[:frames]
+            return True
+
+        if self._pos >= len(self._data):
+            if not self.loop:
+                return False
+            self._pos = 0
+        chunk = self._data[self._pos:self._pos + frames]
+        out[:len(chunk)] = chunk
+        out[len(chunk):] = 0
+        self._pos += frames
+        return True
+
+
+class Loopback:
+    """Input that hears the stream's own output, like a cable from output to input
+
+    A sample written to the output comes back `delay` frames later. The
+    stream adds one block of input and one of output buffering to the
+    configured path delay, so the round trip is never shorter than a device's.
+    """
+
+    def __init__(self, channels, delay, noise=0.0, seed=0):
+        self.channels = channels
+        self.delay = int(delay)
+        self.noise = noise
+        self._rng = np.random.default_rng(seed)
+        self._line = np.zeros((self.delay, channels), dtype=np.float32)
+
+    def read(self, frames, out):
+        """Next input block; the loop never runs out"""
+        np.copyto(out, self._line[:frames])
+        self._line = self._line[frames:]
+        if self.noise:
+            out += self._rng.normal(0, self.noise, out.shape).astype(np.float32)
+        return True
+
+    def write(self, outdata):
+        """Queue an output block, its channels repeated or dropped to match the input"""
+        block = np.resize(outdata.T, (self.channels, len(outdata))).T
+        self._line = np.concatenate([self._line, block.astype(np.float32)])
+
+
+def _channels(channels):
+    if isinstance(channels, (tuple, list)):
+        return int(channels[0]), int(channels[1])
+    channels = int(channels or 1)
+    return channels, channels
+
+
+def _check_channels(device, channels):
+    """Refuse channel counts the devices do not have, like PortAudio does"""
+    if isinstance(device, (tuple, list)):
+        devices = device
+    else:
+        devices = (device, device)
+    for kind, index, count in zip(('input', 'output'), devices, channels):
+        index = default.device[kind == 'output'] if index is None else index
+        limit = DEVICES[index][f'max_{kind}_channels']
+        if count > limit:
+            raise PortAudioError(f"Invalid number of channels [PaErrorCode -9998]: "
+                                 f"{count} {kind} channels on '{DEVICES[index]['name']}' (max {limit})")
+
+
+_streams = []   # Streams currently open
+history = []    # Every stream opened, for reporting
+_input_over = False
+_clock = threading.Condition()  # Keeps free-running streams in step
+
+
+class Stream:
+    """Duplex stream that calls `callback` with blocks from a virtual source
+
+    Accepts the sounddevice.Stream arguments the scripts use, plus `source`,
+    `output`, `realtime` and `loop`, which default to the module `config`.
+    In realtime mode each block is released on its wall-clock deadline and
+    a callback that overruns its block duration is reported on the next
+    call as output_underflow, like a real device would.
+    """
+
+    def __init__(self, samplerate=None, blocksize=None, device=None, channels=None,
+                 dtype='float32', callback=None, source=None, output=None,
+                 realtime=None, loop=None, **kwargs):
+        self.samplerate = float(samplerate or _source_samplerate())
+        self.blocksize = int(blocksize or DEFAULT_BLOCKSIZE)
+        self.device = device
+        self.channels = _channels(channels)
+        _check_channels(device, self.channels)
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float32, np.int16):
+            raise PortAudioError(f"Sample format {self.dtype} not supported by the virtual backend")
+        self.callback = callback
+        self.realtime = config['realtime'] if realtime is None else realtime
+        self.latency = self.blocksize / self.samplerate
+        self._source = None
+        source = config['source'] if source is None else source
+        self._loopback = isinstance(source, str) and source == 'loopback'
+        if self._loopback:
+            if not self.channels[1]:
+                raise PortAudioError("The 'loopback' source needs a duplex stream")
+            delay = 2 * self.blocksize + round(config['loopback_ms'] * self.samplerate / 1000)
+            self._source = Loopback(self.channels[0], delay, config['loopback_noise'])
+        elif self.channels[0]:
+            self._source = BlockSource(source, self.channels[0], int(self.samplerate),
+                                       config['loop'] if loop is None else loop)
+        output = config['output'] if output is None else output
+        self._writer = None
+        if output and self.channels[1]:
+            self._writer = WavWriter(output, int(self.samplerate), self.channels[1])
+        self._thread = None
+        self._stop = threading.Event()
+        self.active = False
+        self.closed = False
+        self.blocks = 0
+        self.deadline_misses = 0
+        self.max_callback_time = 0.0
+        self.total_callback_time = 0.0
+        self.position = 0.0  # Seconds of audio handled so far
+
+    def start(self):
+        global _input_over
+        _input_over = False
+        self._stop.clear()
+        self.active = True
+        _streams.append(self)
+        if self not in history:
+            history.append(self)
+        self._thread = threading.Thread(target=self._run, name="virtual-audio", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        frames = self.blocksize
+        indata = np.zeros((frames, self.channels[0]), dtype=np.float32)
+        outdata = np.zeros((frames, self.channels[1]), dtype=np.float32)
+        # int16 streams see PCM blocks, sources and the WAV writer stay float
+        pcm = self.dtype == np.int16
+        callback_in = np.zeros(indata.shape, dtype=np.int16) if pcm else indata
+        callback_out = np.zeros(outdata.shape, dtype=np.int16) if pcm else outdata
+        late = False
+        if not self.realtime:
+            # Let streams opened together (an InputStream and an OutputStream)
+            # both be running before either gets ahead
+            time.sleep(0.05)
+        start = time.perf_counter()
+        next_deadline = start
+
+        try:
+            while not self._stop.is_set() and self._next_block(frames, indata):
+                if not self.realtime:
+                    self._wait_turn()
+                callback_out.fill(0)
+                if pcm:
+                    callback_in[:] = np.clip(np.rint(indata * 32768), -32768, 32767)
+                status = CallbackFlags(output_underflow=late)
+                now = time.perf_counter()
+                try:
+                    self._call(callback_in, callback_out, frames,
+                               TimeInfo(now - start, self.latency), status)
+                except CallbackStop:
+                    break
+                except CallbackAbort:
+                    outdata.fill(0)
+                    break
+                elapsed = time.perf_counter() - now
+                if pcm:
+                    outdata[:] = callback_out / 32768
+
+                self.blocks += 1
+                self.total_callback_time += elapsed
+                self.max_callback_time = max(self.max_callback_time, elapsed)
+                late = elapsed > self.latency
+                if late:
+                    self.deadline_misses += 1
+                if self._writer is not None:
+                    self._writer.write(outdata)
+                if self._loopback:
+                    self._source.write(outdata)
+                with _clock:
+                    self.position += self.latency
+                    _clock.notify_all()
+
+                if self.realtime:
+                    next_deadline += self.latency
+                    delay = next_deadline - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        # Fell behind the clock; a device would have glitched
+                        next_deadline = time.perf_counter()
+        finally:
+            self.active = False
+            with _clock:
+                _clock.notify_all()
+
+    def _next_block(self, frames, indata):
+        return self._source.read(frames, indata)
+
+    def _call(self, indata, outdata, frames, time_info, status):
+        self.callback(indata, outdata, frames, time_info, status)
+
+    def _wait_turn(self):
+        """Free-running streams take turns in audio time, like one shared clock"""
+        with _clock:
+            _clock.wait_for(lambda: self._stop.is_set() or self.position <= min(
+                s.position for s in _streams if s.active or s is self), timeout=1.0)
+
+    def wait(self, timeout=None):
+        """Block until the source is exhausted or the stream is stopped"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stop(self):
+        self._stop.set()
+        self.wait()
+
+    abort = stop
+
+    def close(self):
+        self.stop()
+        if self._writer is not None:
+            self._writer.close()
+        if self in _streams:
+            _streams.remove(self)
+        self.closed = True
+
+    def stats(self):
+        """Load-test summary for this stream"""
+        return {
+            'blocks': self.blocks,
+            'deadline_misses': self.deadline_misses,
+            'mean_callback_ms': self.total_callback_time / max(1, self.blocks) * 1000,
+            'max_callback_ms': self.max_callback_time * 1000,
+            'load': self.total_callback_time / max(1e-9, self.blocks * self.latency),
+        }
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # A finished script (or closed stdin) lets the source play out
+        if exc_type is None or issubclass(exc_type, EOFError):
+            self.wait()
+        self.close()
+
+
+class InputStream(Stream):
+    """Capture-only stream, callback(indata, frames, time, status)"""
+
+    def __init__(self, samplerate=None, blocksize=None, device=None, channels=None, **kwargs):
+        super().__init__(samplerate, blocksize, device, (int(channels or 1), 0), **kwargs)
+
+    def _call(self, indata, outdata, frames, time_info, status):
+        self.callback(indata, frames, time_info, status)
+
+
+class OutputStream(Stream):
+    """Playback-only stream, callback(outdata, frames, time, status)
+
+    Runs for as long as any input stream is still delivering, or for the
+    configured duration when there is none.
+    """
+
+    def __init__(self, samplerate=None, blocksize=None, device=None, channels=None, **kwargs):
+        samplerate = samplerate or config['output_samplerate']
+        super().__init__(samplerate, blocksize, device, (0, int(channels or 1)), **kwargs)
+
+    def _next_block(self, frames, indata):
+        inputs = [s for s in history if s is not self and s.channels[0] and not s.closed]
+        if inputs:
+            return any(s.active for s in inputs)
+        return self.position < config['duration']
+
+    def _call(self, indata, outdata, frames, time_info, status):
+        self.callback(outdata, frames, time_info, status)
+
+
+def sleep(msec):
+    """Sleep, but stop early once every virtual stream has run out of input
+
+    The first sleep after the input ends returns early. Sleeping again with
+    nothing left to play raises KeyboardInterrupt, which is how scripts that
+    loop on sd.sleep() forever are told the input is over.
+    """
+    global _input_over
+    deadline = time.perf_counter() + msec / 1000
+    while time.perf_counter() < deadline:
+        if _streams and not any(s.active for s in _streams):
+            if _input_over:
+                raise KeyboardInterrupt
+            _input_over = True
+            return
+        time.sleep(min(0.01, max(0.0, deadline - time.perf_counter())))
+
+
+_recording = None
+
+
+def rec(frames, samplerate=None, channels=1, dtype='float32', device=None, **kwargs):
+    """Return `frames` samples from the configured source"""
+    global _recording
+    samplerate = int(samplerate or _source_samplerate())
+    out = np.zeros((int(frames), int(channels)), dtype=np.float32)
+    BlockSource(config['source'], int(channels), samplerate).read(int(frames), out)
+    _recording = out
+    return out
+
+
+def play(data, samplerate=None, device=None, **kwargs):
+    """Write `data` to the configured output file"""
+    if config['output']:
+        data = np.asarray(data, dtype=np.float32)
+        channels = 1 if data.ndim == 1 else data.shape[1]
+        with WavWriter(config['output'], int(samplerate or DEFAULT_SAMPLERATE), channels) as w:
+            w.write(data)
+
+
+def wait():
+    return None
+
+
+def configure_from_env(environ=os.environ):
+    """Read VOICE_CHANGER_* variables into `config`"""
+    if environ.get('VOICE_CHANGER_INPUT'):
+        config['source'] = environ['VOICE_CHANGER_INPUT']
+    if environ.get('VOICE_CHANGER_OUTPUT'):
+        config['output'] = environ['VOICE_CHANGER_OUTPUT']
+    if environ.get('VOICE_CHANGER_PACE'):
+        config['realtime'] = environ['VOICE_CHANGER_PACE'] != 'fast'
+    if environ.get('VOICE_CHANGER_DURATION'):
+        config['duration'] = float(environ['VOICE_CHANGER_DURATION'])
+    if environ.get('VOICE_CHANGER_OUTPUT_RATE'):
+        config['output_samplerate'] = int(environ['VOICE_CHANGER_OUTPUT_RATE'])
+    if environ.get('VOICE_CHANGER_LOOPBACK_MS'):
+        config['loopback_ms'] = float(environ['VOICE_CHANGER_LOOPBACK_MS'])
+
+
+def run_callback(callback, source='speech', samplerate=DEFAULT_SAMPLERATE,
+                 blocksize=DEFAULT_BLOCKSIZE, channels=1, output=None, realtime=False):
+    """Drive one callback over a whole source and return the stream stats"""
+    with Stream(samplerate=samplerate, blocksize=blocksize, channels=channels,
+                callback=callback, source=source, output=output,
+                realtime=realtime, loop=False) as stream:
+        pass
+    return stream.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a voice changer script on the virtual backend")
+    parser.add_argument('script', help="script to run, e.g. main.py")
+    parser.add_argument('--input', '-i', default='speech',
+                        help="WAV file, 'speech'/'sine' for a synthetic signal, "
+                             "or 'loopback' to hear the output")
+    parser.add_argument('--output', '-o', help="WAV file for the processed output")
+    parser.add_argument('--fast', action='store_true',
+                        help="free-running instead of paced to the wall clock")
+    parser.add_argument('--duration', type=float, default=config['duration'],
+                        help="seconds of synthetic input (default 5)")
+    parser.add_argument('--output-rate', type=int,
+                        help="give 'Virtual Output' its own sample rate, e.g. 44100")
+    args = parser.parse_args()
+
+    os.environ['VOICE_CHANGER_BACKEND'] = 'virtual'
+    config.update(source=args.input, output=args.output, realtime=not args.fast,
+                  duration=args.duration, output_samplerate=args.output_rate)
+
+    # Scripts import the backend through audio_backend, which must resolve
+    # to this already-configured module rather than a fresh copy
+    sys.modules.setdefault('virtual_audio', sys.modules[__name__])
+    sys.argv = [args.script]
+    start = time.perf_counter()
+    try:
+        runpy.run_path(args.script, run_name='__main__')
+    finally:
+        wall = time.perf_counter() - start
+        for stream in list(_streams):
+            stream.close()
+        print(f"\n[virtual] ran {args.script} in {wall:.2f}s wall time", file=sys.stderr)
+        for stream in history:
+            stats = stream.stats()
+            print(f"[virtual] {stats['blocks']} blocks of {stream.blocksize}, "
+                  f"{stats['deadline_misses']} deadline misses, "
+                  f"mean {stats['mean_callback_ms']:.2f} ms, max {stats['max_callback_ms']:.2f} ms, "
+                  f"load {stats['load'] * 100:.1f}%", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,59 +1,92 @@
-import sounddevice as sd
+import time
+LAUNCHED = time.perf_counter()  # Before the imports, so they count towards startup
+import contextlib
+from audio_backend import sd
 import numpy as np
-from scipy import signal
+from effect_chain import PRESETS, build_chain, preserve_formants
+from effect_switcher import SwitchableEffect
+from control import read_commands
+from block_processor import BlockProcessor
+from silence_gate import SilenceGate
+from interp_tables import tables
+from instrumentation import CallbackMonitor, StatsReporter, format_summary
+from device_probe import (open_streams, known_configs, forget, describe,
+                          last_devices, remember_devices)
+# Optional parts (pipeline, autotune, rate bridge, control socket) are
+# imported where their setting turns them on, startup only pays for what runs
+IMPORT_SECONDS = time.perf_counter() - LAUNCHED
 
 # Settings
 BLOCK_SIZE = 1024    # Lower = less latency, higher CPU usage
-
-# Voice effect presets
+AUTO_BLOCK_SIZE = False  # Measure the smallest stable block size per device (cached)
+STEREO = True        # Keep left/right separate; False downmixes to mono (cheaper)
+NATIVE_RATES = True  # Run input and output at their own rates, resampling in between
+PIPELINE_BLOCKS = 0  # >0 runs DSP on a worker thread, adding this many blocks of latency
+STATS_INTERVAL = 10  # Seconds between callback timing reports (0 = only at the end)
+STATS_FILE = None    # e.g. 'callback_stats.json' to save a summary when the stream stops
+CROSSFADE_MS = 30    # Fade between effects when switching while running
+CONTROL_PORT = None  # e.g. 9999 to switch effects with `python control.py 3 --port 9999`
+CONTROL_SOCKET = None  # Or a UNIX socket path such as '/tmp/voice-changer.sock'
+SAMPLE_FORMAT = 'float32'  # 'int16' is native on many Android devices (effects still run in float32)
+SILENCE_THRESHOLD_DB = None  # e.g. -50 skips the effect on quieter blocks to save CPU
+SILENCE_HANGOVER_MS = 300    # Keep the effect running this long after speech stops
+SILENCE_OUTPUT = 'silence'   # Or 'passthrough' for the dry signal while skipped
+RECORD_DIR = None    # e.g. 'recordings' to archive raw and processed audio (written off the audio thread)
+RECORD_FORMAT = 'wav'  # Or 'raw' for headerless samples in the stream's format
+OUTPUT_BUS = None    # e.g. 'voice-changer' shares the processed audio with local processes (python output_bus.py voice-changer)
+PRESERVE_FORMANTS = False  # Keep the voice's formants when shifting pitch (less cartoonish, ~16 ms more latency)
+REALTIME_PROFILE = False  # Warm up the effects, keep the GC out of the stream, raise audio thread priority
+AUDIO_CPUS = None    # With REALTIME_PROFILE, pin the audio threads: e.g. '2,3', or 'fast' for the big cores
+
+# Voice effect presets (name, effect chain), see effect_chain.PRESETS
 EFFECTS = {
-    '1': ('Chipmunk', 1.5, 1.0),      # pitch_shift, speed
-    '2': ('Deep Voice', 0.7, 1.0),
-    '3': ('Robot', 1.2, 0.8),
-    '4': ('Demon', 0.6, 0.9),
-    '5': ('Normal (passthrough)', 1.0, 1.0)
+    '1': ('Chipmunk', PRESETS['Chipmunk']),
+    '2': ('Deep Voice', PRESETS['Deep Voice']),
+    '3': ('Robot', PRESETS['Robot']),
+    '4': ('Demon', PRESETS['Demon']),
+    '5': ('Normal (passthrough)', PRESETS['Normal (passthrough)'])
 }
 
-# Current effect
-current_effect = 1.0
+# Current effect (swapped at runtime through `switcher`)
+current_effect = PRESETS['Chipmunk']
+switcher = None
+processor = None
+gate = None
+
+def pitch_shift_simple(audio, shift_factor, out=None):
+    """Fast pitch shifting using resampling
 
-def pitch_shift_simple(audio, shift_factor):
-    """Fast pitch shifting using resampling"""
+    Pass `out` (tables.get(...) long) to keep the callback from allocating.
+    """
     if shift_factor == 1.0:
         return audio
 
-    # Resample to shift pitch
-    num_samples = int(len(audio) / shift_factor)
-    indices = np.linspace(0, len(audio) - 1, num_samples)
-    shifted = np.interp(indices, np.arange(len(audio)), audio)
-
-    return shifted
+    # Resample to shift pitch (table is cached per block size and factor)
+    table = tables.get(len(audio), shift_factor, audio.dtype)
+    return table.apply(audio, out=out)
 
 def callback(indata, outdata, frames, time, status):
-    if status:
-        print(status)
-
+    # Status flags are counted by the CallbackMonitor wrapping this callback
     try:
-        # Get mono audio
-        audio = indata.flatten() if indata.ndim > 1 else indata.copy()
-
-        # Apply pitch shift
-        shifted = pitch_shift_simple(audio, 1.0 / current_effect)
-
-        # Adjust length to match output frame size
-        if len(shifted) < frames:
-            shifted = np.pad(shifted, (0, frames - len(shifted)))
-        else:
-            shifted = shifted[:frames]
-
-        # Output to all channels
-        for i in range(outdata.shape[1]):
-            outdata[:, i] = shifted
+        # Map channels, run the effect chain and write all outputs in place
+        processor.process(indata, outdata, frames)
 
     except Exception as e:
         print(f"Error: {e}")
         outdata.fill(0)
 
+def select_effect(command):
+    """Switch the running effect by menu key or name and return a status line"""
+    key = command.strip().lower()
+    for number, (name, spec) in EFFECTS.items():
+        if key in (number, name.lower(), name.split()[0].lower()):
+            # Tables built for the old effect will not be asked for again
+            tables.invalidate()
+            if switcher.request(spec, wait=1.0):
+                return f"✓ Using: {name} (switched in {switcher.switch_ms:.0f} ms)"
+            return f"✓ Using: {name} (queued)"
+    return f"❌ Unknown effect '{command}', use 1-{len(EFFECTS)} or a name"
+
 def list_devices():
     """List all audio devices and return input/output capable devices"""
     devices = sd.query_devices()
@@ -94,84 +127,28 @@ def select_device(device_list, device_type):
         except ValueError:
             print("❌ Please enter a valid number.")
 
-# Main
-print("=== REAL-TIME VOICE CHANGER ===")
-
-# Step 1: List devices and let user choose
-input_devices, output_devices, devices = list_devices()
-
-if not input_devices:
-    print("❌ No input devices found!")
-    exit(1)
-if not output_devices:
-    print("❌ No output devices found!")
-    exit(1)
-
-print("--- DEVICE SELECTION ---")
-input_device = select_device(input_devices, "INPUT")
-output_device = select_device(output_devices, "OUTPUT")
-
-# Get device info
-input_info = devices[input_device]
-output_info = devices[output_device]
-
-# Determine channels
-input_channels = min(input_info['max_input_channels'], 2)  # Use mono or stereo
-output_channels = min(output_info['max_output_channels'], 2)
-
-# Use the sample rate from the input device (or take minimum if different)
-sample_rate = int(input_info['default_samplerate'])
-
-print(f"\n✓ Input: [{input_device}] {input_info['name']} ({input_channels} ch)")
-print(f"✓ Output: [{output_device}] {output_info['name']} ({output_channels} ch)")
-print(f"✓ Sample Rate: {sample_rate} Hz")
-
-# Step 2: Select effect
-print("\n--- EFFECT SELECTION ---")
-print("Available effects:")
-for key, (name, _, _) in EFFECTS.items():
-    print(f"  {key}: {name}")
-
-choice = input("\nSelect effect (1-5): ").strip()
-if choice in EFFECTS:
-    effect_name, current_effect, _ = EFFECTS[choice]
-    print(f"\n✓ Using: {effect_name}")
-else:
-    print("\n✓ Using: Chipmunk (default)")
-    current_effect = 1.5
-
-# Step 3: Start streaming
-print(f"\nLatency: ~{BLOCK_SIZE/sample_rate*1000:.1f}ms")
-print("\n🎤 Starting voice changer...")
-print("Press Enter or Ctrl+C to stop\n")
-
-try:
-    # Handle case where input and output are the same device (common on Android)
-    if input_device == output_device:
-        # Same device - use duplex mode with unified configuration
-        print(f"\n⚠️  Using duplex mode (same device for input/output)")
-        with sd.Stream(device=input_device,
-                       samplerate=sample_rate,
-                       blocksize=BLOCK_SIZE,
-                       dtype='float32',
-                       channels=max(input_channels, output_channels),
-                       callback=callback):
-            print("🔴 RECORDING... (voice changer active)\n")
-            input("Press Enter to stop...\n")
-    else:
-        # Different devices - use separate input/output configuration
-        with sd.Stream(device=(input_device, output_device),
-                       samplerate=sample_rate,
-                       blocksize=BLOCK_SIZE,
-                       dtype='float32',
-                       channels=(input_channels, output_channels),
-                       callback=callback):
-            print("🔴 RECORDING... (voice changer active)\n")
-            input("Press Enter to stop...\n")
-
-except KeyboardInterrupt:
-    print("\n\n✓ Stopped")
-except Exception as e:
+def choose_config(configs, input_info, output_info, separate_devices):
+    """Pick the probed configuration that best matches the settings"""
+    if not NATIVE_RATES:
+        # Without the rate bridge both directions must share one rate
+        configs = [c for c in configs if c['samplerate'] == c['output_samplerate']] or configs
+    native = (int(input_info['default_samplerate']), int(output_info['default_samplerate']))
+    if NATIVE_RATES and separate_devices and native[0] != native[1]:
+        # e.g. a 44.1k USB mic with a 48k Bluetooth sink: open each at its
+        # own rate instead of forcing one on both
+        for config in configs:
+            if (config['samplerate'], config['output_samplerate']) == native:
+                return config
+    return configs[0]
+
+def choose_block_size(block_sizes):
+    """BLOCK_SIZE if it opened during probing, else the nearest larger one that did"""
+    if not block_sizes or BLOCK_SIZE in block_sizes:
+        return BLOCK_SIZE
+    larger = [size for size in block_sizes if size > BLOCK_SIZE]
+    return min(larger) if larger else max(block_sizes)
+
+def print_troubleshooting(e):
     print(f"\n❌ Error: {e}")
     print("\nTroubleshooting tips:")
 
@@ -190,3 +167,333 @@ except Exception as e:
     print("- Check device permissions")
     print("- Make sure devices are properly connected")
     print("- Try reducing BLOCK_SIZE if you get buffer errors")
+    print("- Or set AUTO_BLOCK_SIZE = True to measure a stable block size for these devices")
+    print("- Try PIPELINE_BLOCKS = 2 if the effect is too slow for the callback")
+    print("- Run `python test_android.py` to probe these devices again")
+
+def run(input_device, output_device, config, block_size):
+    """Set up the effect for a stream configuration and run until stopped
+
+    Returns False without running if the streams would not open or start.
+    """
+    started = time.perf_counter()
+    input_info = sd.query_devices(input_device)
+    output_info = sd.query_devices(output_device)
+    input_channels, output_channels = config['channels']
+    sample_rate = config['samplerate']
+    output_rate = config['output_samplerate']
+    split_rates = config['mode'] == 'split'
+    # Split streams meet in the float32 rate bridge, only duplex ones use int16
+    sample_format = 'float32' if split_rates else SAMPLE_FORMAT
+
+    # Channels the effect runs on; mono input is fanned out to stereo output
+    process_channels = min(input_channels, output_channels) if STEREO else 1
+
+    print(f"\n✓ Input: [{input_device}] {input_info['name']} ({input_channels} ch)")
+    print(f"✓ Output: [{output_device}] {output_info['name']} ({output_channels} ch)")
+    print(f"✓ Sample Rate: {sample_rate} Hz")
+    if split_rates:
+        print(f"✓ Output Rate: {output_rate} Hz (separate streams, drift compensated)")
+    print(f"✓ Processing: {'stereo' if process_channels > 1 else 'mono'}")
+    if SILENCE_THRESHOLD_DB is not None:
+        print(f"✓ Silence gate: below {SILENCE_THRESHOLD_DB} dBFS, {SILENCE_HANGOVER_MS} ms hangover")
+    if PRESERVE_FORMANTS:
+        print("✓ Formants: preserved when shifting pitch")
+
+    # Duplex streams (same device) use one channel count for both directions
+    if input_device == output_device:
+        stream_channels = (max(input_channels, output_channels),) * 2
+        stream_device_infos = [input_info]
+    else:
+        stream_channels = (input_channels, output_channels)
+        stream_device_infos = [input_info, output_info]
+
+    def build_processor(block_size, gated=True):
+        """Set up the effect for a block size and return the callback"""
+        global switcher, processor, gate
+        tables.invalidate()  # Sized for the previous block size
+        switcher = SwitchableEffect(
+            lambda spec: build_chain(preserve_formants(spec) if PRESERVE_FORMANTS else spec,
+                                     block_size, sample_rate, channels=process_channels),
+            current_effect, block_size, process_channels,
+            crossfade=sample_rate * CROSSFADE_MS // 1000)
+        effect = switcher
+        gate = None
+        if gated and SILENCE_THRESHOLD_DB is not None:
+            gate = effect = SilenceGate(switcher, block_size, sample_rate, process_channels,
+                                        SILENCE_THRESHOLD_DB, SILENCE_HANGOVER_MS,
+                                        idle=SILENCE_OUTPUT)
+        processor = BlockProcessor(effect, block_size, input_channels, output_channels,
+                                   process_channels)
+        return callback
+
+    if AUTO_BLOCK_SIZE and split_rates:
+        print("\n(AUTO_BLOCK_SIZE needs one shared rate, using BLOCK_SIZE)")
+    elif AUTO_BLOCK_SIZE:
+        print("\n--- BLOCK SIZE TUNING ---")
+        from autotune import tune_block_size
+        if input_device == output_device:
+            stream_kwargs = dict(device=input_device, channels=stream_channels[0])
+        else:
+            stream_kwargs = dict(device=(input_device, output_device), channels=stream_channels)
+        stream_kwargs.update(samplerate=sample_rate, dtype=sample_format)
+        # Tuned without the silence gate, a quiet room would hide the effect's cost
+        block_size = tune_block_size(sd, stream_device_infos, stream_kwargs,
+                                     lambda n: build_processor(n, gated=False))
+        print(f"✓ Block size: {block_size}")
+
+    build_processor(block_size)
+
+    # First use of every effect happens here rather than in the first callbacks
+    profile = None
+    if REALTIME_PROFILE:
+        from realtime import DSP_PRIORITY, RealtimeProfile
+        profile = RealtimeProfile(cpus=AUDIO_CPUS)
+        warm_channels = (input_channels, output_channels) if split_rates else stream_channels
+        blocks = profile.warm_up(processor.process, block_size, *warm_channels, sample_rate,
+                                 dtype=sample_format,
+                                 effects=[switcher.make_chain(spec) for _, spec in EFFECTS.values()])
+        if gate is not None:
+            gate.reset_stats()
+        print(f"✓ Realtime profile: {blocks} blocks of warm-up through {len(EFFECTS)} effects")
+
+    # Optional worker thread so slow DSP cannot stall the audio callback
+    stream_callback = callback
+    pipeline = None
+    if PIPELINE_BLOCKS > 0:
+        from pipeline import PipelinedProcessor
+        pipeline = PipelinedProcessor(processor.process, block_size, *stream_channels,
+                                      latency_blocks=PIPELINE_BLOCKS,
+                                      dtype=sample_format,
+                                      thread_setup=None if profile is None else
+                                      (lambda: profile.setup_thread('dsp', DSP_PRIORITY)))
+        stream_callback = pipeline.callback
+        pipeline.start()
+
+    # Archive both sides of every block; the callback only copies into a ring
+    recorder = None
+    if RECORD_DIR:
+        from recorder import Recorder
+        tap_channels = (input_channels, output_channels) if split_rates else stream_channels
+        recorder = Recorder(RECORD_DIR, sample_rate, block_size, *tap_channels,
+                            dtype=sample_format, fmt=RECORD_FORMAT).start()
+        stream_callback = recorder.wrap(stream_callback)
+        print(f"✓ Recording to {recorder.paths['input']} and {recorder.paths['output']}")
+
+    # Processed blocks in shared memory for other local processes to read
+    bus = None
+    if OUTPUT_BUS:
+        from output_bus import OutputBus
+        bus_channels = output_channels if split_rates else stream_channels[1]
+        bus = OutputBus(OUTPUT_BUS, sample_rate, block_size, bus_channels, dtype=sample_format)
+        stream_callback = bus.wrap(stream_callback)
+        print(f"✓ Output bus: {OUTPUT_BUS} ({bus.slots - 1}-block ring in shared memory)")
+
+    # Time every callback; reports are printed from a separate thread
+    monitor = CallbackMonitor(sample_rate, block_size)
+    stream_callback = monitor.wrap(stream_callback)
+    reporter = StatsReporter(monitor, STATS_INTERVAL, STATS_FILE).start()
+
+    # Elastic buffer between the input and output clocks
+    bridge = None
+    input_callback = output_callback = None
+    if split_rates:
+        from rate_bridge import RateBridge
+        output_block = round(block_size * output_rate / sample_rate)
+        bridge = RateBridge(sample_rate, output_rate, output_channels, block_size, output_block)
+        wet = np.zeros((block_size, output_channels), dtype=np.float32)
+
+        def input_callback(indata, frames, time, status):
+            block = wet if frames == len(wet) else wet[:frames]
+            stream_callback(indata, block, frames, time, status)
+            bridge.write(block)
+
+        def output_callback(outdata, frames, time, status):
+            bridge.read(outdata)
+
+    # Audio threads are set up (affinity, priority) from their first callback
+    if profile is not None:
+        if split_rates:
+            input_callback = profile.wrap(input_callback, 'input')
+            output_callback = profile.wrap(output_callback, 'output')
+        else:
+            stream_callback = profile.wrap(stream_callback)
+
+    # Step 3: Start streaming
+    pipeline_latency = PIPELINE_BLOCKS * block_size
+    bridge_latency = bridge.latency * 1000 if bridge else 0
+    print(f"\nLatency: ~{(block_size + pipeline_latency + switcher.latency)/sample_rate*1000 + bridge_latency:.1f}ms")
+    from round_trip import measured_latency
+    measured = None if split_rates else measured_latency(sd, input_device, output_device,
+                                                         sample_rate, block_size, PIPELINE_BLOCKS)
+    if measured:
+        print(f"Measured round trip: {measured['median_ms']:.1f}ms "
+              f"(jitter {measured['jitter_ms']:.2f}ms, {measured['measured']})")
+    else:
+        print(f"(estimate; loop the output to the input and run `python round_trip.py "
+              f"-b {block_size} -p {PIPELINE_BLOCKS}` to measure it)")
+
+    control = None
+    opened = False
+    stopped = False
+    try:
+        if profile is not None:
+            profile.enter()
+        streams = open_streams(sd, input_device, output_device, config, block_size,
+                               stream_callback, input_callback, output_callback,
+                               sample_format)
+
+        # Effects can be switched from another terminal while the stream runs
+        if CONTROL_PORT or CONTROL_SOCKET:
+            from control import ControlServer
+            control = ControlServer(select_effect, CONTROL_PORT, CONTROL_SOCKET).start()
+            print(f"✓ Listening for effect changes on {control.address}")
+
+        print("\n🎤 Starting voice changer...")
+        print(f"Type 1-{len(EFFECTS)} + Enter to switch effect, Enter or Ctrl+C to stop\n")
+        if input_device == output_device and not split_rates:
+            # Same device - duplex mode with unified configuration (common on Android)
+            print(f"\n⚠️  Using duplex mode (same device for input/output)")
+
+        with contextlib.ExitStack() as stack:
+            for stream in streams:
+                stack.enter_context(stream)
+            # Only now has the configuration worked; a stale cached one may open and fail here
+            opened = True
+            print("🔴 RECORDING... (voice changer active)\n")
+            read_commands(select_effect)
+
+    except (KeyboardInterrupt, EOFError):
+        stopped = True
+        print("\n\n✓ Stopped")
+    except Exception as e:
+        if not opened:
+            print(f"\n❌ Could not open {describe(config)}: {e}")
+        else:
+            print_troubleshooting(e)
+
+    finally:
+        if profile is not None:
+            profile.exit()
+        if control is not None:
+            control.stop()
+        summary = reporter.stop()
+        if pipeline is not None:
+            pipeline.stop()
+        if recorder is not None:
+            recorder.stop()
+        if bus is not None:
+            bus_stats = bus.stats()
+            bus.close()
+        if opened:
+            print(f"\nCallback timing: {format_summary(summary)}")
+            if profile is not None:
+                from realtime import format_profile
+                print(f"Realtime profile: {format_profile(profile.report())}")
+            if monitor.first_call is not None:
+                print(f"Startup: imports {IMPORT_SECONDS * 1000:.0f} ms, first audio block "
+                      f"{(monitor.first_call - started) * 1000:.0f} ms after set-up began")
+            if STATS_FILE:
+                print(f"Saved timing summary to {STATS_FILE}")
+            if bridge is not None:
+                stats = bridge.stats()
+                print(f"\nRate bridge: {stats['correction_ppm']:+.0f} ppm clock trim, "
+                      f"{stats['underruns']} underruns, {stats['overruns']} overruns")
+            if pipeline is not None:
+                stats = pipeline.stats()
+                print(f"\nPipeline: {stats['processed']} blocks, "
+                      f"{stats['overruns']} overruns, {stats['underruns']} underruns")
+            if recorder is not None:
+                stats = recorder.stats()
+                print(f"\nRecording: {stats['seconds']:.1f}s in {stats['writes']} writes, "
+                      f"{stats['dropped']} blocks dropped (slowest write "
+                      f"{stats['max_write_ms']:.1f} ms, ring peak {stats['max_queued']}/"
+                      f"{stats['capacity']} blocks)")
+            if bus is not None:
+                print(f"\nOutput bus: {bus_stats['published']} blocks published, "
+                      f"{bus_stats['readers']} reader(s) attached at the end "
+                      f"(slowest {bus_stats['max_lag']} blocks behind, "
+                      f"{bus_stats['overruns']} overruns)")
+            stats = tables.stats()
+            if stats['hits'] or stats['misses']:
+                print(f"\nInterpolation tables: {stats['hits']} hits, {stats['misses']} misses "
+                      f"({stats['hit_rate'] * 100:.1f}% hit rate, {stats['size']} cached)")
+            if gate is not None:
+                stats = gate.stats()
+                print(f"\nSilence gate: effect skipped on {stats['skipped']} of "
+                      f"{stats['blocks']} blocks ({stats['skipped_pct']:.0f}%), "
+                      f"{stats['onsets']} speech onsets")
+    # Stopping before the streams started is no reason to probe again
+    return opened or stopped
+
+# Main
+if __name__ == "__main__":
+    print("=== REAL-TIME VOICE CHANGER ===")
+
+    # Step 1: List devices and let user choose
+    input_devices, output_devices, devices = list_devices()
+
+    if not input_devices:
+        print("❌ No input devices found!")
+        exit(1)
+    if not output_devices:
+        print("❌ No output devices found!")
+        exit(1)
+
+    print("--- DEVICE SELECTION ---")
+    last = last_devices(sd)
+    if last:
+        # Matched by host API and name, so a changed device order still finds them
+        print(f"Last used: [{last[0]}] {devices[last[0]]['name']} -> "
+              f"[{last[1]}] {devices[last[1]]['name']}")
+    if last and input("Press Enter to use them again, or n to choose: ").strip().lower() in ('', 'y', 'yes'):
+        input_device, output_device = last
+    else:
+        input_device = select_device(input_devices, "INPUT")
+        output_device = select_device(output_devices, "OUTPUT")
+    remember_devices(sd, input_device, output_device)
+
+    # Get device info
+    input_info = devices[input_device]
+    output_info = devices[output_device]
+
+    # Working configurations are probed once per device pair and cached
+    probed, from_cache = known_configs(sd, input_device, output_device)
+    if not probed['configs']:
+        print("❌ No stream configuration opened on these devices!")
+        print_troubleshooting("all probed configurations failed")
+        exit(1)
+    separate = input_device != output_device
+    config = choose_config(probed['configs'], input_info, output_info, separate)
+    print(f"✓ Configuration: {describe(config)}{' (cached)' if from_cache else ''}")
+
+    # Step 2: Select effect
+    print("\n--- EFFECT SELECTION ---")
+    print("Available effects:")
+    for key, (name, _) in EFFECTS.items():
+        print(f"  {key}: {name}")
+
+    choice = input("\nSelect effect (1-5): ").strip()
+    if choice in EFFECTS:
+        effect_name, current_effect = EFFECTS[choice]
+        print(f"\n✓ Using: {effect_name}")
+    else:
+        print("\n✓ Using: Chipmunk (default)")
+        current_effect = PRESETS['Chipmunk']
+
+    if not run(input_device, output_device, config, choose_block_size(probed['blocksizes'])):
+        if not from_cache:
+            print_troubleshooting(f"{describe(config)} failed to open")
+            exit(1)
+        # The devices changed since they were probed, find what works now
+        print("\nCached configuration no longer opens, probing again...")
+        forget(sd, input_device, output_device)
+        probed, _ = known_configs(sd, input_device, output_device, reprobe=True)
+        if not probed['configs']:
+            print_troubleshooting("all probed configurations failed")
+            exit(1)
+        config = choose_config(probed['configs'], input_info, output_info, separate)
+        print(f"✓ Configuration: {describe(config)}")
+        if not run(input_device, output_device, config, choose_block_size(probed['blocksizes'])):
+            print_troubleshooting(f"{describe(config)} failed to open")
+            exit(1)
@@ -2,34 +2,16 @@
 Android-optimized voice changer with audio routing control
 Attempts to route input from wired mic and output to Bluetooth speaker
 """
-import sounddevice as sd
+from audio_backend import sd
 import numpy as np
-from scipy import signal
 import subprocess
 import json
 import sys
-
-print("=== Android Voice Changer with Routing ===\n")
-
-# Check audio configuration
-try:
-    audio_info = subprocess.check_output(['termux-audio-info'])
-    info = json.loads(audio_info)
-    print("Current Audio Configuration:")
-    print(f"  Bluetooth A2DP: {'ON' if info.get('BLUETOOTH_A2DP_IS_ON') else 'OFF'}")
-    print(f"  Wired Headset: {'CONNECTED' if info.get('WIREDHEADSET_IS_CONNECTED') else 'DISCONNECTED'}")
-
-    if not info.get('BLUETOOTH_A2DP_IS_ON'):
-        print("\n⚠ WARNING: Bluetooth A2DP is OFF")
-        print("  Please ensure your Bluetooth speaker is connected")
-
-    if not info.get('WIREDHEADSET_IS_CONNECTED'):
-        print("\n⚠ WARNING: Wired headset not detected")
-        print("  For best results, connect wired headphones with mic")
-
-    print()
-except Exception as e:
-    print(f"Could not get audio info: {e}\n")
+from pipeline import PipelinedProcessor
+from polyphase import FixedLengthOutput, PolyphaseResampler
+from block_processor import int16_to_float32, float32_to_int16
+from silence_gate import SilenceGate
+from instrumentation import CallbackMonitor, StatsReporter, format_summary
 
 # Voice effects
 EFFECTS = {
@@ -41,111 +23,262 @@ EFFECTS = {
     '6': ('Very High', 1.8),
 }
 
-print("Available Voice Effects:")
-for key, (name, _) in EFFECTS.items():
-    print(f"  [{key}] {name}")
-
-choice = input("\nSelect effect (1-6): ").strip()
-if choice not in EFFECTS:
-    print("Invalid choice, using default (Deep Voice)")
-    choice = '1'
-
-effect_name, pitch_shift = EFFECTS[choice]
-print(f"\nUsing effect: {effect_name}")
+# Current effect
+effect_name, pitch_shift = EFFECTS['1']
 
 # Audio parameters
 SAMPLE_RATE = 48000  # Standard Android sample rate
 BLOCK_SIZE = 2048    # Larger block size for Android stability
 CHANNELS = 1         # Mono for better Android compatibility
-
-print(f"\nAudio Settings:")
-print(f"  Sample Rate: {SAMPLE_RATE} Hz")
-print(f"  Block Size: {BLOCK_SIZE} samples")
-print(f"  Channels: {CHANNELS}")
-print()
-
-# Try to influence Android routing using termux-api
-print("Attempting to configure audio routing...")
-try:
-    # This might help Android prioritize Bluetooth for output
-    # Note: This is experimental and may not work on all devices
-    subprocess.run(['termux-media-scan', '/dev/null'],
-                   stderr=subprocess.DEVNULL,
-                   stdout=subprocess.DEVNULL)
-except:
-    pass
-
-print("\n⚠ ANDROID ROUTING NOTES:")
-print("  - Input will use wired headset mic (if connected)")
-print("  - Output routing depends on Android system settings")
-print("  - To force Bluetooth output:")
-print("    1. Disconnect wired headphones AFTER starting")
-print("    2. Or adjust Android sound settings manually")
-print("    3. Some Android versions let you choose in quick settings")
-print()
+SAMPLE_FORMAT = 'float32'  # 'int16' is OpenSL ES's native format, converted at the edges
+PIPELINE_BLOCKS = 0  # >0 runs DSP on a worker thread, adding this many blocks of latency
+STATS_INTERVAL = 10  # Seconds between callback timing reports (0 = only at the end)
+STATS_FILE = None    # e.g. 'callback_stats.json' to save a summary when the stream stops
+SILENCE_THRESHOLD_DB = -50  # Skip the pitch shift on quieter blocks to save battery (None = always run)
+SILENCE_HANGOVER_MS = 300   # Keep shifting this long after speech stops
+REMOTE_DSP = None       # e.g. '192.168.1.20:9500' runs the effect on a net_audio.py server
+REMOTE_PROTOCOL = 'udp'  # 'udp' (lowest latency) or 'tcp' (if the network drops UDP)
+REALTIME_PROFILE = False  # Warm up, keep the GC out of the stream, raise audio thread priority
+AUDIO_CPUS = 'fast'  # With REALTIME_PROFILE, pin the audio threads to the big cores (None = any)
 
 # Pitch shift function
-def pitch_shift_audio(audio_data, shift_factor):
-    """Apply pitch shifting using resampling"""
+resamplers = {}
+
+def pitch_shift_audio(audio_data, shift_factor, out=None):
+    """Apply pitch shifting using a streaming polyphase resampler"""
+    if out is None:
+        out = np.empty(len(audio_data), dtype=np.float32)
     if len(audio_data) == 0:
-        return audio_data
+        return out
+
+    # One resampler per ratio; its filter is designed once and its state
+    # carries over between blocks, so there is no FFT wrap-around. The FIFO
+    # behind it hands back exactly one block, keeping any surplus for the next
+    stage = resamplers.get(shift_factor)
+    if stage is None:
+        ratio = 1.0 / shift_factor
+        stage = resamplers[shift_factor] = (PolyphaseResampler.from_ratio(ratio),
+                                            FixedLengthOutput(len(audio_data), ratio))
+    resampler, fifo = stage
+    fifo.write(resampler.process(audio_data))
+    return fifo.read(out)
+
+class PitchShift:
+    """pitch_shift_audio in the process(audio, out) form SilenceGate wraps"""
+
+    latency = 0
+
+    def process(self, audio, out=None):
+        if out is None:
+            out = np.empty(audio.shape, dtype=np.float32)
+        return pitch_shift_audio(audio, pitch_shift, out)
 
-    # Resample to change pitch
-    num_samples = int(len(audio_data) / shift_factor)
-    resampled = signal.resample(audio_data, num_samples)
+# Idle blocks skip the resampler entirely
+gate = None
+if SILENCE_THRESHOLD_DB is not None:
+    gate = SilenceGate(PitchShift(), BLOCK_SIZE, SAMPLE_RATE,
+                       threshold_db=SILENCE_THRESHOLD_DB, hangover_ms=SILENCE_HANGOVER_MS)
 
-    # Pad or truncate to match block size
-    if len(resampled) < len(audio_data):
-        resampled = np.pad(resampled, (0, len(audio_data) - len(resampled)), 'constant')
+def shift_block(audio, out):
+    """Pitch shift a mono float32 block into out, through the gate if enabled"""
+    if gate is None:
+        pitch_shift_audio(audio, pitch_shift, out)
     else:
-        resampled = resampled[:len(audio_data)]
+        gate.process(audio, out=out)
 
-    return resampled.astype('float32')
+# float32 working buffers for int16 streams
+pcm_in = np.zeros(BLOCK_SIZE, dtype=np.float32)
+pcm_out = np.zeros(BLOCK_SIZE, dtype=np.float32)
+pcm_scratch = np.zeros(BLOCK_SIZE, dtype=np.float32)
+
+def process_block(indata, outdata, frames):
+    """Apply pitch shifting to one block"""
+    if indata.dtype == np.float32:
+        shift_block(indata[:, 0], outdata[:, 0])
+        return
+    # int16 stream: the resampler still only sees float32
+    audio = pcm_in[:frames]
+    int16_to_float32(indata[:frames, 0], audio)
+    shift_block(audio, pcm_out[:frames])
+    float32_to_int16(pcm_out[:frames], outdata[:frames, 0], pcm_scratch[:frames])
 
 # Audio callback
 def callback(indata, outdata, frames, time, status):
     """Process audio in real-time"""
-    if status:
-        print(f"Status: {status}")
-
-    # Apply pitch shifting
-    shifted = pitch_shift_audio(indata[:, 0], pitch_shift)
-    outdata[:, 0] = shifted
-
-print("Starting voice changer...")
-print("Press Ctrl+C to stop\n")
-
-try:
-    with sd.Stream(
-        device=0,  # Default device (Android manages routing)
-        samplerate=SAMPLE_RATE,
-        blocksize=BLOCK_SIZE,
-        dtype='float32',
-        channels=CHANNELS,
-        callback=callback
-    ):
-        print("✓ Voice changer is running!")
-        print(f"✓ Effect: {effect_name}")
-        print("\nTIP: If you want output on Bluetooth speaker:")
-        print("  1. Keep this running")
-        print("  2. Slowly unplug the wired headphones jack")
-        print("  3. Android should route output to Bluetooth")
-        print("  4. Input will still come from Bluetooth mic or built-in mic")
+    # Status flags are counted by the CallbackMonitor wrapping this callback
+    process_block(indata, outdata, frames)
+
+# Main
+if __name__ == "__main__":
+    print("=== Android Voice Changer with Routing ===\n")
+
+    # Check audio configuration
+    try:
+        audio_info = subprocess.check_output(['termux-audio-info'])
+        info = json.loads(audio_info)
+        print("Current Audio Configuration:")
+        print(f"  Bluetooth A2DP: {'ON' if info.get('BLUETOOTH_A2DP_IS_ON') else 'OFF'}")
+        print(f"  Wired Headset: {'CONNECTED' if info.get('WIREDHEADSET_IS_CONNECTED') else 'DISCONNECTED'}")
+
+        if not info.get('BLUETOOTH_A2DP_IS_ON'):
+            print("\n⚠ WARNING: Bluetooth A2DP is OFF")
+            print("  Please ensure your Bluetooth speaker is connected")
+
+        if not info.get('WIREDHEADSET_IS_CONNECTED'):
+            print("\n⚠ WARNING: Wired headset not detected")
+            print("  For best results, connect wired headphones with mic")
+
         print()
-        print("Press Ctrl+C to stop...")
-
-        # Keep running
-        while True:
-            sd.sleep(1000)
-
-except KeyboardInterrupt:
-    print("\n\nStopping voice changer...")
-except Exception as e:
-    print(f"\n\nError: {e}")
-    print("\nTroubleshooting:")
-    print("  - Ensure microphone permission is granted to Termux")
-    print("  - Close other apps using audio")
-    print("  - Try disconnecting and reconnecting audio devices")
-    sys.exit(1)
-
-print("Voice changer stopped.")
+    except Exception as e:
+        print(f"Could not get audio info: {e}\n")
+
+    print("Available Voice Effects:")
+    for key, (name, _) in EFFECTS.items():
+        print(f"  [{key}] {name}")
+
+    choice = input("\nSelect effect (1-6): ").strip()
+    if choice not in EFFECTS:
+        print("Invalid choice, using default (Deep Voice)")
+        choice = '1'
+
+    effect_name, pitch_shift = EFFECTS[choice]
+    print(f"\nUsing effect: {effect_name}")
+
+    print(f"\nAudio Settings:")
+    print(f"  Sample Rate: {SAMPLE_RATE} Hz")
+    print(f"  Block Size: {BLOCK_SIZE} samples")
+    print(f"  Channels: {CHANNELS}")
+    print(f"  Format: {SAMPLE_FORMAT}")
+    print(f"  Pipeline: {f'{PIPELINE_BLOCKS} blocks' if PIPELINE_BLOCKS else 'off'}")
+    print(f"  Silence gate: {f'below {SILENCE_THRESHOLD_DB} dBFS' if gate else 'off'}")
+    print(f"  Remote DSP: {f'{REMOTE_DSP} ({REMOTE_PROTOCOL.upper()})' if REMOTE_DSP else 'off'}")
+    print(f"  Realtime profile: {'on' if REALTIME_PROFILE else 'off'}")
+    print()
+
+    # Try to influence Android routing using termux-api
+    print("Attempting to configure audio routing...")
+    try:
+        # This might help Android prioritize Bluetooth for output
+        # Note: This is experimental and may not work on all devices
+        subprocess.run(['termux-media-scan', '/dev/null'],
+                       stderr=subprocess.DEVNULL,
+                       stdout=subprocess.DEVNULL)
+    except:
+        pass
+
+    print("\n⚠ ANDROID ROUTING NOTES:")
+    print("  - Input will use wired headset mic (if connected)")
+    print("  - Output routing depends on Android system settings")
+    print("  - To force Bluetooth output:")
+    print("    1. Disconnect wired headphones AFTER starting")
+    print("    2. Or adjust Android sound settings manually")
+    print("    3. Some Android versions let you choose in quick settings")
+    print()
+
+    # Resampler filters are designed on first use, do it before the stream opens
+    profile = None
+    if REALTIME_PROFILE:
+        from realtime import DSP_PRIORITY, RealtimeProfile
+        profile = RealtimeProfile(cpus=AUDIO_CPUS)
+        if not REMOTE_DSP:
+            profile.warm_up(process_block, BLOCK_SIZE, CHANNELS, CHANNELS, SAMPLE_RATE,
+                            dtype=SAMPLE_FORMAT)
+            if gate is not None:
+                gate.reset_stats()
+
+    # Pipelined mode keeps the resampler out of the audio callback
+    stream_callback = callback
+    pipeline = None
+    client = None
+    if REMOTE_DSP:
+        # Send raw blocks to the server and play back what it returns
+        from net_audio import NetworkClient
+        host, _, port = REMOTE_DSP.partition(':')
+        client = NetworkClient(host, int(port or 9500), REMOTE_PROTOCOL, BLOCK_SIZE,
+                               SAMPLE_RATE, CHANNELS, effect=[('pitch', pitch_shift)])
+        try:
+            client.start()
+        except (OSError, TimeoutError) as e:
+            print(f"❌ Could not reach {REMOTE_DSP}: {e}")
+            sys.exit(1)
+        print(f"✓ Connected to {REMOTE_DSP}")
+        stream_callback = client.callback
+    elif PIPELINE_BLOCKS > 0:
+        pipeline = PipelinedProcessor(process_block, BLOCK_SIZE, CHANNELS, CHANNELS,
+                                      latency_blocks=PIPELINE_BLOCKS, dtype=SAMPLE_FORMAT,
+                                      thread_setup=None if profile is None else
+                                      (lambda: profile.setup_thread('dsp', DSP_PRIORITY)))
+        stream_callback = pipeline.callback
+        pipeline.start()
+
+    # Time every callback; reports are printed from a separate thread
+    monitor = CallbackMonitor(SAMPLE_RATE, BLOCK_SIZE)
+    stream_callback = monitor.wrap(stream_callback)
+    reporter = StatsReporter(monitor, STATS_INTERVAL, STATS_FILE).start()
+    if profile is not None:
+        # The audio thread is set up (big cores, priority) from its first callback
+        stream_callback = profile.wrap(stream_callback)
+
+    print("Starting voice changer...")
+    print("Press Ctrl+C to stop\n")
+
+    try:
+        if profile is not None:
+            profile.enter()
+        with sd.Stream(
+            device=0,  # Default device (Android manages routing)
+            samplerate=SAMPLE_RATE,
+            blocksize=BLOCK_SIZE,
+            dtype=SAMPLE_FORMAT,
+            channels=CHANNELS,
+            callback=stream_callback
+        ):
+            print("✓ Voice changer is running!")
+            print(f"✓ Effect: {effect_name}")
+            print("\nTIP: If you want output on Bluetooth speaker:")
+            print("  1. Keep this running")
+            print("  2. Slowly unplug the wired headphones jack")
+            print("  3. Android should route output to Bluetooth")
+            print("  4. Input will still come from Bluetooth mic or built-in mic")
+            print()
+            print("Press Ctrl+C to stop...")
+
+            # Keep running
+            while True:
+                sd.sleep(1000)
+
+    except KeyboardInterrupt:
+        print("\n\nStopping voice changer...")
+    except Exception as e:
+        print(f"\n\nError: {e}")
+        print("\nTroubleshooting:")
+        print("  - Ensure microphone permission is granted to Termux")
+        print("  - Close other apps using audio")
+        print("  - Try disconnecting and reconnecting audio devices")
+        sys.exit(1)
+    finally:
+        if profile is not None:
+            profile.exit()
+        print(f"Callback timing: {format_summary(reporter.stop())}")
+        if profile is not None:
+            from realtime import format_profile
+            print(f"Realtime profile: {format_profile(profile.report())}")
+        if pipeline is not None:
+            pipeline.stop()
+            stats = pipeline.stats()
+            print(f"Pipeline: {stats['processed']} blocks, "
+                  f"{stats['overruns']} overruns, {stats['underruns']} underruns")
+        if client is not None:
+            from net_audio import format_stats
+            client.stop()
+            print(f"Remote DSP: {format_stats(client.stats())}")
+        if gate is not None and client is None:
+            stats = gate.stats()
+            print(f"Silence gate: pitch shift skipped on {stats['skipped']} of "
+                  f"{stats['blocks']} blocks ({stats['skipped_pct']:.0f}%)")
+        for _, fifo in resamplers.values():
+            stats = fifo.stats()
+            print(f"Resampler output: {stats['dropped']} surplus samples dropped, "
+                  f"{stats['padded']} padded with silence")
+
+    print("Voice changer stopped.")
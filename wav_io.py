@@ -0,0 +1,175 @@
+"""
+Minimal WAV reading/writing on top of the standard library `wave` module
+Audio is exchanged as float32 arrays shaped (frames, channels)
+"""
+import os
+import struct
+import wave
+import numpy as np
+
+# PCM sample width (bytes) -> numpy dtype and full-scale value
+PCM_FORMATS = {
+    1: (np.uint8, 128.0),
+    2: (np.int16, 32768.0),
+    4: (np.int32, 2147483648.0),
+}
+
+
+def pcm_to_float(raw, sampwidth, channels):
+    """Decode little-endian PCM bytes to float32 (frames, channels)"""
+    if sampwidth == 3:
+        # Widen 24-bit samples to 32-bit by adding a zero low byte
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        wide = np.zeros((len(b), 4), dtype=np.uint8)
+        wide[:, 1:] = b
+        data = wide.view('<i4').reshape(-1)
+        scale = 2147483648.0
+    else:
+        dtype, scale = PCM_FORMATS[sampwidth]
+        data = np.frombuffer(raw, dtype=np.dtype(dtype).newbyteorder('<'))
+        if sampwidth == 1:
+            data = data.astype(np.int16) - 128
+    return (data.astype(np.float32) / scale).reshape(-1, channels)
+
+
+def float_to_pcm16(audio):
+    """Encode float audio to little-endian 16-bit PCM bytes"""
+    clipped = np.clip(audio, -1.0, 1.0 - 1.0 / 32768)
+    return (clipped * 32768).astype('<i2').tobytes()
+
+
+def read_wav(path):
+    """Read a whole PCM WAV file, returning (audio, samplerate)"""
+    with wave.open(str(path), 'rb') as f:
+        channels = f.getnchannels()
+        sampwidth = f.getsampwidth()
+        samplerate = f.getframerate()
+        raw = f.readframes(f.getnframes())
+    return pcm_to_float(raw, sampwidth, channels), samplerate
+
+
+def wav_layout(path):
+    """Parse a PCM WAV header: (channels, sampwidth, samplerate, data offset, data bytes)"""
+    with open(path, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b'RIFF' or header[8:] != b'WAVE':
+            raise wave.Error(f"{path} is not a RIFF/WAVE file")
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise wave.Error(f"{path} has no data chunk")
+            chunk_id, size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                fmt = f.read(size)
+                tag, channels, samplerate, _, _, bits = struct.unpack('<HHIIHH', fmt[:16])
+                if tag == 0xFFFE and len(fmt) >= 26:
+                    # WAVE_FORMAT_EXTENSIBLE, the sub-format GUID starts with the tag
+                    tag = struct.unpack('<H', fmt[24:26])[0]
+                if tag != 1:
+                    raise wave.Error(f"{path}: only PCM WAV is supported (format {tag})")
+                f.seek(size % 2, 1)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise wave.Error(f"{path}: data chunk before fmt chunk")
+                offset = f.tell()
+                # Streaming writers leave the size at 0 or 0xFFFFFFFF
+                available = f.seek(0, 2) - offset
+                size = available if size in (0, 0xFFFFFFFF) else min(size, available)
+                return channels, bits // 8, samplerate, offset, size
+            else:
+                f.seek(size + size % 2, 1)
+
+
+class WavReader:
+    """Memory-mapped PCM WAV file, decoded to float32 one chunk at a time
+
+    Only the header is read on open. The samples stay in the page cache and
+    each read() decodes just the requested frames, so memory use depends on
+    the chunk size rather than the file length. Decoding is the same as
+    read_wav(), sample for sample.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.channels, self.sampwidth, self.samplerate, offset, size = wav_layout(self.path)
+        self.frame_bytes = self.channels * self.sampwidth
+        self.frames = size // self.frame_bytes
+        if self.frames:
+            self._map = np.memmap(self.path, dtype=np.uint8, mode='r', offset=offset,
+                                  shape=(self.frames * self.frame_bytes,))
+        else:
+            self._map = np.zeros(0, dtype=np.uint8)
+
+    @property
+    def duration(self):
+        return self.frames / self.samplerate
+
+    def read(self, start, frames):
+        """Decode frames [start, start + frames) as float32 (frames, channels)"""
+        stop = min(start + frames, self.frames)
+        raw = self._map[start * self.frame_bytes:max(start, stop) * self.frame_bytes]
+        return pcm_to_float(raw, self.sampwidth, self.channels)
+
+    def chunks(self, frames):
+        """Yield (start, audio) for consecutive chunks of up to `frames` frames"""
+        for start in range(0, self.frames, frames):
+            yield start, self.read(start, frames)
+
+    def close(self):
+        # Unmapped once the last view into it is gone
+        self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_wav(path, audio, samplerate):
+    """Write float audio (frames,) or (frames, channels) as 16-bit PCM"""
+    audio = np.asarray(audio)
+    channels = 1 if audio.ndim == 1 else audio.shape[1]
+    with WavWriter(path, samplerate, channels) as writer:
+        writer.write(audio)
+
+
+class WavWriter:
+    """Incremental 16-bit PCM WAV writer"""
+
+    def __init__(self, path, samplerate, channels=1):
+        self.path = str(path)
+        self.samplerate = int(samplerate)
+        self.channels = int(channels)
+        self.frames_written = 0
+        self._stream = open(self.path, 'wb')
+        self._file = wave.open(self._stream, 'wb')
+        self._file.setnchannels(self.channels)
+        self._file.setsampwidth(2)
+        self._file.setframerate(self.samplerate)
+
+    def write(self, block):
+        """Append a float (or int16 PCM) block of shape (frames,) or (frames, channels)"""
+        if block.dtype == np.int16:
+            self._file.writeframes(np.ascontiguousarray(block, dtype='<i2').tobytes())
+        else:
+            self._file.writeframes(float_to_pcm16(block))
+        self.frames_written += len(block)
+
+    def flush(self):
+        """Put everything written so far on disk; the header is kept current by wave"""
+        self._stream.flush()
+        os.fsync(self._stream.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._stream.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()